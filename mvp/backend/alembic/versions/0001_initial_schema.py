@@ -0,0 +1,111 @@
+"""Initial schema (users, openai_keys, agents, assistant_configs)
+
+Tables are only created when missing, so databases that were created with
+Base.metadata.create_all() can be brought under Alembic with
+`alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+noise_reduction_mode = sa.Enum("NEAR_FIELD", "FAR_FIELD", name="noisereductionmode")
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("role", sa.Enum("SUPERADMIN", "DEFAULT", name="userrole"), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("(CURRENT_TIMESTAMP)"), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    if "openai_keys" not in existing:
+        op.create_table(
+            "openai_keys",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("key_name", sa.String(), nullable=False),
+            sa.Column("encrypted_key", sa.String(), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("(CURRENT_TIMESTAMP)"), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_openai_keys_id", "openai_keys", ["id"])
+
+    if "agents" not in existing:
+        op.create_table(
+            "agents",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("openai_key_id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("domain", sa.String(), nullable=False),
+            sa.Column("instructions", sa.Text(), nullable=False),
+            sa.Column("voice", sa.String(), nullable=True),
+            sa.Column("noise_reduction_mode", noise_reduction_mode, nullable=True),
+            sa.Column("noise_reduction_threshold", sa.String(), nullable=True),
+            sa.Column("noise_reduction_prefix_padding_ms", sa.Integer(), nullable=True),
+            sa.Column("noise_reduction_silence_duration_ms", sa.Integer(), nullable=True),
+            sa.Column("agent_config", sa.JSON(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("(CURRENT_TIMESTAMP)"), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(["openai_key_id"], ["openai_keys.id"]),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_agents_id", "agents", ["id"])
+
+    if "assistant_configs" not in existing:
+        op.create_table(
+            "assistant_configs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("agent_id", sa.Integer(), nullable=True),
+            sa.Column("voice", sa.String(), nullable=True),
+            sa.Column("noise_reduction_mode", noise_reduction_mode, nullable=True),
+            sa.Column("noise_reduction_threshold", sa.String(), nullable=True),
+            sa.Column("noise_reduction_prefix_padding_ms", sa.Integer(), nullable=True),
+            sa.Column("noise_reduction_silence_duration_ms", sa.Integer(), nullable=True),
+            sa.Column("additional_settings", sa.JSON(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("(CURRENT_TIMESTAMP)"), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(["agent_id"], ["agents.id"]),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_assistant_configs_id", "assistant_configs", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("assistant_configs")
+    op.drop_table("agents")
+    op.drop_table("openai_keys")
+    op.drop_table("users")
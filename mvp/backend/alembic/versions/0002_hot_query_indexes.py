@@ -0,0 +1,50 @@
+"""Indexes for the hot query shapes
+
+- agents (user_id, openai_key_id): list_agents, with and without the key filter
+- agents (openai_key_id): agents referencing a key (key deletion, widget lookups)
+- openai_keys (user_id, is_active): a user's keys / a user's active key
+- assistant_configs (user_id): list_assistants, superadmin user views
+- assistant_configs (agent_id): cascade on agent deletion
+
+Lookups of OpenAIKey.id together with is_active are already served by the
+integer primary key, so they get no extra index.
+
+The single-column indexes may already exist on databases upgraded with
+migrate_prompts_to_agents.py, hence if_not_exists. On a legacy database that
+still has prompts, assistant_configs gets agent_id (and its index) from that
+script, which runs after this migration.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_agents_user_id_openai_key_id", "agents", ["user_id", "openai_key_id"], if_not_exists=True)
+    op.create_index("ix_agents_openai_key_id", "agents", ["openai_key_id"], if_not_exists=True)
+    op.create_index("ix_openai_keys_user_id_is_active", "openai_keys", ["user_id", "is_active"], if_not_exists=True)
+    op.create_index("ix_assistant_configs_user_id", "assistant_configs", ["user_id"], if_not_exists=True)
+    assistant_columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("assistant_configs")}
+    if "agent_id" in assistant_columns:
+        op.create_index("ix_assistant_configs_agent_id", "assistant_configs", ["agent_id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_assistant_configs_agent_id", table_name="assistant_configs", if_exists=True)
+    op.drop_index("ix_assistant_configs_user_id", table_name="assistant_configs")
+    op.drop_index("ix_openai_keys_user_id_is_active", table_name="openai_keys")
+    op.drop_index("ix_agents_openai_key_id", table_name="agents")
+    op.drop_index("ix_agents_user_id_openai_key_id", table_name="agents")
@@ -0,0 +1,30 @@
+"""Index agents by user_id alone for keyset pagination
+
+Paging through a user's agents filters on user_id and orders by id. The
+(user_id, openai_key_id) index cannot return those rows in id order, so
+every page would need a sort over all of the user's agents. A plain
+user_id index does (SQLite appends the rowid to every index entry).
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_agents_user_id", "agents", ["user_id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_agents_user_id", table_name="agents")
@@ -0,0 +1,44 @@
+"""Change counters and row versions for conditional GETs
+
+- agents / openai_keys / assistant_configs get a `version` column that is
+  incremented on every update (per-resource ETag)
+- change_counters holds one counter per (collection, owner) that is
+  incremented on every insert, update or delete in that collection
+  (collection ETag)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table in ("agents", "openai_keys", "assistant_configs"):
+        op.add_column(table, sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+    op.create_table(
+        "change_counters",
+        sa.Column("scope", sa.String(), nullable=False),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("counter", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("scope", "owner_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("change_counters")
+    for table in ("assistant_configs", "openai_keys", "agents"):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("version")
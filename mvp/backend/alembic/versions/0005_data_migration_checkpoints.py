@@ -0,0 +1,41 @@
+"""Checkpoints for resumable batched data migrations
+
+data_migration_checkpoints records, per data migration, the key of the
+last processed row so an interrupted run resumes where it stopped. The
+batch runner also creates the table on databases that predate Alembic,
+hence the existence check.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("data_migration_checkpoints"):
+        return
+    op.create_table(
+        "data_migration_checkpoints",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("last_key", sa.Integer(), nullable=True),
+        sa.Column("rows_done", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("data_migration_checkpoints")
@@ -0,0 +1,33 @@
+"""Time-limited session capture: agents.capture_until replaces capture_sessions
+
+Capture is now switched on by a superadmin until a given time; agents that
+had the open-ended tenant flag set stop capturing.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("agents") as batch_op:
+        batch_op.drop_column("capture_sessions")
+        batch_op.add_column(sa.Column("capture_until", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("agents") as batch_op:
+        batch_op.drop_column("capture_until")
+        batch_op.add_column(sa.Column("capture_sessions", sa.Boolean(), nullable=False, server_default="0"))
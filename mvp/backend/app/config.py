@@ -42,7 +42,14 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = "sqlite:///./chatbot.db"
-    
+    sqlite_busy_timeout_ms: int = 5000
+
+    # Write coordinator - funnels writes through one serialized writer
+    # and group-commits small transactions (useful for SQLite)
+    write_coordinator_enabled: bool = False
+    write_coordinator_max_batch: int = 64
+    write_coordinator_max_delay_ms: float = 0.0
+
     # Security
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
@@ -58,6 +65,81 @@ class Settings(BaseSettings):
     
     # OpenAI
     openai_api_base: str = "https://api.openai.com/v1"
+    openai_realtime_url: str = "wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-12-17"
+    openai_ws_compression: bool = False  # permessage-deflate to OpenAI, ~35 KiB of zlib state a session
+
+    # Realtime session capture - superadmins enable it per agent for a limited time (/api/debug/captures)
+    session_capture_enabled: bool = False  # Nothing is captured unless the operator turns this on
+    session_capture_dir: str = "./captures"
+    session_capture_max_bytes: int = 256 * 1024 * 1024  # Per session file
+    session_capture_queue_bytes: int = 64 * 1024 * 1024  # Unwritten backlog before frames are dropped
+    session_capture_max_hours: float = 24.0  # Longest capture window a superadmin can set
+    session_capture_max_total_bytes: int = 2 * 1024 * 1024 * 1024  # All capture files; no new captures beyond
+    session_capture_max_files: int = 1000  # Capture files kept; no new captures beyond
+    session_capture_retention_hours: float = 72.0  # Capture files older than this are deleted; 0 keeps them
+    session_capture_sweep_interval_s: float = 600.0  # Retention sweep and disk usage refresh
+
+    # Sampling CPU profiler (superadmin /api/debug/profile and the X-Profile request header)
+    profile_interval_ms: float = 5.0
+    profile_max_seconds: int = 120
+    request_profile_rate: float = 0.0  # Fraction of X-Profile requests that are profiled; 0 disables
+    request_profile_keep: int = 50  # Request profiles kept in memory
+
+    # Memory introspection (superadmin /api/debug/memory) and leak watchdog
+    tracemalloc_frames: int = 10  # Traceback depth recorded once tracing is started
+    memory_watchdog_interval_s: float = 60.0  # 0 disables the watchdog
+    memory_watchdog_rss_growth_mb: int = 100  # RSS growth between checks, without more sessions, to report
+    memory_watchdog_task_growth: int = 100  # Extra asyncio tasks between checks, without more sessions, to report
+
+    # Event-loop lag monitor and slow-callback detector (superadmin /api/debug/loop)
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval_ms: float = 50.0  # Lag sample period
+    loop_monitor_window: int = 1200  # Lag samples kept (one minute at 50 ms)
+    slow_callback_threshold_ms: float = 100.0  # Blocking longer than this is recorded with its stack
+    slow_callback_keep: int = 100  # Recent stalls kept with their stacks
+
+    # Widget session latency timelines (superadmin /api/debug/session-traces)
+    session_trace_enabled: bool = True
+    session_trace_keep: int = 500  # Finished sessions kept in memory
+    session_trace_file: str = ""  # Append OTLP/JSON traces here, e.g. ./traces/sessions.otlp.jsonl
+    
+    # Per-route latency histograms (superadmin /api/debug/latency) and Server-Timing headers
+    request_timing_enabled: bool = True
+    server_timing_header: bool = True
+    
+    # Slow-query log with captured plans (superadmin /api/debug/slow-queries); 0 disables it
+    slow_query_threshold_ms: float = 100
+    slow_query_explain: bool = True
+    slow_query_keep: int = 200  # Distinct statements kept
+    
+    # Per-route query budgets (app/utils/query_budget.py): off, warn or raise; empty warns when DEBUG
+    query_budget_mode: str = ""
+    
+    # Realtime gateway (gateway.py): widget assets and WebSocket relay only
+    gateway_host: str = "127.0.0.1"
+    gateway_port: int = 8001
+    gateway_workers: int = 2  # Processes sharing the port through SO_REUSEPORT
+    gateway_backlog: int = 2048
+    gateway_max_sessions: int = 0  # Widget sessions per process, 0 = unlimited
+    gateway_ws_max_size: int = 1048576  # Largest client message in bytes
+    gateway_ws_ping_interval_s: float = 20.0
+    gateway_ws_ping_timeout_s: float = 20.0
+    gateway_ws_per_message_deflate: bool = False  # zlib state per client costs ~100 KiB a session
+    gateway_loop: str = "auto"  # auto, asyncio or uvloop
+    gateway_graceful_shutdown_s: int = 30  # Wait for live sessions on restart
+    
+    # Widget sessions (app/routes/widget_realtime.py), 0 disables each check
+    widget_idle_timeout_s: float = 120.0  # Close the upstream after this long without speech or answers
+    widget_wake_level: int = 1500  # Peak pcm16 amplitude that reopens an idle session (~-27 dBFS)
+    widget_resume_buffer_chunks: int = 64  # Client audio held while the upstream reopens (~5 s)
+    widget_heartbeat_interval_s: float = 20.0  # Ping widgets that have sent nothing for this long
+    widget_heartbeat_timeout_s: float = 20.0  # and close them if the ping goes unanswered
+    widget_reconnect_attempts: int = 5  # Tries to restore a dropped upstream before ending the session
+    widget_reconnect_max_delay_s: float = 8.0  # Cap of the backoff between those tries
+    widget_replay_items: int = 20  # Recent transcripts replayed to a reconnected upstream
+    
+    # OpenAPI schema and /docs, /redoc: on, off, or empty for off in PROD only
+    api_docs: str = ""
     
     model_config = SettingsConfigDict(
         env_file=get_env_file(),
@@ -96,6 +178,13 @@ class Settings(BaseSettings):
                 "https://chat-api.ldttechnology.in"
             ]
     
+    @property
+    def docs_enabled(self) -> bool:
+        """Serve the OpenAPI schema and docs pages"""
+        if self.api_docs:
+            return self.api_docs.lower() == "on"
+        return not self.is_prod
+    
     @property
     def is_local(self) -> bool:
         """Check if running in local environment"""
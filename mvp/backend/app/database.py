@@ -1,14 +1,17 @@
 """
 Database configuration and session management
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from typing import Optional
 from app.config import settings
 
+is_sqlite = "sqlite" in settings.database_url
+
 # Create database engine
 connect_args = {}
-if "sqlite" in settings.database_url:
+if is_sqlite:
     connect_args = {"check_same_thread": False}
 
 engine = create_engine(
@@ -16,6 +19,21 @@ engine = create_engine(
     connect_args=connect_args
 )
 
+
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """Wait on SQLite's writer lock instead of failing with 'database is locked'"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {int(settings.sqlite_busy_timeout_ms)}")
+    if settings.write_coordinator_enabled:
+        # WAL lets readers proceed while the single writer commits
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.close()
+
+
+if is_sqlite:
+    event.listen(engine, "connect", _configure_sqlite_connection)
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -23,6 +41,38 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def create_writer_engine(database_url: Optional[str] = None):
+    """
+    Create the dedicated engine used by the write coordinator (and by the
+    batched data migrations, optionally on another database).
+
+    On SQLite the writer takes the lock up front with BEGIN IMMEDIATE, so a
+    batch never fails halfway through trying to upgrade a read lock, and
+    SAVEPOINTs and transactional DDL work (pysqlite's own transaction
+    handling is disabled).
+    """
+    database_url = database_url or settings.database_url
+    sqlite = "sqlite" in database_url
+    writer_engine = create_engine(
+        database_url,
+        connect_args={"check_same_thread": False} if sqlite else {},
+        pool_size=1,
+        max_overflow=0
+    )
+
+    if sqlite:
+        @event.listens_for(writer_engine, "connect")
+        def _connect(dbapi_connection, connection_record):
+            _configure_sqlite_connection(dbapi_connection, connection_record)
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(writer_engine, "begin")
+        def _begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return writer_engine
+
+
 def get_db():
     """Dependency for getting database session"""
     db = SessionLocal()
@@ -30,4 +80,3 @@ def get_db():
         yield db
     finally:
         db.close()
-
@@ -2,6 +2,11 @@ from app.models.user import User
 from app.models.openai_key import OpenAIKey
 from app.models.agent import Agent
 from app.models.assistant_config import AssistantConfig
+from app.models.change_counter import ChangeCounter
+from app.models.data_migration import DataMigrationCheckpoint
 
-__all__ = ["User", "OpenAIKey", "Agent", "AssistantConfig"]
+__all__ = ["User", "OpenAIKey", "Agent", "AssistantConfig", "ChangeCounter", "DataMigrationCheckpoint"]
+
+# Registers the session hooks that keep row versions and change counters current
+import app.utils.etags  # noqa: E402,F401
 
@@ -2,7 +2,7 @@
 Agent model for managing Realtime Agent configurations
 Based on OpenAI RealtimeAgent: https://openai.github.io/openai-agents-js/openai/agents-realtime/classes/realtimeagent/
 """
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, JSON, Boolean, Enum
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, JSON, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -16,10 +16,14 @@ class NoiseReductionMode(str, enum.Enum):
 
 class Agent(Base):
     __tablename__ = "agents"
+    __table_args__ = (
+        # Serves "agents of a user" and "agents of a user for one key"
+        Index("ix_agents_user_id_openai_key_id", "user_id", "openai_key_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    openai_key_id = Column(Integer, ForeignKey("openai_keys.id"), nullable=False)  # Required API key
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    openai_key_id = Column(Integer, ForeignKey("openai_keys.id"), nullable=False, index=True)  # Required API key
     name = Column(String, nullable=False)
     domain = Column(String, nullable=False)  # TLD domain where widget will be displayed (e.g., example.com)
     
@@ -37,8 +41,12 @@ class Agent(Base):
     # Can include: tools, handoffs, inputGuardrails, outputGuardrails, etc.
     agent_config = Column(JSON, default={})
     
+    # Record widget sessions of this agent until then; set by superadmins (see app/utils/session_capture.py)
+    capture_until = Column(DateTime(timezone=True), nullable=True)
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Bumped on every change (ETag)
     
     user = relationship("User", back_populates="agents")
     assistant_configs = relationship("AssistantConfig", back_populates="agent", cascade="all, delete-orphan")
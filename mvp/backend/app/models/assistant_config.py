@@ -17,9 +17,9 @@ class AssistantConfig(Base):
     __tablename__ = "assistant_configs"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     name = Column(String, nullable=False)  # Chatbot/Assistant name
-    agent_id = Column(Integer, ForeignKey("agents.id"), nullable=True)  # Active agent configuration
+    agent_id = Column(Integer, ForeignKey("agents.id"), nullable=True, index=True)  # Active agent configuration
     
     # Voice settings (OpenAI Realtime API voice options)
     voice = Column(String, default="alloy")  # alloy, echo, fable, onyx, nova, shimmer
@@ -35,6 +35,7 @@ class AssistantConfig(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Bumped on every change (ETag)
     
     user = relationship("User", back_populates="assistant_configs")
     agent = relationship("Agent", back_populates="assistant_configs")
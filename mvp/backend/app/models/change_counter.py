@@ -0,0 +1,13 @@
+"""
+Change counter model - per-owner version of a resource collection (used for ETags)
+"""
+from sqlalchemy import Column, Integer, String
+from app.database import Base
+
+
+class ChangeCounter(Base):
+    __tablename__ = "change_counters"
+    
+    scope = Column(String, primary_key=True)  # Collection name, e.g. "agents"
+    owner_id = Column(Integer, primary_key=True)  # User owning the collection
+    counter = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,15 @@
+"""
+Data migration checkpoint model - progress of resumable batched data migrations
+"""
+from sqlalchemy import Column, Integer, String, DateTime
+from app.database import Base
+
+
+class DataMigrationCheckpoint(Base):
+    __tablename__ = "data_migration_checkpoints"
+    
+    name = Column(String, primary_key=True)  # Migration name
+    last_key = Column(Integer, nullable=True)  # Key of the last row processed
+    rows_done = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)  # Set once all rows are processed
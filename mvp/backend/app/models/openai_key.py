@@ -1,7 +1,7 @@
 """
 OpenAI API Key model - stores encrypted API keys per user
 """
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -9,6 +9,10 @@ from app.database import Base
 
 class OpenAIKey(Base):
     __tablename__ = "openai_keys"
+    __table_args__ = (
+        # Serves "keys of a user" and "active key of a user"
+        Index("ix_openai_keys_user_id_is_active", "user_id", "is_active"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -17,6 +21,7 @@ class OpenAIKey(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Bumped on every change (ETag)
     
     user = relationship("User", back_populates="openai_keys")
 
@@ -1,4 +1,2 @@
-from app.routes import auth, openai_keys, agents, assistant_config, widget, users
-
-__all__ = ["auth", "openai_keys", "agents", "assistant_config", "widget", "users"]
-
+# Route modules are imported where they are mounted (main.py, gateway.py), so the
+# realtime gateway does not load the REST routers
@@ -2,19 +2,100 @@
 Agent management routes - for managing Realtime Agent configurations
 Based on OpenAI RealtimeAgent: https://openai.github.io/openai-agents-js/openai/agents-realtime/classes/realtimeagent/
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+import json
 from app.database import get_db
 from app.models.user import User
 from app.models.agent import Agent, NoiseReductionMode
+from app.models.openai_key import OpenAIKey
 from app.schemas import (
-    AgentCreate, AgentResponse, AgentUpdate
+    AgentCreate, AgentResponse, AgentUpdate, AgentBulkUpdate
 )
 from app.dependencies import get_current_user
+from app.utils.write_coordinator import commit_save, commit_delete, run_write
+from app.utils.pagination import list_page, LimitQuery, CursorQuery, FieldsQuery
+from app.utils.etags import collection_etag, resource_etag, not_modified, bump_change_counter
+from app.utils.query_budget import query_budget
 
 router = APIRouter(prefix="/api/agents", tags=["agents"])
 
+# Bulk endpoints
+MAX_BULK_ITEMS = 5000
+BULK_INSERT_BATCH = 500
+
+
+def parse_noise_reduction_mode(value: Optional[str]) -> NoiseReductionMode:
+    """Validate a noise reduction mode (defaults to near field)"""
+    if not value:
+        return NoiseReductionMode.NEAR_FIELD
+    try:
+        return NoiseReductionMode(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid noise reduction mode. Must be one of: {[m.value for m in NoiseReductionMode]}"
+        )
+
+
+def agent_values(user_id: int, agent_data: AgentCreate) -> dict:
+    """Column values for a new agent, with defaults applied"""
+    return {
+        "user_id": user_id,
+        "openai_key_id": agent_data.openai_key_id,
+        "name": agent_data.name,
+        "domain": agent_data.domain,
+        "instructions": agent_data.instructions,
+        "voice": agent_data.voice or "alloy",
+        "noise_reduction_mode": parse_noise_reduction_mode(agent_data.noise_reduction_mode),
+        "noise_reduction_threshold": agent_data.noise_reduction_threshold or "0.5",
+        "noise_reduction_prefix_padding_ms": agent_data.noise_reduction_prefix_padding_ms or 300,
+        "noise_reduction_silence_duration_ms": agent_data.noise_reduction_silence_duration_ms or 500,
+        "agent_config": agent_data.agent_config or {}
+    }
+
+
+def _parse_bulk_body(body: bytes, content_type: str) -> list:
+    """
+    Items of a JSON array or NDJSON body. An NDJSON line that is not valid
+    JSON becomes a ValueError in its slot so it can be reported per item.
+    """
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Request body is not valid UTF-8: {e}"
+        )
+    if "ndjson" not in content_type and text.lstrip().startswith("["):
+        try:
+            items = json.loads(text)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid JSON array: {e}"
+            )
+        return items
+    
+    items = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            items.append(ValueError(f"Invalid JSON: {e}"))
+    return items
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+    )
+
 
 @router.post("", response_model=AgentResponse)
 async def create_agent(
@@ -24,7 +105,6 @@ async def create_agent(
 ):
     """Create a new agent configuration (stored locally)"""
     # Validate API key
-    from app.models.openai_key import OpenAIKey
     api_key = db.query(OpenAIKey).filter(
         OpenAIKey.id == agent_data.openai_key_id,
         OpenAIKey.user_id == current_user.id,
@@ -36,62 +116,184 @@ async def create_agent(
             detail="Invalid or inactive API key"
         )
     
-    # Validate noise reduction mode
-    noise_reduction = NoiseReductionMode.NEAR_FIELD
-    if agent_data.noise_reduction_mode:
+    # Create agent configuration (stored locally only)
+    db_agent = Agent(**agent_values(current_user.id, agent_data))
+    return await commit_save(db, db_agent)
+
+
+@router.post("/bulk")
+async def bulk_create_agents(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create many agents in one request.
+    The body is a JSON array or NDJSON (Content-Type: application/x-ndjson),
+    one AgentCreate object per item. All referenced API keys are validated in
+    one query; valid items are inserted in batches in a single transaction
+    and invalid ones are reported per item without blocking the rest.
+    """
+    items = _parse_bulk_body(await request.body(), request.headers.get("content-type", ""))
+    if not isinstance(items, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body must be a JSON array or NDJSON"
+        )
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BULK_ITEMS} agents can be created at once"
+        )
+    
+    results = [None] * len(items)
+    candidates = []
+    for index, item in enumerate(items):
+        if isinstance(item, Exception):
+            results[index] = {"index": index, "error": str(item)}
+            continue
         try:
-            noise_reduction = NoiseReductionMode(agent_data.noise_reduction_mode)
-        except ValueError:
+            candidates.append((index, agent_values(current_user.id, AgentCreate.model_validate(item))))
+        except ValidationError as e:
+            results[index] = {"index": index, "error": _validation_message(e)}
+        except HTTPException as e:
+            results[index] = {"index": index, "error": e.detail}
+    
+    # Validate every referenced key at once
+    key_ids = {values["openai_key_id"] for _, values in candidates}
+    valid_key_ids = set(db.scalars(
+        select(OpenAIKey.id).where(
+            OpenAIKey.id.in_(key_ids),
+            OpenAIKey.user_id == current_user.id,
+            OpenAIKey.is_active == True
+        )
+    )) if key_ids else set()
+    
+    rows = []
+    for index, values in candidates:
+        if values["openai_key_id"] in valid_key_ids:
+            rows.append((index, values))
+        else:
+            results[index] = {"index": index, "error": "Invalid or inactive API key"}
+    
+    def insert_agents(session: Session) -> list:
+        ids = []
+        # Ids must line up with the input rows to report them per item
+        statement = insert(Agent).returning(Agent.id, sort_by_parameter_order=True)
+        for start in range(0, len(rows), BULK_INSERT_BATCH):
+            batch = [values for _, values in rows[start:start + BULK_INSERT_BATCH]]
+            ids.extend(session.scalars(statement, batch).all())
+        if ids:
+            bump_change_counter(session.connection(), "agents", current_user.id)
+        return ids
+    
+    created_ids = await run_write(db, insert_agents) if rows else []
+    for (index, _), agent_id in zip(rows, created_ids):
+        results[index] = {"index": index, "id": agent_id}
+    
+    return {
+        "created": len(created_ids),
+        "failed": len(items) - len(created_ids),
+        "results": results
+    }
+
+
+@router.patch("/bulk")
+async def bulk_update_agents(
+    update_data: AgentBulkUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Apply the same changes (e.g. voice or VAD settings) to many agents with
+    one UPDATE statement. Targets the given agent_ids, or all of the user's
+    agents, optionally narrowed to those using openai_key_id.
+    """
+    changes = update_data.changes.model_dump(exclude_unset=True, exclude_none=True)
+    if not changes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No changes given"
+        )
+    if "noise_reduction_mode" in changes:
+        changes["noise_reduction_mode"] = parse_noise_reduction_mode(changes["noise_reduction_mode"])
+    
+    filters = [Agent.user_id == current_user.id]
+    if update_data.openai_key_id:
+        filters.append(Agent.openai_key_id == update_data.openai_key_id)
+    
+    requested_ids = None
+    if update_data.agent_ids is not None:
+        requested_ids = list(dict.fromkeys(update_data.agent_ids))
+        if len(requested_ids) > MAX_BULK_ITEMS:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid noise reduction mode. Must be one of: {[m.value for m in NoiseReductionMode]}"
+                detail=f"At most {MAX_BULK_ITEMS} agents can be updated at once"
             )
+        filters.append(Agent.id.in_(requested_ids))
     
-    # Create agent configuration (stored locally only)
-    db_agent = Agent(
-        user_id=current_user.id,
-        openai_key_id=agent_data.openai_key_id,
-        name=agent_data.name,
-        domain=agent_data.domain,
-        instructions=agent_data.instructions,
-        voice=agent_data.voice or "alloy",
-        noise_reduction_mode=noise_reduction,
-        noise_reduction_threshold=agent_data.noise_reduction_threshold or "0.5",
-        noise_reduction_prefix_padding_ms=agent_data.noise_reduction_prefix_padding_ms or 300,
-        noise_reduction_silence_duration_ms=agent_data.noise_reduction_silence_duration_ms or 500,
-        agent_config=agent_data.agent_config or {}
-    )
-    db.add(db_agent)
-    db.commit()
-    db.refresh(db_agent)
+    def update_agents(session: Session):
+        matched_ids = session.scalars(select(Agent.id).where(*filters)).all() if requested_ids is not None else None
+        result = session.execute(
+            update(Agent).where(*filters).values(**changes, version=Agent.version + 1),
+            execution_options={"synchronize_session": False}
+        )
+        if result.rowcount:
+            bump_change_counter(session.connection(), "agents", current_user.id)
+        return result.rowcount, matched_ids
     
-    return db_agent
+    updated, matched_ids = await run_write(db, update_agents)
+    response = {"updated": updated}
+    if requested_ids is not None:
+        matched = set(matched_ids)
+        response["not_found"] = [agent_id for agent_id in requested_ids if agent_id not in matched]
+    return response
 
 
 @router.get("", response_model=List[AgentResponse])
+@query_budget(3)
 async def list_agents(
+    request: Request,
+    response: Response,
     openai_key_id: int = None,
+    limit: Optional[int] = LimitQuery,
+    cursor: Optional[str] = CursorQuery,
+    fields: Optional[str] = FieldsQuery,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """List all agent configurations for current user"""
-    query = db.query(Agent).filter(Agent.user_id == current_user.id)
+    """
+    List agent configurations for current user.
+    Supports keyset pagination (limit/cursor) and sparse fieldsets (fields),
+    e.g. fields=id,name,domain skips the large instructions and agent_config.
+    """
+    cached = not_modified(request, response, collection_etag(db, "agents", current_user.id, request))
+    if cached:
+        return cached
+    
+    filters = [Agent.user_id == current_user.id]
     
     # Filter by API key if provided
     if openai_key_id:
-        query = query.filter(Agent.openai_key_id == openai_key_id)
+        filters.append(Agent.openai_key_id == openai_key_id)
     
-    agents = query.all()
-    return agents
+    return list_page(db, Agent, AgentResponse, filters, response, cursor, limit, fields)
 
 
 @router.get("/{agent_id}", response_model=AgentResponse)
+@query_budget(3)
 async def get_agent(
     agent_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get a specific agent configuration"""
+    cached = not_modified(request, response, resource_etag(db, Agent, agent_id, current_user.id))
+    if cached:
+        return cached
+    
     agent = db.query(Agent).filter(
         Agent.id == agent_id,
         Agent.user_id == current_user.id
@@ -132,13 +334,7 @@ async def update_agent(
     if agent_data.voice is not None:
         agent.voice = agent_data.voice
     if agent_data.noise_reduction_mode is not None:
-        try:
-            agent.noise_reduction_mode = NoiseReductionMode(agent_data.noise_reduction_mode)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid noise reduction mode. Must be one of: {[m.value for m in NoiseReductionMode]}"
-            )
+        agent.noise_reduction_mode = parse_noise_reduction_mode(agent_data.noise_reduction_mode)
     if agent_data.noise_reduction_threshold is not None:
         agent.noise_reduction_threshold = agent_data.noise_reduction_threshold
     if agent_data.noise_reduction_prefix_padding_ms is not None:
@@ -148,9 +344,7 @@ async def update_agent(
     if agent_data.agent_config is not None:
         agent.agent_config = agent_data.agent_config
     
-    db.commit()
-    db.refresh(agent)
-    return agent
+    return await commit_save(db, agent)
 
 
 @router.delete("/{agent_id}")
@@ -169,7 +363,6 @@ async def delete_agent(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Agent not found"
         )
-    db.delete(agent)
-    db.commit()
+    await commit_delete(db, agent)
     return {"message": "Agent deleted successfully"}
 
@@ -1,9 +1,9 @@
 """
 Assistant configuration routes (Chatbots)
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.database import get_db
 from app.models.user import User
 from app.models.assistant_config import AssistantConfig
@@ -11,6 +11,9 @@ from app.schemas import (
     AssistantConfigCreate, AssistantConfigUpdate, AssistantConfigResponse
 )
 from app.dependencies import get_current_user
+from app.utils.write_coordinator import commit_save, commit_delete
+from app.utils.pagination import list_page, LimitQuery, CursorQuery, FieldsQuery
+from app.utils.etags import collection_etag, resource_etag, not_modified
 
 router = APIRouter(prefix="/api/assistants", tags=["assistants"])
 
@@ -33,32 +36,44 @@ async def create_assistant(
         noise_reduction_silence_duration_ms=config_data.noise_reduction_silence_duration_ms or 500,
         additional_settings=config_data.additional_settings or {}
     )
-    db.add(config)
-    db.commit()
-    db.refresh(config)
-    
-    return config
+    return await commit_save(db, config)
 
 
 @router.get("", response_model=List[AssistantConfigResponse])
 async def list_assistants(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = LimitQuery,
+    cursor: Optional[str] = CursorQuery,
+    fields: Optional[str] = FieldsQuery,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """List all assistant chatbots for current user"""
-    configs = db.query(AssistantConfig).filter(
-        AssistantConfig.user_id == current_user.id
-    ).all()
-    return configs
+    """List assistant chatbots for current user (paginated with limit/cursor, projected with fields)"""
+    cached = not_modified(request, response, collection_etag(db, "assistants", current_user.id, request))
+    if cached:
+        return cached
+    
+    return list_page(
+        db, AssistantConfig, AssistantConfigResponse,
+        [AssistantConfig.user_id == current_user.id],
+        response, cursor, limit, fields
+    )
 
 
 @router.get("/{assistant_id}", response_model=AssistantConfigResponse)
 async def get_assistant(
     assistant_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get a specific assistant chatbot"""
+    cached = not_modified(request, response, resource_etag(db, AssistantConfig, assistant_id, current_user.id))
+    if cached:
+        return cached
+    
     config = db.query(AssistantConfig).filter(
         AssistantConfig.id == assistant_id,
         AssistantConfig.user_id == current_user.id
@@ -97,10 +112,7 @@ async def update_assistant(
     for field, value in update_data.items():
         setattr(config, field, value)
     
-    db.commit()
-    db.refresh(config)
-    
-    return config
+    return await commit_save(db, config)
 
 
 @router.delete("/{assistant_id}")
@@ -121,7 +133,6 @@ async def delete_assistant(
             detail="Assistant not found"
         )
     
-    db.delete(config)
-    db.commit()
+    await commit_delete(db, config)
     return {"message": "Assistant deleted successfully"}
 
@@ -0,0 +1,306 @@
+"""
+Worker diagnostics routes (superadmin only)
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import get_db
+from app.models.agent import Agent
+from app.models.user import User
+from app.dependencies import get_current_user
+from app.routes.widget_realtime import session_stats
+from app.utils.roles import require_superadmin
+from app.utils.write_coordinator import commit_save
+from app.utils import loop_monitor, memory, profiling, request_timing, session_capture, session_trace, slow_queries
+
+router = APIRouter(prefix="/api/debug", tags=["debug"])
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def cpu_profile(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(None, gt=0),
+    idle: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Sample every thread of this worker (REST handlers and widget relays run
+    on the event loop thread) for `seconds` and return the stacks in the
+    collapsed format, e.g. for `flamegraph.pl` or speedscope. Waiting
+    threads are left out unless idle=true. Profiles only the worker that
+    serves the request.
+    """
+    require_superadmin(current_user)
+    
+    if seconds > settings.profile_max_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Profiles are limited to {settings.profile_max_seconds} seconds"
+        )
+    if profiling.profile_running():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running on this worker"
+        )
+    
+    stacks = await profiling.profile_for(seconds, (interval_ms or settings.profile_interval_ms) / 1000, idle)
+    return profiling.collapsed(stacks)
+
+
+@router.get("/profiles")
+async def list_request_profiles(current_user: User = Depends(get_current_user)):
+    """Request profiles recorded on this worker (X-Profile header), newest first"""
+    require_superadmin(current_user)
+    
+    return [
+        {key: value for key, value in profile.items() if key != "stacks"}
+        for profile in reversed(profiling.request_profiles.values())
+    ]
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_request_profile(profile_id: str, current_user: User = Depends(get_current_user)):
+    """One request profile in the collapsed stack format"""
+    require_superadmin(current_user)
+    
+    profile = profiling.request_profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found (it may have been evicted or recorded by another worker)"
+        )
+    return profiling.collapsed(profile["stacks"])
+
+
+@router.get("/memory")
+async def memory_report(
+    objects: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Memory of this worker: RSS, widget session counters against relay
+    tasks and upstream connections, pending asyncio tasks by coroutine,
+    tracemalloc status and the watchdog's recent anomalies. objects=true
+    also counts live websocket objects (walks the whole heap).
+    """
+    require_superadmin(current_user)
+    
+    watchdog = memory.get_memory_watchdog()
+    report = {
+        "rss_bytes": memory.rss_bytes(),
+        "sessions": session_stats(),
+        "tasks": memory.task_counts(),
+        "tracemalloc": memory.tracing_status(),
+        "watchdog": {
+            "last_check": watchdog.last_check,
+            "anomalies": list(watchdog.anomalies),
+        } if watchdog else None,
+    }
+    if objects:
+        import websockets
+        report["objects"] = memory.count_objects(
+            WebSocket, websockets.WebSocketClientProtocol, asyncio.Task
+        )
+    return report
+
+
+@router.post("/memory/snapshot")
+async def memory_snapshot(
+    top: int = Query(20, ge=1, le=500),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Take a tracemalloc snapshot: top allocators now and growth since the
+    previous snapshot. The first call starts tracing (which slows the
+    worker down until DELETE /api/debug/memory/tracemalloc).
+    """
+    require_superadmin(current_user)
+    
+    return await asyncio.to_thread(memory.take_snapshot, top, group_by)
+
+
+@router.delete("/memory/tracemalloc")
+async def stop_memory_tracing(current_user: User = Depends(get_current_user)):
+    """Stop tracemalloc and drop the kept snapshot"""
+    require_superadmin(current_user)
+    
+    memory.stop_tracing()
+    return {"tracing": False}
+
+
+@router.get("/loop")
+async def loop_report(
+    recent: int = Query(20, ge=0, le=1000),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Event-loop lag of this worker over the rolling window, stalls (blocking
+    longer than slow_callback_threshold_ms) totalled by code path, and the
+    most recent stalls with the loop thread's stack
+    """
+    require_superadmin(current_user)
+    
+    monitor = loop_monitor.get_loop_monitor()
+    if monitor is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Loop monitor is disabled (LOOP_MONITOR_ENABLED)"
+        )
+    return monitor.report(recent)
+
+
+@router.get("/session-traces")
+async def list_session_traces(
+    agent_id: int = None,
+    user_id: int = None,
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Latency timelines of the most recent widget sessions on this worker,
+    newest first: setup phase durations and per-turn time to response,
+    first audio and first transcript
+    """
+    require_superadmin(current_user)
+    
+    traces = [
+        trace for trace in reversed(session_trace.recent_traces)
+        if (agent_id is None or trace.attributes.get("agent_id") == agent_id)
+        and (user_id is None or trace.attributes.get("user_id") == user_id)
+    ]
+    return [trace.summary() for trace in traces[:limit]]
+
+
+@router.get("/session-traces/summary")
+async def session_trace_summary(current_user: User = Depends(get_current_user)):
+    """Per tenant phase and time-to-first-audio percentiles over the kept session traces"""
+    require_superadmin(current_user)
+    
+    return session_trace.summarize_by_tenant(list(session_trace.recent_traces))
+
+
+@router.get("/latency")
+async def latency_histograms(
+    route: str = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Per-route latency histograms of this worker, split into handler, DB and
+    serialization time, slowest p95 first. `route` filters by a substring
+    of "METHOD /path".
+    """
+    require_superadmin(current_user)
+    
+    return {
+        "buckets_ms": request_timing.BUCKETS_MS,
+        "routes": request_timing.latency_report(route),
+    }
+
+
+@router.get("/slow-queries")
+async def list_slow_queries(
+    sort: str = Query("total", pattern="^(total|max|count)$"),
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Statements slower than slow_query_threshold_ms on this worker, worst
+    first, with the routes and code that sent them and their query plan
+    """
+    require_superadmin(current_user)
+    
+    return {
+        "threshold_ms": settings.slow_query_threshold_ms,
+        "queries": slow_queries.report(sort, limit),
+    }
+
+
+@router.delete("/slow-queries")
+async def clear_slow_queries(current_user: User = Depends(get_current_user)):
+    """Forget the recorded slow statements, e.g. after adding an index"""
+    require_superadmin(current_user)
+    
+    slow_queries.clear()
+    return {"cleared": True}
+
+
+@router.get("/captures")
+async def list_captures(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Session capture status: whether the operator enabled it
+    (SESSION_CAPTURE_ENABLED), disk usage against the quota as this worker
+    last measured it, and the agents being captured with their end time
+    """
+    require_superadmin(current_user)
+    
+    now = datetime.now(timezone.utc)
+    agents = db.query(Agent.id, Agent.user_id, Agent.capture_until).filter(
+        Agent.capture_until > now
+    ).order_by(Agent.capture_until).all()
+    return {
+        "enabled": settings.session_capture_enabled,
+        "usage": session_capture.usage.as_dict(),
+        "agents": [
+            {"agent_id": agent_id, "user_id": user_id, "capture_until": capture_until}
+            for agent_id, user_id, capture_until in agents
+        ],
+    }
+
+
+@router.put("/captures/{agent_id}")
+async def start_agent_capture(
+    agent_id: int,
+    hours: float = Query(1.0, gt=0),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Capture the widget sessions of an agent for the next `hours` (at most
+    session_capture_max_hours). Captures hold callers' audio: end it with
+    DELETE once the problem is reproduced.
+    """
+    require_superadmin(current_user)
+    
+    if not settings.session_capture_enabled:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Session capture is disabled (SESSION_CAPTURE_ENABLED)"
+        )
+    if hours > settings.session_capture_max_hours:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Captures are limited to {settings.session_capture_max_hours:g} hours"
+        )
+    agent = db.get(Agent, agent_id)
+    if agent is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Agent not found")
+    
+    agent.capture_until = datetime.now(timezone.utc) + timedelta(hours=hours)
+    agent = await commit_save(db, agent)
+    print(f"[Session capture] {current_user.email} enabled capture of agent {agent_id} until {agent.capture_until}")
+    return {"agent_id": agent.id, "capture_until": agent.capture_until}
+
+
+@router.delete("/captures/{agent_id}")
+async def stop_agent_capture(
+    agent_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stop capturing new sessions of an agent (running captures finish with their session)"""
+    require_superadmin(current_user)
+    
+    agent = db.get(Agent, agent_id)
+    if agent is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Agent not found")
+    
+    agent.capture_until = None
+    agent = await commit_save(db, agent)
+    return {"agent_id": agent.id, "capture_until": None}
@@ -1,15 +1,18 @@
 """
 OpenAI Key management routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.database import get_db
 from app.models.user import User
 from app.models.openai_key import OpenAIKey
 from app.schemas import OpenAIKeyCreate, OpenAIKeyResponse, OpenAIKeyMaskedResponse
 from app.dependencies import get_current_user
 from app.utils.encryption import encrypt_api_key, decrypt_api_key
+from app.utils.write_coordinator import commit_save, commit_delete
+from app.utils.pagination import list_page, LimitQuery, CursorQuery, FieldsQuery
+from app.utils.etags import collection_etag, resource_etag, not_modified
 
 router = APIRouter(prefix="/api/openai-keys", tags=["openai-keys"])
 
@@ -28,30 +31,44 @@ async def create_openai_key(
         key_name=key_data.key_name,
         encrypted_key=encrypted_key
     )
-    db.add(db_key)
-    db.commit()
-    db.refresh(db_key)
-    
-    return db_key
+    return await commit_save(db, db_key)
 
 
 @router.get("", response_model=List[OpenAIKeyResponse])
 async def list_openai_keys(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = LimitQuery,
+    cursor: Optional[str] = CursorQuery,
+    fields: Optional[str] = FieldsQuery,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """List all OpenAI keys for current user"""
-    keys = db.query(OpenAIKey).filter(OpenAIKey.user_id == current_user.id).all()
-    return keys
+    """List OpenAI keys for current user (paginated with limit/cursor, projected with fields)"""
+    cached = not_modified(request, response, collection_etag(db, "openai_keys", current_user.id, request))
+    if cached:
+        return cached
+    
+    return list_page(
+        db, OpenAIKey, OpenAIKeyResponse,
+        [OpenAIKey.user_id == current_user.id],
+        response, cursor, limit, fields
+    )
 
 
 @router.get("/{key_id}", response_model=OpenAIKeyResponse)
 async def get_openai_key(
     key_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get a specific OpenAI key"""
+    cached = not_modified(request, response, resource_etag(db, OpenAIKey, key_id, current_user.id))
+    if cached:
+        return cached
+    
     key = db.query(OpenAIKey).filter(
         OpenAIKey.id == key_id,
         OpenAIKey.user_id == current_user.id
@@ -80,8 +97,7 @@ async def delete_openai_key(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="OpenAI key not found"
         )
-    db.delete(key)
-    db.commit()
+    await commit_delete(db, key)
     return {"message": "OpenAI key deleted successfully"}
 
 
@@ -102,9 +118,7 @@ async def toggle_openai_key(
             detail="OpenAI key not found"
         )
     key.is_active = not key.is_active
-    db.commit()
-    db.refresh(key)
-    return key
+    return await commit_save(db, key)
 
 
 @router.get("/{key_id}/masked", response_model=OpenAIKeyMaskedResponse)
@@ -0,0 +1,56 @@
+"""
+Tenant configuration export routes
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from datetime import datetime, timezone
+from app.database import SessionLocal
+from app.models.user import User, UserRole
+from app.dependencies import get_current_user
+from app.utils.tenant_export import iter_export, gzip_stream, buffered
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+
+def _export_stream(user_ids: Optional[List[int]], compress: bool):
+    # Own session: it must stay open for as long as the response streams
+    db = SessionLocal()
+    try:
+        lines = iter_export(db, user_ids)
+        yield from gzip_stream(lines) if compress else buffered(lines)
+    finally:
+        db.close()
+
+
+@router.get("")
+async def export_configuration(
+    user_id: Optional[List[int]] = Query(None),
+    compress: bool = True,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream the configuration of a tenant as NDJSON (gzip-compressed unless
+    compress=false): the user, OpenAI key metadata, agents and assistants.
+    Superadmins may export any users (all users if user_id is omitted);
+    other users export their own configuration. Secrets are never included,
+    use `python tenant_export.py export --include-secrets` for full backups.
+    """
+    if current_user.role == UserRole.SUPERADMIN:
+        user_ids = user_id
+    elif user_id and set(user_id) != {current_user.id}:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only export your own configuration"
+        )
+    else:
+        user_ids = [current_user.id]
+    
+    filename = f"export-{datetime.now(timezone.utc):%Y%m%d%H%M%S}.ndjson"
+    if compress:
+        filename += ".gz"
+    return StreamingResponse(
+        _export_stream(user_ids, compress),
+        media_type="application/gzip" if compress else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
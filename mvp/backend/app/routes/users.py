@@ -1,18 +1,74 @@
 """
 User management routes (superadmin only)
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session, selectinload, load_only
+from typing import List, Dict, Optional
+import uuid
 from app.database import get_db
 from app.models.user import User, UserRole
-from app.schemas import UserCreate, UserResponse
+from app.models.agent import Agent
+from app.models.assistant_config import AssistantConfig
+from app.models.openai_key import OpenAIKey
+from app.schemas import UserCreate, UserResponse, UserProfilesRequest
 from app.dependencies import get_current_user
 from app.utils.auth import get_password_hash
 from app.utils.roles import require_superadmin
+from app.utils.write_coordinator import commit_save
+from app.utils.pagination import list_page, LimitQuery, CursorQuery, FieldsQuery
+from app.utils.query_budget import query_budget
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
+# Upper bound for the batched profile endpoint (keeps the IN lists reasonable)
+MAX_PROFILE_BATCH = 500
+
+
+def load_user_profiles(db: Session, user_ids: List[int]) -> Dict[int, dict]:
+    """
+    Build superadmin profiles for many users in a fixed number of queries:
+    users, their agents, their assistants (selectinload) and key counts
+    (one COUNT ... GROUP BY), however many rows each user owns.
+    """
+    users = db.query(User).options(
+        selectinload(User.agents).load_only(Agent.id, Agent.name, Agent.domain),
+        selectinload(User.assistant_configs).load_only(
+            AssistantConfig.id, AssistantConfig.name, AssistantConfig.voice, AssistantConfig.created_at
+        )
+    ).filter(User.id.in_(user_ids)).all()
+    
+    key_counts = {
+        user_id: (total, active or 0)
+        for user_id, total, active in db.query(
+            OpenAIKey.user_id,
+            func.count(OpenAIKey.id),
+            func.sum(case((OpenAIKey.is_active == True, 1), else_=0))
+        ).filter(OpenAIKey.user_id.in_(user_ids)).group_by(OpenAIKey.user_id)
+    }
+    
+    profiles = {}
+    for user in users:
+        api_keys_count, active_keys_count = key_counts.get(user.id, (0, 0))
+        profiles[user.id] = {
+            "user": {
+                "id": user.id,
+                "email": user.email,
+                "username": user.username,
+                "role": user.role.value,
+                "is_active": user.is_active,
+                "created_at": user.created_at
+            },
+            "agents": [{"id": a.id, "name": a.name, "domain": a.domain} for a in user.agents],
+            "assistants": [
+                {"id": a.id, "name": a.name, "voice": a.voice, "created_at": a.created_at}
+                for a in user.assistant_configs
+            ],
+            "api_keys_count": api_keys_count,
+            "active_keys_count": active_keys_count
+        }
+    return profiles
+
 
 @router.post("", response_model=UserResponse)
 async def create_user(
@@ -52,23 +108,45 @@ async def create_user(
         hashed_password=hashed_password,
         role=role
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    
-    return db_user
+    return await commit_save(db, db_user)
 
 
 @router.get("", response_model=List[UserResponse])
 async def list_users(
+    response: Response,
+    limit: Optional[int] = LimitQuery,
+    cursor: Optional[str] = CursorQuery,
+    fields: Optional[str] = FieldsQuery,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """List users (superadmin only, paginated with limit/cursor, projected with fields)"""
+    require_superadmin(current_user)
+    
+    return list_page(db, User, UserResponse, [], response, cursor, limit, fields)
+
+
+@router.post("/profiles")
+async def get_user_profiles(
+    request: UserProfilesRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """List all users (superadmin only)"""
+    """Get profiles for many users in one request (superadmin only)"""
     require_superadmin(current_user)
     
-    users = db.query(User).all()
-    return users
+    user_ids = list(dict.fromkeys(request.user_ids))
+    if len(user_ids) > MAX_PROFILE_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_PROFILE_BATCH} users can be requested at once"
+        )
+    
+    profiles = load_user_profiles(db, user_ids) if user_ids else {}
+    return {
+        "profiles": [profiles[user_id] for user_id in user_ids if user_id in profiles],
+        "not_found": [user_id for user_id in user_ids if user_id not in profiles]
+    }
 
 
 @router.get("/{user_id}", response_model=UserResponse)
@@ -113,13 +191,11 @@ async def toggle_user_active(
         )
     
     user.is_active = not user.is_active
-    db.commit()
-    db.refresh(user)
-    
-    return user
+    return await commit_save(db, user)
 
 
 @router.get("/{user_id}/profile")
+@query_budget(5)
 async def get_user_profile(
     user_id: int,
     current_user: User = Depends(get_current_user),
@@ -128,39 +204,17 @@ async def get_user_profile(
     """Get user profile with all their data (superadmin only)"""
     require_superadmin(current_user)
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    profile = load_user_profiles(db, [user_id]).get(user_id)
+    if not profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    
-    from app.models.agent import Agent
-    from app.models.assistant_config import AssistantConfig
-    from app.models.openai_key import OpenAIKey
-    
-    # Get user's agents, assistants, and keys
-    agents = db.query(Agent).filter(Agent.user_id == user_id).all()
-    assistants = db.query(AssistantConfig).filter(AssistantConfig.user_id == user_id).all()
-    keys = db.query(OpenAIKey).filter(OpenAIKey.user_id == user_id).all()
-    
-    return {
-        "user": {
-            "id": user.id,
-            "email": user.email,
-            "username": user.username,
-            "role": user.role.value,
-            "is_active": user.is_active,
-            "created_at": user.created_at
-        },
-        "agents": [{"id": a.id, "name": a.name, "description": a.description} for a in agents],
-        "assistants": [{"id": a.id, "name": a.name, "voice": a.voice, "created_at": a.created_at} for a in assistants],
-        "api_keys_count": len(keys),
-        "active_keys_count": len([k for k in keys if k.is_active])
-    }
+    return profile
 
 
 @router.get("/{user_id}/widgets")
+@query_budget(4)
 async def get_user_widgets(
     user_id: int,
     current_user: User = Depends(get_current_user),
@@ -176,33 +230,32 @@ async def get_user_widgets(
             detail="User not found"
         )
     
-    from app.models.assistant_config import AssistantConfig
-    from app.models.openai_key import OpenAIKey
+    assistants = db.query(AssistantConfig).options(
+        load_only(AssistantConfig.id, AssistantConfig.name)
+    ).filter(AssistantConfig.user_id == user_id).all()
     
-    assistants = db.query(AssistantConfig).filter(AssistantConfig.user_id == user_id).all()
+    # The active key check is the same for every assistant, so do it once
+    has_active_key = db.query(
+        db.query(OpenAIKey.id).filter(
+            OpenAIKey.user_id == user_id,
+            OpenAIKey.is_active == True
+        ).exists()
+    ).scalar()
     
     # Generate widget codes for each assistant
     widgets = []
     for assistant in assistants:
-        try:
-            # Check if user has active OpenAI key
-            active_key = db.query(OpenAIKey).filter(
-                OpenAIKey.user_id == user_id,
-                OpenAIKey.is_active == True
-            ).first()
-            
-            if not active_key:
-                widgets.append({
-                    "assistant_id": assistant.id,
-                    "assistant_name": assistant.name,
-                    "error": "No active OpenAI API key found"
-                })
-                continue
-            
-            # Generate widget code manually (can't call route directly)
-            import uuid
-            widget_id = str(uuid.uuid4())
-            widget_code = f"""
+        if not has_active_key:
+            widgets.append({
+                "assistant_id": assistant.id,
+                "assistant_name": assistant.name,
+                "error": "No active OpenAI API key found"
+            })
+            continue
+        
+        # Generate widget code manually (can't call route directly)
+        widget_id = str(uuid.uuid4())
+        widget_code = f"""
 <!-- Voice Assistant Widget: {assistant.name} -->
 <script>
 (function() {{
@@ -220,18 +273,12 @@ async def get_user_widgets(
 }})();
 </script>
 """
-            widgets.append({
-                "assistant_id": assistant.id,
-                "assistant_name": assistant.name,
-                "widget_id": widget_id,
-                "widget_code": widget_code.strip()
-            })
-        except Exception as e:
-            widgets.append({
-                "assistant_id": assistant.id,
-                "assistant_name": assistant.name,
-                "error": str(e)
-            })
+        widgets.append({
+            "assistant_id": assistant.id,
+            "assistant_name": assistant.name,
+            "widget_id": widget_id,
+            "widget_code": widget_code.strip()
+        })
     
     return {
         "user_id": user_id,
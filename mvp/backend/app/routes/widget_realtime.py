@@ -0,0 +1,848 @@
+"""
+Widget assets and the WebSocket relay to the OpenAI Realtime API
+
+Served by the API (main.py) and by the standalone realtime gateway
+(gateway.py), so this module keeps its imports to what a session needs.
+
+A session reaper task per worker (start_session_reaper) watches every
+session:
+- idle: with no speech, answer or commit for `widget_idle_timeout_s`, the
+  OpenAI socket is closed (it is paid for while open) and the widget is told
+  with an "idle" message. The widget stays connected; the upstream is
+  reopened when the caller speaks again (a microphone chunk louder than
+  `widget_wake_level`), with the audio around the wake-up buffered and sent
+  once the new upstream is configured.
+- heartbeat: a widget that has sent nothing for
+  `widget_heartbeat_interval_s` gets a "ping" and must answer with any
+  message ("pong") within `widget_heartbeat_timeout_s`, or its socket is
+  closed as dead.
+
+When OpenAI drops the socket mid-conversation (a network blip, the end of
+its maximum session length), the session reconnects behind the widget's
+back with capped, jittered backoff (`widget_reconnect_attempts`,
+`widget_reconnect_max_delay_s`): the cached `session.update` is sent again,
+then the last `widget_replay_items` user and assistant transcripts as
+conversation items, so the model keeps the context. Microphone audio is held
+in the same bounded buffer as for a wake-up and sent once the new upstream
+is ready. The widget only sees "reconnecting" and then "resumed"; if every
+attempt fails, it gets an error and its socket is closed.
+"""
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Header
+from fastapi.responses import FileResponse
+from fastapi.websockets import WebSocketState
+from app.database import SessionLocal
+from app.models.openai_key import OpenAIKey
+from app.models.agent import Agent
+from app.utils.encryption import decrypt_api_key
+from app.utils import session_capture
+from app.utils.session_trace import SessionTrace
+from app.utils.query_budget import query_budget
+from app.config import settings
+from pathlib import Path
+import json
+import asyncio
+import base64
+import contextlib
+import binascii
+import random
+import time
+from array import array
+from collections import OrderedDict, deque
+from typing import Deque, Optional, Set, TYPE_CHECKING
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    # Imported when the first session connects upstream
+    import websockets
+
+router = APIRouter(prefix="/api/widget", tags=["widget"])
+
+# Widget static files directory
+WIDGET_DIR = Path(__file__).parent.parent.parent / "widget"
+
+
+@router.get("/widget.css")
+async def get_widget_css():
+    """Serve widget CSS file"""
+    css_file = WIDGET_DIR / "widget.css"
+    if not css_file.exists():
+        raise HTTPException(status_code=404, detail="Widget CSS not found")
+    return FileResponse(css_file, media_type="text/css")
+
+
+@router.get("/widget.js")
+async def get_widget_js():
+    """Serve widget JavaScript file"""
+    js_file = WIDGET_DIR / "widget.js"
+    if not js_file.exists():
+        raise HTTPException(status_code=404, detail="Widget JS not found")
+    return FileResponse(js_file, media_type="application/javascript")
+
+
+# How often the reaper looks at the sessions
+REAPER_INTERVAL_S = 5.0
+# Silent chunks kept while idle so a wake-up doesn't clip the first syllable (~0.25 s)
+IDLE_PREROLL_CHUNKS = 3
+# First wait between upstream reconnect attempts, doubled up to widget_reconnect_max_delay_s
+RECONNECT_FIRST_DELAY_S = 0.5
+# An upstream that lasted this long before dropping starts the backoff over
+RECONNECT_STABLE_S = 30.0
+
+
+def is_speech(audio: Optional[str]) -> bool:
+    """Whether a base64 pcm16 chunk peaks above widget_wake_level"""
+    if not audio:
+        return False
+    try:
+        samples = array("h", base64.b64decode(audio))
+    except (ValueError, binascii.Error):
+        return False
+    return bool(samples) and max(max(samples), -min(samples)) >= settings.widget_wake_level
+
+
+def item_text(item: dict) -> Optional[str]:
+    """The text or transcript of a conversation item, if it has one yet"""
+    parts = [part.get("text") or part.get("transcript") for part in item.get("content") or ()]
+    return " ".join(part for part in parts if part) or None
+
+
+class WidgetSession:
+    """
+    State of one widget session: the client and upstream sockets, the
+    upstream reader task, capture and trace, message counters and the
+    assistant transcript being assembled. Slotted, because a worker holds
+    thousands of mostly idle sessions (see benchmarks/session_memory.py).
+    """
+    __slots__ = (
+        "client", "upstream", "relay_task", "capture", "trace",
+        "assistant_text", "client_messages", "upstream_messages", "closed",
+        "upstream_url", "api_key", "session_update", "last_activity", "last_heard", "last_ping",
+        "idle", "reopening", "pending", "history", "reopens", "reconnects", "failures", "reconnected_at",
+    )
+
+    def __init__(
+        self,
+        client: WebSocket,
+        upstream: Optional["websockets.WebSocketClientProtocol"] = None,
+        capture: Optional[session_capture.SessionCapture] = None,
+        trace: Optional[SessionTrace] = None
+    ):
+        self.client = client
+        self.upstream = upstream
+        self.relay_task: Optional[asyncio.Task] = None
+        self.capture = capture
+        self.trace = trace
+        self.assistant_text = ""
+        self.client_messages = 0
+        self.upstream_messages = 0
+        self.closed = False
+        # Kept to reopen the upstream after an idle close or a drop
+        self.upstream_url: Optional[str] = None
+        self.api_key: Optional[str] = None
+        self.session_update: Optional[str] = None
+        now = time.monotonic()
+        self.last_activity = now  # Speech, answers and commits
+        self.last_heard = now  # Any message from the widget
+        self.last_ping = 0.0
+        self.idle = False
+        self.reopening: Optional[asyncio.Task] = None
+        # Upstream messages held while idle or reopening, created when first needed
+        self.pending: Optional[Deque[str]] = None
+        # Recent conversation item id -> [role, transcript], replayed to a new upstream
+        self.history: Optional["OrderedDict[str, list]"] = None
+        self.reopens = 0
+        self.reconnects = 0
+        # Consecutive failed attempts to bring the upstream back
+        self.failures = 0
+        self.reconnected_at = 0.0
+
+    async def connect_upstream(self):
+        import websockets
+
+        self.upstream = await websockets.connect(
+            self.upstream_url,
+            extra_headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "OpenAI-Beta": "realtime=v1"
+            },
+            compression="deflate" if settings.openai_ws_compression else None
+        )
+
+    def start_relay(self):
+        """Forward upstream messages to the client in a task of their own"""
+        self.relay_task = asyncio.create_task(handle_openai_messages(self))
+        self.relay_task.add_done_callback(self._relay_done)
+
+    def _relay_done(self, task: asyncio.Task):
+        if self.closed:
+            sessions.discard(self)
+
+    async def close_upstream(self):
+        upstream, self.upstream = self.upstream, None
+        if upstream is None:
+            return
+        try:
+            if upstream.open:
+                await upstream.close()
+            print("[Widget WS] Closed OpenAI connection")
+        except:
+            pass
+
+    async def end(self):
+        """
+        The session is over: stop a reopen in flight, then close the upstream,
+        which ends the relay. Closed first, so no reopen can start afterwards;
+        the session stays listed until its relay task ends.
+        """
+        self.closed = True
+        reopening = self.reopening
+        if reopening is not None:
+            reopening.cancel()
+            await asyncio.wait([reopening])
+        await self.close_upstream()
+        if self.relay_task is None or self.relay_task.done():
+            sessions.discard(self)
+
+    def hold(self, message: str, limit: Optional[int] = None):
+        """Keep an upstream message until the upstream is back, dropping the oldest beyond the limit"""
+        if self.pending is None:
+            self.pending = deque(maxlen=settings.widget_resume_buffer_chunks)
+        self.pending.append(message)
+        if limit is not None:
+            while len(self.pending) > limit:
+                self.pending.popleft()
+
+    async def send_upstream(self, message: str):
+        """Forward a message to OpenAI, holding it while the upstream is closed for idleness or reconnecting"""
+        if self.idle or self.reopening is not None:
+            self.hold(message)
+            self.wake()
+            return
+        upstream = self.upstream
+        if upstream and upstream.open:
+            await upstream.send(message)
+
+    async def go_idle(self):
+        """Close the upstream of a quiet session and keep the widget connected"""
+        self.idle = True
+        await self.close_upstream()
+        print(f"[Widget WS] No activity for {settings.widget_idle_timeout_s:.0f}s, upstream closed until the caller speaks")
+        try:
+            await self.client.send_json({"type": "idle"})
+        except Exception:
+            pass
+
+    def wake(self):
+        if self.reopening is None and not self.closed:
+            self.reopening = asyncio.create_task(self._reopen())
+
+    def upstream_lost(self):
+        """OpenAI closed the socket under a live session: reconnect without ending it"""
+        if (
+            self.closed or self.idle or self.reopening is not None
+            or self.session_update is None or settings.widget_reconnect_attempts <= 0
+        ):
+            return
+        print("[Widget WS] OpenAI connection lost, reconnecting")
+        if self.reconnected_at and time.monotonic() - self.reconnected_at < RECONNECT_STABLE_S:
+            # Dropped again right after coming back: that attempt failed too
+            self.failures += 1
+        else:
+            self.failures = 0
+        self.upstream = None
+        self.reconnects += 1
+        self.assistant_text = ""
+        self.reopening = asyncio.create_task(self._reopen(reconnect=True))
+
+    def remember_item(self, item_id: Optional[str], role: Optional[str], text: Optional[str] = None):
+        """Record a conversation item, or the transcript of one, for replay after a reconnect"""
+        if not item_id or settings.widget_replay_items <= 0:
+            return
+        if self.history is None:
+            self.history = OrderedDict()
+        entry = self.history.get(item_id)
+        if entry is None:
+            if role not in ("user", "assistant"):
+                return
+            self.history[item_id] = [role, text]
+            while len(self.history) > settings.widget_replay_items:
+                self.history.popitem(last=False)
+        elif text:
+            entry[1] = text
+
+    async def replay_history(self):
+        """Recreate the remembered conversation on a new upstream, as text"""
+        if not self.history:
+            return
+        for item_id, (role, text) in list(self.history.items()):
+            if text:
+                # Same id, so the new upstream's conversation.item.created updates the entry
+                await self.upstream.send(json.dumps({
+                    "type": "conversation.item.create",
+                    "item": {
+                        "id": item_id,
+                        "type": "message",
+                        "role": role,
+                        "content": [{"type": "input_text" if role == "user" else "text", "text": text}]
+                    }
+                }))
+
+    def retry_delay(self) -> float:
+        """Capped exponential backoff after `failures` failed attempts, jittered so
+        sessions dropped together don't all come back at once"""
+        delay = min(RECONNECT_FIRST_DELAY_S * 2 ** (self.failures - 1), settings.widget_reconnect_max_delay_s)
+        return random.uniform(delay / 2, delay)
+
+    async def _reopen(self, reconnect: bool = False):
+        """Open a new upstream, configure it like the last one and send what was held meanwhile"""
+        try:
+            if reconnect:
+                await self.client.send_json({"type": "reconnecting"})
+            else:
+                self.failures = 0
+            while True:
+                if self.failures:
+                    if self.failures >= settings.widget_reconnect_attempts:
+                        raise ConnectionError(f"gave up after {self.failures} attempts")
+                    await asyncio.sleep(self.retry_delay())
+                try:
+                    span = self.trace.span("upstream_reopen") if self.trace else contextlib.nullcontext()
+                    with span:
+                        await self.connect_upstream()
+                        await self.upstream.send(self.session_update)
+                        await self.replay_history()
+                    break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    await self.close_upstream()
+                    self.failures += 1
+                    print(f"[Widget WS] OpenAI connection attempt {self.failures} failed: {e}")
+            self.start_relay()
+            # Messages keep arriving while these are sent; they queue behind them
+            while self.pending:
+                await self.upstream.send(self.pending.popleft())
+            # No await from the last check of pending to here, so nothing is left behind
+            self.pending = None
+            self.reopening = None
+            self.reconnected_at = self.last_activity = time.monotonic()
+            if self.idle:
+                self.idle = False
+                self.reopens += 1
+                print("[Widget WS] Caller is speaking, upstream reopened")
+            else:
+                print("[Widget WS] Reconnected to OpenAI")
+            await self.client.send_json({"type": "resumed"})
+        except asyncio.CancelledError:
+            # The session ended meanwhile: don't leave a new upstream open behind it
+            if self.relay_task is not None:
+                self.relay_task.cancel()
+            await self.close_upstream()
+            raise
+        except Exception as e:
+            print(f"[Widget WS] Reopening the OpenAI connection failed: {e}")
+            await self.close_upstream()
+            self.pending = None
+            try:
+                await self.client.send_json({"type": "error", "error": "Failed to connect to OpenAI"})
+                # Ends the session through its handler
+                await self.client.close(code=1011)
+            except Exception:
+                pass
+        finally:
+            if self.reopening is asyncio.current_task():
+                self.reopening = None
+
+    async def ping(self):
+        self.last_ping = time.monotonic()
+        try:
+            await self.client.send_json({"type": "ping"})
+        except Exception:
+            pass
+
+    async def drop_client(self):
+        """Close a widget that stopped answering; its handler then ends the session"""
+        print(f"[Widget WS] No reply from the widget for {time.monotonic() - self.last_heard:.0f}s, closing")
+        try:
+            await self.client.close(code=1001)
+        except Exception:
+            pass
+
+
+# Sessions in progress, and ended ones whose relay task is still running (see session_stats)
+sessions: Set[WidgetSession] = set()
+active_sessions = 0
+
+
+def session_stats() -> dict:
+    """
+    Counts of live widget session state. Relay tasks of sessions that have
+    ended are orphaned: they should stop right after their session does,
+    so a lasting count points at a leak.
+    """
+    upstream_connections = relay_tasks = orphaned = idle = 0
+    for session in sessions:
+        if session.upstream is not None:
+            upstream_connections += 1
+        if session.idle and not session.closed:
+            idle += 1
+        if session.relay_task is not None and not session.relay_task.done():
+            relay_tasks += 1
+            if session.closed:
+                orphaned += 1
+    return {
+        "active_sessions": active_sessions,
+        "upstream_connections": upstream_connections,
+        "idle_sessions": idle,
+        "relay_tasks": relay_tasks,
+        "orphaned_relay_tasks": orphaned,
+    }
+
+
+def reap_sessions(now: float):
+    """Close idle upstreams, ping quiet widgets and drop the ones that stopped answering"""
+    idle_timeout = settings.widget_idle_timeout_s
+    heartbeat = settings.widget_heartbeat_interval_s
+    for session in list(sessions):
+        if session.closed or session.upstream is None and not session.idle:
+            # Ended, or still being set up
+            continue
+        if (
+            idle_timeout > 0
+            and not session.idle
+            and session.reopening is None
+            and now - session.last_activity > idle_timeout
+        ):
+            asyncio.create_task(session.go_idle())
+        if heartbeat > 0:
+            quiet = now - session.last_heard
+            if quiet > heartbeat + settings.widget_heartbeat_timeout_s:
+                asyncio.create_task(session.drop_client())
+            elif quiet > heartbeat and now - session.last_ping > heartbeat:
+                asyncio.create_task(session.ping())
+
+
+async def _reap_forever():
+    while True:
+        await asyncio.sleep(REAPER_INTERVAL_S)
+        try:
+            reap_sessions(time.monotonic())
+        except Exception as e:
+            print(f"[Widget WS] Session reaper failed: {e}")
+
+
+_reaper: Optional[asyncio.Task] = None
+
+
+def start_session_reaper():
+    """Start the idle and heartbeat checks if either is enabled in settings"""
+    global _reaper
+    if _reaper is None and (settings.widget_idle_timeout_s > 0 or settings.widget_heartbeat_interval_s > 0):
+        _reaper = asyncio.create_task(_reap_forever())
+
+
+async def stop_session_reaper():
+    global _reaper
+    if _reaper is not None:
+        _reaper.cancel()
+        try:
+            await _reaper
+        except asyncio.CancelledError:
+            pass
+        _reaper = None
+
+
+def validate_domain(request_domain: str, agent_domain: str) -> bool:
+    """Validate that request domain matches agent's allowed domain"""
+    if not request_domain or not agent_domain:
+        return False
+    
+    # Normalize domains (remove protocol, www, trailing slashes)
+    request_domain = request_domain.lower().strip()
+    agent_domain = agent_domain.lower().strip()
+    
+    # Remove protocol if present
+    if "://" in request_domain:
+        request_domain = urlparse(request_domain).netloc
+    if "://" in agent_domain:
+        agent_domain = urlparse(agent_domain).netloc
+    
+    # Remove port numbers for comparison (localhost:3000 -> localhost)
+    if ":" in request_domain:
+        request_domain = request_domain.split(":")[0]
+    if ":" in agent_domain:
+        agent_domain = agent_domain.split(":")[0]
+    
+    # Remove www prefix for comparison
+    request_domain = request_domain.replace("www.", "")
+    agent_domain = agent_domain.replace("www.", "")
+    
+    # Special handling for localhost and 127.0.0.1
+    # They should be considered equivalent
+    localhost_variants = ["localhost", "127.0.0.1"]
+    if (request_domain in localhost_variants) and (agent_domain in localhost_variants):
+        return True
+    
+    # Check exact match or subdomain match
+    return request_domain == agent_domain or request_domain.endswith("." + agent_domain)
+
+
+@router.websocket("/ws")
+@query_budget(2)
+async def widget_websocket(
+    websocket: WebSocket,
+    agent_id: int,
+    origin: Optional[str] = Header(None)
+):
+    """
+    WebSocket endpoint for widget connections
+    Validates domain, fetches agent, and proxies to OpenAI Realtime API
+    """
+    global active_sessions
+    trace = SessionTrace(agent_id=agent_id, origin=origin)
+    with trace.span("accept"):
+        await websocket.accept()
+    active_sessions += 1
+    session = WidgetSession(websocket, trace=trace)
+    sessions.add(session)
+    print(f"[Widget WS] Client connected, agent_id={agent_id}, origin={origin}")
+    
+    # Create database session manually for WebSocket
+    db = SessionLocal()
+    agent = None
+    
+    try:
+        # Fetch agent from database
+        with trace.span("agent_fetch"):
+            agent = db.query(Agent).filter(Agent.id == agent_id).first()
+        
+        if not agent:
+            trace.fail("agent not found")
+            await websocket.send_json({
+                "type": "error",
+                "error": f"Agent {agent_id} not found"
+            })
+            await websocket.close()
+            return
+        trace.attributes["user_id"] = agent.user_id
+        
+        # Validate domain
+        if origin:
+            request_domain = urlparse(origin).netloc if "://" in origin else origin
+            with trace.span("domain_check"):
+                domain_valid = validate_domain(request_domain, agent.domain)
+            if not domain_valid:
+                trace.fail("domain validation failed")
+                await websocket.send_json({
+                    "type": "error",
+                    "error": f"Domain validation failed. Expected: {agent.domain}, Got: {request_domain}"
+                })
+                await websocket.close()
+                print(f"[Widget WS] Domain validation failed: {request_domain} != {agent.domain}")
+                return
+        
+        # Get OpenAI API key
+        with trace.span("key_fetch"):
+            api_key_record = db.query(OpenAIKey).filter(
+                OpenAIKey.id == agent.openai_key_id,
+                OpenAIKey.is_active == True
+            ).first()
+        
+        if not api_key_record:
+            trace.fail("API key not active")
+            await websocket.send_json({
+                "type": "error",
+                "error": "Agent's API key is not active"
+            })
+            await websocket.close()
+            return
+        
+        # Decrypt API key
+        try:
+            with trace.span("key_decrypt"):
+                openai_api_key = decrypt_api_key(api_key_record.encrypted_key)
+        except Exception as e:
+            trace.fail("API key decryption failed")
+            print(f"[Widget WS] Error decrypting API key: {e}")
+            await websocket.send_json({
+                "type": "error",
+                "error": "Failed to decrypt API key"
+            })
+            await websocket.close()
+            return
+        
+        # Done with the database before waiting on the network: a pooled
+        # connection held for the whole conversation would cap the sessions
+        # at the pool size and block the event loop waiting for one
+        db.close()
+        
+        print(f"[Widget WS] Agent '{agent.name}' validated, connecting to OpenAI...")
+        
+        # Connect to OpenAI Realtime API
+        ws_url = settings.openai_realtime_url
+        
+        if session_capture.capture_active(agent.capture_until):
+            session.capture = session_capture.start_capture(agent.id, origin=origin, upstream_url=ws_url)
+            if session.capture:
+                print(f"[Widget WS] Capturing session to {session.capture.path}")
+        session.upstream_url = ws_url
+        session.api_key = openai_api_key
+        
+        try:
+            with trace.span("upstream_connect"):
+                await session.connect_upstream()
+            print("[Widget WS] Connected to OpenAI Realtime API")
+        except Exception as e:
+            trace.fail("upstream connection failed")
+            print(f"[Widget WS] OpenAI connection failed: {e}")
+            await websocket.send_json({
+                "type": "error",
+                "error": "Failed to connect to OpenAI"
+            })
+            await websocket.close()
+            return
+        
+        # Configure OpenAI session with agent settings
+        agent_config = agent.agent_config if agent.agent_config else {}
+        
+        session_payload = {
+            "type": "session.update",
+            "session": {
+                "modalities": ["audio", "text"],
+                "input_audio_format": "pcm16",
+                "output_audio_format": "pcm16",
+                "input_audio_transcription": {"model": "whisper-1"},
+                "turn_detection": {
+                    "type": "server_vad",
+                    "threshold": float(agent.noise_reduction_threshold) if agent.noise_reduction_threshold else 0.5,
+                    "prefix_padding_ms": agent.noise_reduction_prefix_padding_ms or 300,
+                    "silence_duration_ms": agent.noise_reduction_silence_duration_ms or 500
+                },
+                "instructions": agent.instructions
+            }
+        }
+        
+        # Add voice if specified
+        if agent.voice:
+            session_payload["session"]["voice"] = agent.voice
+        
+        # Add additional agent config if present
+        if agent_config:
+            for key, value in agent_config.items():
+                if key not in session_payload["session"]:
+                    session_payload["session"][key] = value
+        
+        session.session_update = json.dumps(session_payload)
+        with trace.span("session_update"):
+            await session.upstream.send(session.session_update)
+        print(f"[Widget WS] OpenAI session configured for agent '{agent.name}'")
+        
+        # Start message forwarding tasks
+        session.start_relay()
+        
+        # Send connection confirmation
+        await websocket.send_json({"type": "connected"})
+        trace.ready()
+        
+        # Handle client messages
+        await handle_client_messages(session)
+    
+    except Exception as e:
+        trace.fail(str(e))
+        print(f"[Widget WS] Exception: {e}")
+        import traceback
+        traceback.print_exc()
+        try:
+            await websocket.send_json({
+                "type": "error",
+                "error": str(e)
+            })
+        except:
+            pass
+    
+    finally:
+        # Cleanup: ending the session first stops a reopen in flight from
+        # opening an upstream while the widget socket closes
+        await session.end()
+        
+        try:
+            await websocket.close()
+        except:
+            pass
+        finally:
+            # Close database session
+            db.close()
+            if session.capture:
+                session.capture.close()
+            trace.attributes["client_messages"] = session.client_messages
+            trace.attributes["upstream_messages"] = session.upstream_messages
+            trace.attributes["upstream_reopens"] = session.reopens
+            trace.attributes["upstream_reconnects"] = session.reconnects
+            trace.finish()
+            active_sessions -= 1
+
+
+async def handle_client_messages(session: WidgetSession):
+    """Receive messages from the widget client and forward them to OpenAI until it disconnects"""
+    client_ws = session.client
+    capture, trace = session.capture, session.trace
+    while True:
+        try:
+            text = await client_ws.receive_text()
+            session.client_messages += 1
+            session.last_heard = time.monotonic()
+            if capture:
+                capture.record(session_capture.CLIENT, text)
+            data = json.loads(text)
+            action = data.get("action")
+            
+            if action == "audio_chunk":
+                if trace:
+                    trace.client_audio()
+                audio = data.get("audio")
+                message = json.dumps({
+                    "type": "input_audio_buffer.append",
+                    "audio": audio
+                })
+                if session.idle and session.reopening is None and not is_speech(audio):
+                    # Silence while idle: keep a little for when the caller speaks
+                    session.hold(message, limit=IDLE_PREROLL_CHUNKS)
+                    continue
+                # Forward audio to OpenAI
+                await session.send_upstream(message)
+            
+            elif action == "commit":
+                if trace:
+                    trace.turn_started("commit")
+                session.last_activity = session.last_heard
+                # Commit audio and request response
+                await session.send_upstream(json.dumps({
+                    "type": "input_audio_buffer.commit"
+                }))
+                await session.send_upstream(json.dumps({
+                    "type": "response.create"
+                }))
+                print("[Widget WS] Committed audio & requested response")
+            
+            elif action == "pong":
+                # Heartbeat answer; receiving it is all that matters
+                pass
+            
+            else:
+                print(f"[Widget WS] Unknown action: {action}")
+                
+        except WebSocketDisconnect:
+            print("[Widget WS] Client disconnected")
+            break
+        except Exception as e:
+            if client_ws.application_state != WebSocketState.CONNECTED:
+                # Closed by the heartbeat check
+                break
+            print(f"[Widget WS] Error handling message: {e}")
+            await client_ws.send_json({
+                "type": "error",
+                "error": str(e)
+            })
+
+
+async def handle_openai_messages(session: WidgetSession):
+    """Receive messages from OpenAI and forward to widget client"""
+    openai_ws, client_ws = session.upstream, session.client
+    capture, trace = session.capture, session.trace
+    
+    try:
+        async for msg in openai_ws:
+            session.upstream_messages += 1
+            # OpenAI only sends events when something happens (speech, answers,
+            # errors), never for streamed silence, so any event is activity
+            session.last_activity = time.monotonic()
+            if capture:
+                capture.record(session_capture.UPSTREAM, msg)
+            try:
+                data = json.loads(msg)
+            except json.JSONDecodeError:
+                continue
+            
+            event_type = data.get("type", "")
+            
+            if event_type == "conversation.item.created":
+                item = data.get("item") or {}
+                if item.get("type") == "message":
+                    session.remember_item(item.get("id"), item.get("role"), item_text(item))
+            
+            elif event_type == "conversation.item.input_audio_transcription.completed":
+                transcript = data.get("transcript", "")
+                if transcript:
+                    session.remember_item(data.get("item_id"), None, transcript)
+                    await client_ws.send_json({
+                        "type": "transcript_user",
+                        "text": transcript
+                    })
+                    print(f"[Widget WS] User: {transcript}")
+            
+            elif event_type == "response.audio_transcript.delta":
+                session.assistant_text += data.get("delta", "")
+                if trace:
+                    trace.turn_event("first_transcript")
+            
+            elif event_type == "response.audio_transcript.done":
+                session.remember_item(data.get("item_id"), None, data.get("transcript") or session.assistant_text)
+                if session.assistant_text:
+                    await client_ws.send_json({
+                        "type": "transcript_assistant",
+                        "text": session.assistant_text
+                    })
+                    print(f"[Widget WS] Assistant: {session.assistant_text}")
+                    session.assistant_text = ""
+            
+            elif event_type == "response.audio.delta":
+                if trace:
+                    trace.upstream_audio()
+                delta = data.get("delta")
+                if delta:
+                    await client_ws.send_json({
+                        "type": "audio_chunk",
+                        "audio": delta
+                    })
+            
+            elif event_type == "response.created":
+                if trace:
+                    trace.turn_event("response_created")
+            
+            elif event_type == "response.done":
+                if trace:
+                    trace.turn_done(data.get("response", {}).get("status", "completed"))
+                await client_ws.send_json({"type": "response_done"})
+                print("[Widget WS] Response complete")
+            
+            elif event_type == "input_audio_buffer.speech_started":
+                await client_ws.send_json({"type": "speech_started"})
+                print("[Widget WS] User started speaking")
+            
+            elif event_type == "input_audio_buffer.speech_stopped":
+                if trace:
+                    trace.turn_started("speech_stopped")
+                await client_ws.send_json({"type": "speech_stopped"})
+                print("[Widget WS] User stopped speaking")
+            
+            elif event_type == "error":
+                error_msg = data.get("error", {}).get("message", "Unknown error")
+                await client_ws.send_json({
+                    "type": "error",
+                    "error": error_msg
+                })
+                print(f"[Widget WS] OpenAI error: {error_msg}")
+    
+    except Exception as e:
+        print(f"[Widget WS] Message handler error: {e}")
+    finally:
+        # Closed by OpenAI, not by us (idle, end of session) or a failed send to the widget
+        lost = session.upstream is openai_ws and openai_ws is not None and not openai_ws.open
+        try:
+            if openai_ws and openai_ws.open:
+                await openai_ws.close()
+        except:
+            pass
+        if lost:
+            session.upstream_lost()
+
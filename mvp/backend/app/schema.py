@@ -0,0 +1,69 @@
+"""
+Schema revision management
+
+Schema changes are applied by an explicit migrate step (`python migrate.py`,
+which runs `alembic upgrade head`). Workers never run DDL; at startup they
+only compare the revision stored in the database with the latest migration.
+"""
+import re
+from pathlib import Path
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from app.database import engine
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+VERSIONS_DIR = BACKEND_DIR / "alembic" / "versions"
+
+_REVISION = re.compile(r'^revision(?:: str)? = ["\'](\w+)["\']', re.MULTILINE)
+_DOWN_REVISION = re.compile(r'^down_revision(?:: [^=]+)? = ["\'](\w+)["\']', re.MULTILINE)
+
+
+def _alembic_config():
+    from alembic.config import Config
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    return config
+
+
+def get_head_revision() -> str:
+    """
+    Latest revision in alembic/versions (reads files, no database access).
+    Parsed directly so that workers do not import Alembic and Mako at startup.
+    """
+    revisions, parents = set(), set()
+    for path in VERSIONS_DIR.glob("*.py"):
+        source = path.read_text(encoding="utf-8")
+        revision = _REVISION.search(source)
+        if revision:
+            revisions.add(revision.group(1))
+        parents.update(_DOWN_REVISION.findall(source))
+    heads = revisions - parents
+    if len(heads) != 1:
+        raise RuntimeError(f"Expected a single migration head, found: {sorted(heads)}")
+    return heads.pop()
+
+
+def get_database_revision():
+    """Revision stored in the database, or None if it was never migrated"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except (OperationalError, ProgrammingError):
+        return None
+
+
+def check_schema_revision():
+    """Fail fast if the database is not migrated to the latest revision"""
+    head = get_head_revision()
+    current = get_database_revision()
+    if current != head:
+        raise RuntimeError(
+            f"Database schema is at revision {current or 'none'}, expected {head}. "
+            f"Run `python migrate.py` before starting the server."
+        )
+
+
+def upgrade_schema():
+    """Apply all pending migrations"""
+    from alembic import command
+    command.upgrade(_alembic_config(), "head")
@@ -32,6 +32,10 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+class UserProfilesRequest(BaseModel):
+    user_ids: List[int]
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -83,6 +87,12 @@ class AgentUpdate(BaseModel):
     agent_config: Optional[dict] = None
 
 
+class AgentBulkUpdate(BaseModel):
+    agent_ids: Optional[List[int]] = None  # Agents to change; all of the user's agents if omitted
+    openai_key_id: Optional[int] = None  # Only change agents using this API key
+    changes: AgentUpdate  # Fields to set on every matched agent (e.g. voice, VAD settings)
+
+
 class AgentResponse(BaseModel):
     id: int
     name: str
@@ -95,6 +105,7 @@ class AgentResponse(BaseModel):
     noise_reduction_prefix_padding_ms: int
     noise_reduction_silence_duration_ms: int
     agent_config: dict
+    capture_until: Optional[datetime] = None  # Sessions are being captured until then (set by superadmins)
     created_at: datetime
     updated_at: Optional[datetime]
     
@@ -3,7 +3,6 @@ Authentication utilities
 """
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
 import hashlib
 from app.config import settings
 
@@ -84,6 +83,7 @@ def get_password_hash(password: str) -> str:
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
+    from jose import jwt
     to_encode = data.copy()
     # Convert sub to string if it's an integer (JWT spec requires string)
     if "sub" in to_encode and isinstance(to_encode["sub"], int):
@@ -99,6 +99,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def decode_access_token(token: str) -> Optional[dict]:
     """Decode and verify a JWT token"""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         return payload
@@ -0,0 +1,182 @@
+"""
+Resumable batched data migrations
+
+A data migration walks a table in key order, a batch at a time. Each batch
+runs in its own short transaction together with the update of its
+checkpoint row, so the writer lock is only held for one batch and an
+interrupted run resumes after the last committed batch. Progress
+(throughput and ETA) is reported as batches complete.
+
+A dry run applies a few sample batches inside a transaction that is rolled
+back and extrapolates the duration of the full run from their timing.
+"""
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Callable, Optional
+from sqlalchemy import inspect, select, insert, update
+from sqlalchemy.engine import Connection, Engine
+from app.models.data_migration import DataMigrationCheckpoint
+
+checkpoints = DataMigrationCheckpoint.__table__
+
+
+class BatchMigration(ABC):
+    """
+    Base class for data migrations. Subclasses set `name` and implement
+    `count_remaining`, `fetch_batch` and `apply_batch` (a subclass missing one
+    can't be instantiated); the rows returned by `fetch_batch` must expose the
+    integer key as `row.key`, in ascending order.
+    """
+    name: str = ""
+
+    def setup(self, conn: Connection):
+        """Idempotent schema preparation (e.g. CREATE TABLE IF NOT EXISTS)"""
+
+    @abstractmethod
+    def count_remaining(self, conn: Connection, after_key: Optional[int]) -> int:
+        """Rows left after `after_key` (None: from the start)"""
+
+    @abstractmethod
+    def fetch_batch(self, conn: Connection, after_key: Optional[int], limit: int) -> list:
+        """The next `limit` rows after `after_key`, in key order"""
+
+    @abstractmethod
+    def apply_batch(self, conn: Connection, rows: list):
+        """Migrate the rows of one batch"""
+
+
+class MigrationProgress:
+    """Throughput and ETA of a running migration"""
+
+    def __init__(self, name: str, total: int, done_before: int = 0):
+        self.name = name
+        self.total = total
+        self.done_before = done_before
+        self.done = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        return (self.total - self.done) / self.rate if self.rate else None
+
+    @property
+    def estimated_duration(self) -> Optional[float]:
+        """Time to process all `total` rows at the current rate"""
+        return self.total / self.rate if self.rate else None
+
+    def __str__(self) -> str:
+        eta = f"{self.eta:.0f}s" if self.eta is not None else "?"
+        return (
+            f"{self.name}: {self.done_before + self.done:,}/{self.done_before + self.total:,} rows, "
+            f"{self.rate:,.0f} rows/s, ETA {eta}"
+        )
+
+
+def _load_checkpoint(conn: Connection, name: str):
+    if not inspect(conn).has_table(checkpoints.name):
+        return None
+    return conn.execute(select(checkpoints).where(checkpoints.c.name == name)).first()
+
+
+def _save_checkpoint(conn: Connection, name: str, **values):
+    conn.execute(
+        update(checkpoints).where(checkpoints.c.name == name)
+        .values(updated_at=datetime.now(timezone.utc), **values)
+    )
+
+
+def run_batched(
+    engine: Engine,
+    migration: BatchMigration,
+    batch_size: int = 500,
+    dry_run: bool = False,
+    sample_batches: int = 3,
+    pause: float = 0.0,
+    report: Callable[[MigrationProgress], None] = print,
+    report_interval: float = 1.0
+) -> MigrationProgress:
+    """
+    Apply `migration` in batches of `batch_size`, resuming from its
+    checkpoint. `pause` sleeps between batches to leave the database to
+    other writers. In dry-run mode nothing is committed and the returned
+    progress holds the sample timing and the `estimated_duration`.
+    Use an engine from `create_writer_engine` so DDL in `setup` is
+    transactional on SQLite.
+    """
+    with engine.begin() as conn:
+        checkpoint = _load_checkpoint(conn, migration.name)
+    if checkpoint is not None and checkpoint.completed_at is not None:
+        return MigrationProgress(migration.name, 0, checkpoint.rows_done)
+
+    last_key = checkpoint.last_key if checkpoint else None
+    rows_done = checkpoint.rows_done if checkpoint else 0
+
+    if dry_run:
+        return _estimate(engine, migration, last_key, rows_done, batch_size, sample_batches)
+
+    with engine.begin() as conn:
+        migration.setup(conn)
+        checkpoints.create(conn, checkfirst=True)
+        if checkpoint is None:
+            conn.execute(insert(checkpoints).values(name=migration.name, rows_done=0))
+        progress = MigrationProgress(migration.name, migration.count_remaining(conn, last_key), rows_done)
+
+    reported = time.perf_counter()
+    reported_done = None
+    while True:
+        with engine.begin() as conn:
+            rows = migration.fetch_batch(conn, last_key, batch_size)
+            if not rows:
+                _save_checkpoint(conn, migration.name, completed_at=datetime.now(timezone.utc))
+                break
+            migration.apply_batch(conn, rows)
+            last_key = rows[-1].key
+            rows_done += len(rows)
+            _save_checkpoint(conn, migration.name, last_key=last_key, rows_done=rows_done)
+
+        progress.done += len(rows)
+        if time.perf_counter() - reported >= report_interval:
+            reported = time.perf_counter()
+            reported_done = progress.done
+            report(progress)
+        if pause:
+            time.sleep(pause)
+
+    if reported_done != progress.done:
+        report(progress)
+    return progress
+
+
+def _estimate(
+    engine: Engine,
+    migration: BatchMigration,
+    last_key: Optional[int],
+    rows_done: int,
+    batch_size: int,
+    sample_batches: int
+) -> MigrationProgress:
+    conn = engine.connect()
+    transaction = conn.begin()
+    try:
+        migration.setup(conn)
+        progress = MigrationProgress(migration.name, migration.count_remaining(conn, last_key), rows_done)
+        for _ in range(sample_batches):
+            rows = migration.fetch_batch(conn, last_key, batch_size)
+            if not rows:
+                break
+            migration.apply_batch(conn, rows)
+            last_key = rows[-1].key
+            progress.done += len(rows)
+    finally:
+        transaction.rollback()
+        conn.close()
+    return progress
@@ -1,7 +1,6 @@
 """
 Encryption utilities for API keys
 """
-from cryptography.fernet import Fernet
 from app.config import settings
 import base64
 import hashlib
@@ -13,14 +12,25 @@ def get_encryption_key() -> bytes:
     return base64.urlsafe_b64encode(key)
 
 
+# Created on first use, so workers that never touch a key don't import cryptography
+_fernet = None
+
+
+def _get_fernet():
+    """Fernet instance for the configured secret key"""
+    global _fernet
+    if _fernet is None:
+        from cryptography.fernet import Fernet
+        _fernet = Fernet(get_encryption_key())
+    return _fernet
+
+
 def encrypt_api_key(api_key: str) -> str:
     """Encrypt an API key"""
-    f = Fernet(get_encryption_key())
-    return f.encrypt(api_key.encode()).decode()
+    return _get_fernet().encrypt(api_key.encode()).decode()
 
 
 def decrypt_api_key(encrypted_key: str) -> str:
     """Decrypt an API key"""
-    f = Fernet(get_encryption_key())
-    return f.decrypt(encrypted_key.encode()).decode()
+    return _get_fernet().decrypt(encrypted_key.encode()).decode()
 
@@ -0,0 +1,118 @@
+"""
+ETags and conditional GETs for dashboard resources
+
+Every agent, OpenAI key and assistant row carries a `version`, and every
+(collection, owner) pair a counter in `change_counters`. Both are bumped
+with SQL increments in the same transaction as the change, by the session
+hooks below, so every mutating route is covered without extra code.
+
+Routes compute the current ETag with one small query and answer
+`If-None-Match` with 304 before loading or serializing any rows.
+"""
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app.models.agent import Agent
+from app.models.assistant_config import AssistantConfig
+from app.models.change_counter import ChangeCounter
+from app.models.openai_key import OpenAIKey
+
+# Models with a version column, and the collection each one belongs to
+TRACKED_SCOPES = {
+    Agent: "agents",
+    OpenAIKey: "openai_keys",
+    AssistantConfig: "assistants",
+}
+
+# Clients must revalidate, but may keep a private copy to revalidate against
+CACHE_CONTROL = "private, no-cache"
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_row_versions(session, flush_context, instances):
+    """Increment `version` of every modified tracked row (atomic SQL increment)"""
+    for obj in session.dirty:
+        model = type(obj)
+        if model in TRACKED_SCOPES and session.is_modified(obj, include_collections=False):
+            obj.version = model.version + 1
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_change_counters(session, flush_context):
+    """Increment the counter of every collection touched by this flush"""
+    touched = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        scope = TRACKED_SCOPES.get(type(obj))
+        if scope and obj.user_id is not None:
+            touched.add((scope, obj.user_id))
+    
+    connection = session.connection()
+    for scope, owner_id in sorted(touched):
+        bump_change_counter(connection, scope, owner_id)
+
+
+def bump_change_counter(connection, scope: str, owner_id: int):
+    """
+    Increment a collection counter. Needed explicitly by bulk statements
+    (insert()/update() executed directly), which bypass the flush hooks.
+    One upsert, so concurrent first bumps of a counter can't both insert it.
+    """
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    statement = dialect_insert(ChangeCounter).values(scope=scope, owner_id=owner_id, counter=1)
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=[ChangeCounter.scope, ChangeCounter.owner_id],
+        set_={"counter": ChangeCounter.counter + 1}
+    ))
+
+
+def collection_etag(db: Session, scope: str, owner_id: int, request: Request) -> str:
+    """ETag of a collection listing: its change counter plus the query parameters"""
+    counter = db.execute(
+        select(ChangeCounter.counter).where(
+            ChangeCounter.scope == scope,
+            ChangeCounter.owner_id == owner_id
+        )
+    ).scalar() or 0
+    params = hashlib.sha1(str(sorted(request.query_params.multi_items())).encode()).hexdigest()[:12]
+    return f'W/"{scope}-{owner_id}-{counter}-{params}"'
+
+
+def resource_etag(db: Session, model, resource_id: int, owner_id: int) -> Optional[str]:
+    """ETag of a single row, or None if the row does not exist for this owner"""
+    version = db.execute(
+        select(model.version).where(model.id == resource_id, model.user_id == owner_id)
+    ).scalar()
+    if version is None:
+        return None
+    return f'W/"{TRACKED_SCOPES[model]}-{resource_id}-{version}"'
+
+
+def not_modified(request: Request, response: Response, etag: Optional[str]) -> Optional[Response]:
+    """
+    Set the ETag on `response`. If the client already holds this version,
+    return a 304 response for the route to return as-is.
+    """
+    if etag is None:
+        return None
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison: W/"x" matches "x"
+        if "*" in candidates or _opaque(etag) in {_opaque(tag) for tag in candidates}:
+            return Response(
+                status_code=304,
+                headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+            )
+    return None
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
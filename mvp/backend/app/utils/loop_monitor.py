@@ -0,0 +1,201 @@
+"""
+Event-loop lag monitor and slow-callback detector
+
+REST handlers (including their synchronous database and bcrypt calls) and
+every widget audio relay share one event loop per worker, so anything that
+blocks the loop delays audio for all live sessions.
+
+- Lag sampler: a callback rescheduled every `interval` with call_later
+  records how late it runs. The lateness is how long the loop was busy with
+  other callbacks, kept in a rolling window.
+- Slow-callback detector: a watcher thread notices when the sampler is
+  overdue by more than `threshold`. It captures the loop thread's stack
+  while the blocking code is still running. When the sampler finally runs,
+  the stall's duration is known and the stall is added to the report,
+  aggregated by code path: `entry` is the outermost application frame
+  (the route handler or relay loop), `site` the innermost one.
+
+The cost is one call_later callback per interval on the loop and a thread
+waking a few times per threshold.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from app.config import settings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _is_app_frame(filename: str) -> bool:
+    return filename.startswith(BACKEND_DIR) and "site-packages" not in filename
+
+
+def _where(frame: traceback.FrameSummary) -> str:
+    filename = frame.filename
+    if "site-packages" + os.sep in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    elif filename.startswith(BACKEND_DIR):
+        filename = os.path.relpath(filename, BACKEND_DIR)
+    return f"{frame.name} ({filename}:{frame.lineno})"
+
+
+class LoopMonitor:
+    """Samples loop lag and records stalls longer than `threshold` seconds"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float, threshold: float, window: int, keep: int):
+        self.loop = loop
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: deque = deque(maxlen=window)
+        self.recent: deque = deque(maxlen=keep)
+        self.sites: Dict[tuple, dict] = {}
+        self.ticks = 0
+        self.stalls = 0
+        self.stalled_seconds = 0.0
+        self.max_lag = 0.0
+        self._lock = threading.Lock()
+        self._pending: Optional[dict] = None
+        self._expected = 0.0
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start sampling; call from the loop's thread"""
+        self._loop_thread_id = threading.get_ident()
+        self._expected = time.perf_counter() + self.interval
+        self._handle = self.loop.call_later(self.interval, self._tick)
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _tick(self):
+        now = time.perf_counter()
+        lag = max(0.0, now - self._expected)
+        self.ticks += 1
+        self.lags.append(lag)
+        if lag > self.max_lag:
+            self.max_lag = lag
+        with self._lock:
+            stall, self._pending = self._pending, None
+        if stall is not None:
+            self._record_stall(stall, lag)
+        self._expected = now + self.interval
+        self._handle = self.loop.call_later(self.interval, self._tick)
+
+    def _watch(self):
+        period = self.threshold / 4
+        while not self._stop.wait(period):
+            if time.perf_counter() - self._expected <= self.threshold or self._pending is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            task = asyncio.current_task(self.loop)
+            with self._lock:
+                if self._pending is None:
+                    self._pending = {
+                        "at": datetime.now(timezone.utc).isoformat(),
+                        "task": task.get_name() if task else None,
+                        "stack": stack,
+                    }
+
+    def _record_stall(self, stall: dict, duration: float):
+        stack: List[traceback.FrameSummary] = stall.pop("stack")
+        app_frames = [frame for frame in stack if _is_app_frame(frame.filename)]
+        # Prefer the route handler over application middleware as the entry point
+        route_frames = [frame for frame in app_frames if f"{os.sep}routes{os.sep}" in frame.filename]
+        entry = _where((route_frames or app_frames or stack)[0])
+        site = _where(app_frames[-1]) if app_frames else _where(stack[-1])
+        stall.update({
+            "duration_ms": round(duration * 1000, 1),
+            "entry": entry,
+            "site": site,
+            "stack": [_where(frame) for frame in stack],
+        })
+        self.stalls += 1
+        self.stalled_seconds += duration
+        self.recent.append(stall)
+
+        aggregate = self.sites.setdefault((entry, site), {
+            "entry": entry, "site": site, "count": 0, "total_ms": 0.0, "max_ms": 0.0
+        })
+        aggregate["count"] += 1
+        aggregate["total_ms"] = round(aggregate["total_ms"] + duration * 1000, 1)
+        aggregate["max_ms"] = max(aggregate["max_ms"], round(duration * 1000, 1))
+        print(f"[Loop monitor] Event loop blocked for {duration * 1000:.0f} ms in {site} (from {entry})")
+
+    def metrics(self) -> dict:
+        """Counters and lag percentiles over the rolling window"""
+        lags = sorted(self.lags)
+
+        def percentile(fraction: float) -> float:
+            if not lags:
+                return 0.0
+            return round(lags[min(len(lags) - 1, int(fraction * len(lags)))] * 1000, 3)
+
+        return {
+            "loop_lag_ms_p50": percentile(0.5),
+            "loop_lag_ms_p99": percentile(0.99),
+            "loop_lag_ms_window_max": round(lags[-1] * 1000, 3) if lags else 0.0,
+            "loop_lag_ms_max": round(self.max_lag * 1000, 3),
+            "loop_lag_window_seconds": round(len(lags) * self.interval, 1),
+            "loop_ticks_total": self.ticks,
+            "loop_stalls_total": self.stalls,
+            "loop_stalled_seconds_total": round(self.stalled_seconds, 3),
+        }
+
+    def report(self, recent: int = 20) -> dict:
+        """Metrics, stall totals by code path (worst first) and the latest stalls with stacks"""
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "metrics": self.metrics(),
+            "by_code_path": sorted(self.sites.values(), key=lambda site: site["total_ms"], reverse=True),
+            "recent": list(reversed(self.recent))[:recent],
+        }
+
+
+_monitor: Optional[LoopMonitor] = None
+
+
+def get_loop_monitor() -> Optional[LoopMonitor]:
+    return _monitor
+
+
+def start_loop_monitor() -> Optional[LoopMonitor]:
+    """Start monitoring the running loop if enabled in settings"""
+    global _monitor
+    if settings.loop_monitor_enabled and _monitor is None:
+        _monitor = LoopMonitor(
+            asyncio.get_running_loop(),
+            settings.loop_monitor_interval_ms / 1000,
+            settings.slow_callback_threshold_ms / 1000,
+            settings.loop_monitor_window,
+            settings.slow_callback_keep
+        )
+        _monitor.start()
+    return _monitor
+
+
+def stop_loop_monitor():
+    global _monitor
+    if _monitor is not None:
+        _monitor.stop()
+        _monitor = None
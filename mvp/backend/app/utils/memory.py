@@ -0,0 +1,237 @@
+"""
+Memory introspection and leak detection
+
+- tracemalloc snapshots on demand: the first request starts tracing, every
+  snapshot is compared with the previous one so the growth between two
+  calls can be attributed to the code that allocated it
+- live object and task counts to compare against the number of sessions
+- MemoryWatchdog: a background task that periodically checks the session
+  counters, orphaned relay tasks and RSS growth, and logs anomalies
+
+All of it is per worker process.
+"""
+import asyncio
+import gc
+import os
+import time
+import tracemalloc
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Callable, Optional
+from app.config import settings
+
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux), None where unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def task_counts() -> dict:
+    """Pending asyncio tasks of the running loop, by coroutine"""
+    tasks = asyncio.all_tasks()
+    by_coroutine = Counter(getattr(task.get_coro(), "__qualname__", "?") for task in tasks)
+    return {"total": len(tasks), "by_coroutine": dict(by_coroutine.most_common())}
+
+
+def count_objects(*types: type) -> dict:
+    """
+    Live instances of `types` found by the garbage collector. Walks every
+    tracked object, so it is for on-demand use, not for the watchdog.
+    """
+    names = {cls: f"{cls.__module__}.{cls.__qualname__}" for cls in types}
+    counts = dict.fromkeys(names.values(), 0)
+    for obj in gc.get_objects():
+        for cls, name in names.items():
+            if isinstance(obj, cls):
+                counts[name] += 1
+    return counts
+
+
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+_last_snapshot_at: Optional[str] = None
+
+# Allocations of the tracer itself are noise
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def _format_stat(stat, group_by: str) -> dict:
+    if group_by == "traceback":
+        where = [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+    else:
+        frame = stat.traceback[0]
+        where = f"{frame.filename}:{frame.lineno}" if group_by == "lineno" else frame.filename
+    entry = {"where": where, "size_bytes": stat.size, "count": stat.count}
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_bytes"] = stat.size_diff
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+def take_snapshot(top: int = 20, group_by: str = "lineno") -> dict:
+    """
+    Snapshot traced allocations, report the top allocators and the change
+    since the previous snapshot. Starts tracemalloc (with
+    `tracemalloc_frames` frames) if it is not tracing yet; the first
+    snapshot after that only covers allocations made since.
+    CPU-heavy with many traced blocks, run it off the event loop.
+    """
+    global _last_snapshot, _last_snapshot_at
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(settings.tracemalloc_frames)
+
+    snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+    taken_at = datetime.now(timezone.utc).isoformat()
+    current, peak = tracemalloc.get_traced_memory()
+    report = {
+        "taken_at": taken_at,
+        "started_tracing": started_tracing,
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "top": [_format_stat(stat, group_by) for stat in snapshot.statistics(group_by)[:top]],
+        "previous_taken_at": _last_snapshot_at,
+        "growth": None,
+    }
+    if _last_snapshot is not None:
+        diff = snapshot.compare_to(_last_snapshot, group_by)
+        report["growth"] = [_format_stat(stat, group_by) for stat in diff[:top] if stat.size_diff]
+
+    _last_snapshot, _last_snapshot_at = snapshot, taken_at
+    return report
+
+
+def stop_tracing():
+    """Stop tracemalloc and drop the kept snapshot"""
+    global _last_snapshot, _last_snapshot_at
+    tracemalloc.stop()
+    _last_snapshot = _last_snapshot_at = None
+
+
+def tracing_status() -> dict:
+    if not tracemalloc.is_tracing():
+        return {"tracing": False}
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": True,
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+        "last_snapshot_at": _last_snapshot_at,
+    }
+
+
+class MemoryWatchdog:
+    """
+    Periodically compares session counters, orphaned relay tasks and RSS
+    and logs anything that looks like a leak. `session_stats` returns the
+    counters of app.routes.widget_realtime.session_stats.
+    """
+
+    def __init__(self, session_stats: Callable[[], dict], interval: float, rss_growth_bytes: int):
+        self.session_stats = session_stats
+        self.interval = interval
+        self.rss_growth_bytes = rss_growth_bytes
+        self.last_check: Optional[dict] = None
+        self.anomalies: deque = deque(maxlen=100)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"[Memory watchdog] Check failed: {e}")
+
+    def check(self) -> list:
+        """Take one set of readings and return (and log) the anomalies found"""
+        stats = self.session_stats()
+        check = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "monotonic": time.monotonic(),
+            "rss_bytes": rss_bytes(),
+            "tasks": len(asyncio.all_tasks()),
+            **stats,
+        }
+        previous = self.last_check
+        found = []
+
+        if stats["upstream_connections"] > stats["active_sessions"]:
+            found.append(
+                f"{stats['upstream_connections']} upstream connections tracked "
+                f"for {stats['active_sessions']} active sessions"
+            )
+        # A relay task outlives its session for a moment; only a lasting count is a leak
+        if stats["orphaned_relay_tasks"] and previous and previous["orphaned_relay_tasks"]:
+            found.append(f"{stats['orphaned_relay_tasks']} relay tasks still running after their session ended")
+        if previous and check["rss_bytes"] is not None and previous["rss_bytes"] is not None:
+            growth = check["rss_bytes"] - previous["rss_bytes"]
+            if growth > self.rss_growth_bytes and stats["active_sessions"] <= previous["active_sessions"]:
+                found.append(
+                    f"RSS grew by {growth / 2**20:.1f} MB in {check['monotonic'] - previous['monotonic']:.0f}s "
+                    f"without more sessions ({stats['active_sessions']} active)"
+                )
+        # Tasks piling up while sessions do not
+        if (
+            previous
+            and stats["active_sessions"] <= previous["active_sessions"]
+            and check["tasks"] - previous["tasks"] > settings.memory_watchdog_task_growth
+        ):
+            found.append(
+                f"{check['tasks'] - previous['tasks']} more asyncio tasks than at the last check "
+                f"({check['tasks']} in total) without more sessions"
+            )
+
+        self.last_check = check
+        for message in found:
+            print(f"[Memory watchdog] {message}")
+            self.anomalies.append({"at": check["at"], "message": message})
+        return found
+
+
+_watchdog: Optional[MemoryWatchdog] = None
+
+
+def get_memory_watchdog() -> Optional[MemoryWatchdog]:
+    return _watchdog
+
+
+def start_memory_watchdog(session_stats: Callable[[], dict]) -> Optional[MemoryWatchdog]:
+    """Start the watchdog if enabled in settings (memory_watchdog_interval_s > 0)"""
+    global _watchdog
+    if settings.memory_watchdog_interval_s > 0 and _watchdog is None:
+        _watchdog = MemoryWatchdog(
+            session_stats,
+            settings.memory_watchdog_interval_s,
+            settings.memory_watchdog_rss_growth_mb * 2**20
+        )
+        _watchdog.start()
+    return _watchdog
+
+
+async def stop_memory_watchdog():
+    global _watchdog
+    if _watchdog is not None:
+        await _watchdog.stop()
+        _watchdog = None
@@ -0,0 +1,111 @@
+"""
+Keyset pagination and sparse fieldsets for list endpoints
+
+List endpoints accept:
+- `limit`: page size; without it the whole list is returned as before
+- `cursor`: opaque cursor from the previous page's `X-Next-Cursor` header
+- `fields`: comma-separated response fields; only those columns (plus `id`)
+  are selected from the database
+
+Pages are ordered by primary key and continue with `id > last id`, so
+fetching any page costs the same regardless of how deep it is.
+"""
+import base64
+import json
+from typing import List, Optional, Type
+from fastapi import HTTPException, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+LimitQuery = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size (omit for the full list)")
+CursorQuery = Query(None, description="Cursor from the previous page's X-Next-Cursor header")
+FieldsQuery = Query(None, description="Comma-separated fields to return, e.g. id,name")
+
+
+def encode_cursor(last_id: int) -> str:
+    """Encode the last id of a page as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Decode a cursor produced by encode_cursor"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))["id"]
+        if not isinstance(last_id, int):
+            raise ValueError(last_id)
+        return last_id
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def select_columns(model, schema: Type[BaseModel], fields: Optional[str]) -> Optional[List]:
+    """
+    Map a `fields=` parameter to model columns. Only fields of the response
+    schema can be requested, so hidden columns (hashes, encrypted keys) stay
+    hidden. Returns None when all fields are wanted.
+    """
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in schema.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {unknown}. Must be among: {list(schema.model_fields)}"
+        )
+    names = ["id"] + [f for f in dict.fromkeys(requested) if f != "id"]
+    return [getattr(model, name) for name in names]
+
+
+def list_page(
+    db: Session,
+    model,
+    schema: Type[BaseModel],
+    filters: list,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None
+):
+    """
+    Run a keyset-paginated, optionally projected list query for `model`.
+    Full rows are returned as ORM objects (validated by the route's
+    response_model); projected rows are returned directly as JSON.
+    """
+    columns = select_columns(model, schema, fields)
+    query = db.query(*columns) if columns else db.query(model)
+    query = query.filter(*filters)
+    
+    last_id = decode_cursor(cursor)
+    if last_id is not None:
+        query = query.filter(model.id > last_id)
+    query = query.order_by(model.id)
+    
+    headers = {}
+    if limit:
+        rows = query.limit(limit + 1).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
+    else:
+        rows = query.all()
+    
+    if columns:
+        # Returning a Response bypasses the injected one, so carry its headers over
+        for name in ("ETag", "Cache-Control"):
+            if name in response.headers:
+                headers[name] = response.headers[name]
+        return JSONResponse(jsonable_encoder([row._asdict() for row in rows]), headers=headers)
+    response.headers.update(headers)
+    return rows
@@ -0,0 +1,225 @@
+"""
+Sampling CPU profiler for live workers
+
+A background thread samples the Python stacks of the worker's threads at a
+fixed interval (sys._current_frames) and counts identical stacks. The event
+loop thread runs both the REST handlers and the widget relay tasks, so
+their frames appear under "MainThread"; threadpool work appears under its
+own thread names. Profiles are returned in the collapsed stack format
+("root;caller;callee count" per line), which flamegraph.pl, inferno and
+speedscope read directly.
+
+Two ways to profile:
+- `profile_for(seconds)` samples every thread of the worker for a fixed time
+  (superadmin endpoint GET /api/debug/profile)
+- RequestProfilingMiddleware profiles single HTTP requests sent with an
+  `X-Profile` header, for a configurable fraction of them, counting only
+  samples in which the request's own task was running. The response
+  carries `X-Profile-Id`; the profile is kept in memory for
+  GET /api/debug/profiles/{id}
+"""
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+from app.config import settings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PROFILE_HEADER = "x-profile"
+
+
+_frame_names: Dict[object, str] = {}
+
+
+def _frame_name(code) -> str:
+    """`function (path:line)` for a code object, with short paths; cached"""
+    name = _frame_names.get(code)
+    if name is None:
+        path = code.co_filename
+        if "site-packages" + os.sep in path:
+            path = path.split("site-packages" + os.sep, 1)[1]
+        elif path.startswith(BACKEND_DIR):
+            path = os.path.relpath(path, BACKEND_DIR)
+        elif os.sep in path:
+            path = os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+        # ';' separates frames in the collapsed format
+        name = f"{code.co_qualname} ({path}:{code.co_firstlineno})".replace(";", ",")
+        _frame_names[code] = name
+    return name
+
+
+# Leaf frames of a thread that is waiting rather than running
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    # uvloop waits (and runs its own callbacks) in C, below Runner.run
+    ("runners.py", "run"),
+}
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES
+
+
+def _stack(frame, root: str) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    names.append(root)
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Samples thread stacks every `interval` seconds until stopped. With
+    `thread_id`, only that thread is sampled (under `root` instead of the
+    thread name, if given), and with `accept` only samples for which
+    `accept()` returns True are counted. Threads blocked waiting (an idle
+    event loop, parked pool threads) are skipped unless `idle` is set.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        thread_id: Optional[int] = None,
+        accept: Optional[Callable[[], bool]] = None,
+        root: Optional[str] = None,
+        idle: bool = False
+    ):
+        self.interval = interval
+        self.idle = idle
+        self.thread_id = thread_id
+        self.accept = accept
+        self.root = root
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        """Stop sampling and return the stack counts"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self.stacks
+
+    def _run(self):
+        own_id = threading.get_ident()
+        interval = self.interval
+        while not self._stop.wait(interval):
+            self.sample(own_id)
+
+    def sample(self, own_id: int):
+        if self.accept is not None and not self.accept():
+            return
+        frames = sys._current_frames()
+        if self.thread_id is not None:
+            frame = frames.get(self.thread_id)
+            if frame is not None and (self.idle or not _is_idle(frame)):
+                self.stacks[_stack(frame, self.root or "thread")] += 1
+        else:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in frames.items():
+                if thread_id != own_id and (self.idle or not _is_idle(frame)):
+                    self.stacks[_stack(frame, names.get(thread_id, "thread"))] += 1
+        self.samples += 1
+
+
+def collapsed(stacks: Counter) -> str:
+    """Collapsed stack format, heaviest stacks first"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+_profile_lock = asyncio.Lock()
+
+
+def profile_running() -> bool:
+    return _profile_lock.locked()
+
+
+async def profile_for(seconds: float, interval: float, idle: bool = False) -> Counter:
+    """Sample all threads of this worker for `seconds`; one profile at a time"""
+    async with _profile_lock:
+        profiler = SamplingProfiler(interval, idle=idle)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stacks = profiler.stop()
+    return stacks
+
+
+# Request profiles, newest last
+request_profiles: "OrderedDict[str, dict]" = OrderedDict()
+_request_profiler_busy = False
+
+
+class RequestProfilingMiddleware:
+    """Profiles HTTP requests sent with an X-Profile header (at `request_profile_rate`)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _request_profiler_busy
+        if (
+            scope["type"] != "http"
+            or _request_profiler_busy
+            or settings.request_profile_rate <= 0
+            or not any(name == PROFILE_HEADER.encode() for name, _ in scope["headers"])
+            or random.random() >= settings.request_profile_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        # One request profile at a time keeps the sampling cost bounded
+        _request_profiler_busy = True
+        profile_id = uuid.uuid4().hex[:12]
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        profiler = SamplingProfiler(
+            settings.profile_interval_ms / 1000,
+            thread_id=threading.get_ident(),
+            accept=lambda: asyncio.current_task(loop) is task,
+            root=f"{scope['method']} {scope['path']}"
+        )
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            stacks = profiler.stop()
+            _request_profiler_busy = False
+            request_profiles[profile_id] = {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "started_at": started_at.isoformat(),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                "samples": sum(stacks.values()),
+                "stacks": stacks,
+            }
+            while len(request_profiles) > settings.request_profile_keep:
+                request_profiles.popitem(last=False)
@@ -0,0 +1,112 @@
+"""
+Per-route SQL query budgets
+
+Routes declare how many statements one request (or one widget session) may
+send with the `query_budget` decorator:
+
+    @router.get("")
+    @query_budget(3)
+    async def list_agents(...):
+
+QueryBudgetMiddleware counts the statements sent on the application engine
+while serving each HTTP request or WebSocket session (the count follows sync
+handlers into the threadpool through a context variable) and compares them
+with the route's budget. What happens on a breach depends on
+`query_budget_mode`:
+- "warn" (the default when DEBUG, i.e. local and dev): log a `[Query budget]`
+  line with the statements sent
+- "raise": raise QueryBudgetExceeded after the response, which fails the
+  request in tests (see benchmarks/query_budgets.py)
+- "off": don't count
+
+`count_queries()` counts the statements of a block for use in checks.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+from sqlalchemy import event
+from app.config import settings
+from app.database import engine
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A route sent more SQL statements than its declared budget"""
+
+
+class QueryCount:
+    __slots__ = ("count", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.statements: List[str] = []
+
+
+_current: ContextVar[Optional[QueryCount]] = ContextVar("query_count", default=None)
+
+# Statements kept per count for the breach message
+KEEP_STATEMENTS = 20
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counted = _current.get()
+    if counted is not None:
+        counted.count += 1
+        if len(counted.statements) < KEEP_STATEMENTS:
+            counted.statements.append(" ".join(statement.split())[:160])
+
+
+@contextmanager
+def count_queries():
+    """Count the statements sent on the application engine inside the block"""
+    counted = QueryCount()
+    token = _current.set(counted)
+    try:
+        yield counted
+    finally:
+        _current.reset(token)
+
+
+def query_budget(limit: int):
+    """Declare the most statements one call of the decorated route may send"""
+    def decorate(endpoint):
+        endpoint.query_budget = limit
+        return endpoint
+    return decorate
+
+
+def budget_mode() -> str:
+    return settings.query_budget_mode or ("warn" if settings.debug else "off")
+
+
+def check_budget(route: str, limit: int, counted: QueryCount, mode: str):
+    if counted.count <= limit:
+        return
+    message = f"{route} sent {counted.count} SQL statements, its budget is {limit}"
+    if mode == "raise":
+        raise QueryBudgetExceeded(message + ":\n  " + "\n  ".join(counted.statements))
+    print(f"[Query budget] {message}")
+    for statement in counted.statements:
+        print(f"[Query budget]   {statement}")
+
+
+class QueryBudgetMiddleware:
+    """Checks HTTP requests and WebSocket sessions against their route's query budget"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        mode = budget_mode()
+        if scope["type"] not in ("http", "websocket") or mode == "off":
+            await self.app(scope, receive, send)
+            return
+
+        with count_queries() as counted:
+            await self.app(scope, receive, send)
+        # Routing fills in the endpoint
+        endpoint = scope.get("endpoint")
+        limit = getattr(endpoint, "query_budget", None)
+        if limit is not None:
+            route = f"{endpoint.__name__} ({scope.get('method', 'WS')} {scope['path']})"
+            check_budget(route, limit, counted, mode)
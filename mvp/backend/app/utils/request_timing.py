@@ -0,0 +1,254 @@
+"""
+Per-route latency breakdown and Server-Timing headers
+
+Every HTTP request is split into three parts:
+- db: time spent executing SQL on the application engine, measured with
+  SQLAlchemy cursor events and attributed to the request through a
+  context variable (which also follows sync handlers and dependencies
+  into the threadpool)
+- handler: the rest of the time until the route function returns
+  (dependencies, authentication, the handler's own code)
+- serialization: from the route function's return to the response start
+  (response_model validation, jsonable_encoder, JSON rendering)
+
+RequestTimingMiddleware adds them as a `Server-Timing` header, which the
+browser's dev tools show next to each request, and records them in
+per-route histograms (GET /api/debug/latency). `instrument_routes(app)`
+marks where each route function returns and must run after the routers
+are included.
+
+Writes handed to the write coordinator run on its own thread and count as
+handler time of the waiting request. Row fetching after a statement's first
+rows (large SQLite results) also counts as handler time.
+"""
+import asyncio
+import functools
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from fastapi.routing import APIRoute
+from app.config import settings
+from app.database import engine
+
+# Upper bounds in ms; the last bucket is everything above
+BUCKETS_MS = [1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+PARTS = ["total", "handler", "db", "serialization"]
+
+
+class RequestTiming:
+    """Timings of the request being served"""
+
+    __slots__ = ("scope", "start", "db", "queries", "returned_at", "db_at_return")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.start = time.perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.returned_at: Optional[float] = None
+        self.db_at_return = 0.0
+
+
+_current: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timing = _current.get()
+    if timing is not None and conn.info.get("query_start"):
+        timing.db += time.perf_counter() - conn.info["query_start"].pop()
+        timing.queries += 1
+
+
+@event.listens_for(engine, "handle_error")
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float):
+        index = 0
+        while index < len(BUCKETS_MS) and ms > BUCKETS_MS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the percentile (the max for the last bucket)"""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return BUCKETS_MS[index] if index < len(BUCKETS_MS) else round(self.max_ms, 3)
+        return round(self.max_ms, 3)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(BUCKETS_MS, self.counts)},
+                "inf": self.counts[-1],
+            },
+        }
+
+
+# "METHOD /path/{param}" -> part -> histogram
+route_histograms: Dict[str, Dict[str, Histogram]] = {}
+_route_paths: Dict[object, str] = {}
+
+
+def _route_label(scope) -> str:
+    return f"{scope['method']} {_route_paths.get(scope.get('endpoint'), 'unmatched')}"
+
+
+def current_route() -> Optional[str]:
+    """"METHOD /path/{param}" of the HTTP request being served, if any"""
+    timing = _current.get()
+    return _route_label(timing.scope) if timing is not None else None
+
+
+def _mark_returned():
+    timing = _current.get()
+    if timing is not None:
+        timing.returned_at = time.perf_counter()
+        timing.db_at_return = timing.db
+
+
+def _timed_call(call):
+    """Wrap a route function (keeping it sync or async) to note when it returns"""
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def timed(**values):
+            try:
+                return await call(**values)
+            finally:
+                _mark_returned()
+    else:
+        @functools.wraps(call)
+        def timed(**values):
+            try:
+                return call(**values)
+            finally:
+                _mark_returned()
+    return timed
+
+
+def instrument_routes(app):
+    """Wrap the functions of all API routes of `app`; call after include_router"""
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.endpoint not in _route_paths:
+            _route_paths[route.endpoint] = route.path_format
+            # The request handler looks the call up on its dependant per request
+            route.dependant.call = _timed_call(route.dependant.call)
+
+
+def _format_header(parts: Dict[str, float], queries: int) -> bytes:
+    return (
+        f'handler;dur={parts["handler"]:.1f}, '
+        f'db;dur={parts["db"]:.1f};desc="{queries} queries", '
+        f'serialization;dur={parts["serialization"]:.1f}, '
+        f'total;dur={parts["total"]:.1f}'
+    ).encode()
+
+
+class RequestTimingMiddleware:
+    """Adds Server-Timing headers and records per-route latency histograms"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.request_timing_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming(scope)
+        token = _current.set(timing)
+        parts: Optional[Dict[str, float]] = None
+
+        async def send_with_timing(message):
+            nonlocal parts
+            if message["type"] == "http.response.start" and parts is None:
+                parts = _split(timing, time.perf_counter())
+                if settings.server_timing_header:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _format_header(parts, timing.queries)))
+                    origin = _header(scope, b"origin")
+                    if origin is not None and origin.decode("latin-1") in settings.cors_origins:
+                        # Cross-origin dev tools only show Server-Timing with this header
+                        headers.append((b"timing-allow-origin", origin))
+                    message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if parts is None:
+                parts = _split(timing, time.perf_counter())
+            histograms = route_histograms.setdefault(
+                _route_label(scope), {part: Histogram() for part in PARTS}
+            )
+            for part, ms in parts.items():
+                histograms[part].observe(ms)
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+def _split(timing: RequestTiming, now: float) -> Dict[str, float]:
+    """Total, handler, db and serialization time in ms"""
+    total = now - timing.start
+    returned_at = timing.returned_at if timing.returned_at is not None else now
+    db_at_return = timing.db_at_return if timing.returned_at is not None else timing.db
+    handler = max(0.0, returned_at - timing.start - db_at_return)
+    serialization = max(0.0, now - returned_at - (timing.db - db_at_return))
+    return {
+        "total": total * 1000,
+        "handler": handler * 1000,
+        "db": timing.db * 1000,
+        "serialization": serialization * 1000,
+    }
+
+
+def latency_report(route: Optional[str] = None) -> List[dict]:
+    """Histograms per route, slowest p95 total first"""
+    report = [
+        {"route": name, **{part: histogram.to_dict() for part, histogram in histograms.items()}}
+        for name, histograms in route_histograms.items()
+        if route is None or route in name
+    ]
+    return sorted(report, key=lambda entry: entry["total"]["p95_ms"] or 0, reverse=True)
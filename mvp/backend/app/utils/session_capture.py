@@ -0,0 +1,360 @@
+"""
+Realtime session capture
+
+Records both directions of a proxied widget session (frames received from
+the widget and frames received from OpenAI) to an append-only binary file,
+so a session with choppy audio can be inspected and replayed
+(benchmarks/replay.py). Nothing is captured unless the operator sets
+SESSION_CAPTURE_ENABLED; a superadmin then enables capture per agent until a
+given time (Agent.capture_until, /api/debug/captures).
+
+File layout, little-endian:
+    b"RTCAP1\\n"                          magic
+    u32 length, JSON                      metadata (agent, start time, ...)
+    u64 offset_ns, u8 direction, u32 length, payload     one per frame
+
+offset_ns is time.monotonic_ns() since the capture started, taken on the
+event loop when the frame arrives. The loop only stamps and queues frames;
+one background thread does all file I/O. When the writer falls behind by
+more than `session_capture_queue_bytes`, or a file reaches
+`session_capture_max_bytes`, frames are dropped and counted instead of
+slowing the relay. The count is written in a final END record.
+
+Captures hold callers' audio, so disk use is bounded: no capture starts once
+the directory holds `session_capture_max_files` files or
+`session_capture_max_total_bytes`, and running captures drop frames past the
+byte limit. A periodic sweep deletes files older than
+`session_capture_retention_hours` and re-measures the directory, which the
+workers share; in between, each worker adds what it wrote itself.
+"""
+import asyncio
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, NamedTuple, Optional, Union
+from app.config import settings
+
+MAGIC = b"RTCAP1\n"
+SUFFIX = ".rtcap"
+LENGTH = struct.Struct("<I")
+RECORD = struct.Struct("<QBI")
+
+# Record directions
+CLIENT = 0  # Widget -> server
+UPSTREAM = 1  # OpenAI -> server
+END = 255  # Trailer: JSON summary (frames, dropped)
+
+_STOP = object()
+
+
+class CaptureWriter:
+    """Writes queued capture records on a single background thread"""
+
+    def __init__(self, max_pending_bytes: int):
+        self.max_pending_bytes = max_pending_bytes
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the writer thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="session-capture", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Write everything queued and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def put(self, capture: "SessionCapture", chunks: tuple, force: bool = False) -> bool:
+        """Queue `chunks` for the capture's file; False if the backlog is full"""
+        size = sum(len(chunk) for chunk in chunks)
+        with self._lock:
+            if not force and self._pending + size > self.max_pending_bytes:
+                return False
+            self._pending += size
+        self._queue.put((capture, chunks, size))
+        return True
+
+    def _run(self):
+        files = {}
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                break
+            capture, chunks, size = job
+            try:
+                file = files.get(capture)
+                if file is None and not capture.failed:
+                    file = files[capture] = open(capture.path, "ab")
+                if file is not None:
+                    if chunks:
+                        file.writelines(chunks)
+                    else:
+                        # An empty job closes the capture
+                        file.close()
+                        del files[capture]
+            except OSError as e:
+                print(f"[Session capture] Writing {capture.path} failed: {e}")
+                capture.failed = True
+                files.pop(capture, None)
+            with self._lock:
+                self._pending -= size
+            if self._queue.empty():
+                for file in files.values():
+                    file.flush()
+        for file in files.values():
+            file.close()
+
+
+class CaptureUsage:
+    """Capture files and bytes on disk: as of the last sweep, plus what this worker wrote since"""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.measured = False
+
+    @property
+    def max_files(self) -> int:
+        return settings.session_capture_max_files
+
+    @property
+    def max_bytes(self) -> int:
+        return settings.session_capture_max_total_bytes
+
+    def full(self) -> bool:
+        return self.files >= self.max_files or self.bytes >= self.max_bytes
+
+    def as_dict(self) -> dict:
+        return {"files": self.files, "bytes": self.bytes, "max_files": self.max_files, "max_bytes": self.max_bytes}
+
+
+class SessionCapture:
+    """One captured session; `record` is called on the event loop"""
+
+    def __init__(self, writer: CaptureWriter, path: str, metadata: dict, max_bytes: int, usage: CaptureUsage):
+        self.writer = writer
+        self.path = path
+        self.max_bytes = max_bytes
+        self.usage = usage
+        self.started_ns = time.monotonic_ns()
+        self.frames = 0
+        self.dropped = 0
+        self.written = 0
+        self.closed = False
+        self.failed = False
+        header = json.dumps(metadata).encode()
+        writer.put(self, (MAGIC, LENGTH.pack(len(header)), header), force=True)
+        usage.files += 1
+        usage.bytes += len(MAGIC) + LENGTH.size + len(header)
+
+    def record(self, direction: int, frame: Union[str, bytes]):
+        """Stamp and queue one frame"""
+        if self.closed:
+            return
+        offset = time.monotonic_ns() - self.started_ns
+        payload = frame.encode() if isinstance(frame, str) else frame
+        size = RECORD.size + len(payload)
+        if (
+            self.failed
+            or self.written + size > self.max_bytes
+            or self.usage.bytes + size > self.usage.max_bytes
+            or not self.writer.put(self, (RECORD.pack(offset, direction, len(payload)), payload))
+        ):
+            self.dropped += 1
+            return
+        self.written += size
+        self.usage.bytes += size
+        self.frames += 1
+
+    def close(self):
+        """Write the END record and close the file"""
+        if self.closed:
+            return
+        self.closed = True
+        summary = json.dumps({"frames": self.frames, "dropped": self.dropped}).encode()
+        offset = time.monotonic_ns() - self.started_ns
+        self.writer.put(self, (RECORD.pack(offset, END, len(summary)), summary), force=True)
+        self.writer.put(self, (), force=True)
+        if self.dropped:
+            print(f"[Session capture] {self.path}: dropped {self.dropped} of {self.frames + self.dropped} frames")
+
+
+_writer: Optional[CaptureWriter] = None
+usage = CaptureUsage()
+
+
+def capture_active(capture_until: Optional[datetime]) -> bool:
+    """Whether an agent with this Agent.capture_until is being captured now"""
+    if not settings.session_capture_enabled or capture_until is None:
+        return False
+    if capture_until.tzinfo is None:
+        # SQLite hands back naive datetimes; they are stored in UTC
+        capture_until = capture_until.replace(tzinfo=timezone.utc)
+    return capture_until > datetime.now(timezone.utc)
+
+
+def start_capture(agent_id: int, **metadata) -> Optional[SessionCapture]:
+    """
+    Start capturing a session of `agent_id`; None if capture is disabled, the
+    disk quota is used up or the capture directory is unusable
+    """
+    global _writer
+    if not settings.session_capture_enabled:
+        return None
+    directory = settings.session_capture_dir
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as e:
+        print(f"[Session capture] Cannot create {directory}: {e}")
+        return None
+    if not usage.measured:
+        sweep_captures()
+    if usage.full():
+        print(
+            f"[Session capture] Quota reached ({usage.files} files, {usage.bytes:,} bytes in {directory}); "
+            f"not capturing agent {agent_id}"
+        )
+        return None
+    if _writer is None:
+        _writer = CaptureWriter(settings.session_capture_queue_bytes)
+        _writer.start()
+
+    started_at = datetime.now(timezone.utc)
+    name = f"agent{agent_id}-{started_at:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}{SUFFIX}"
+    return SessionCapture(
+        _writer,
+        os.path.join(directory, name),
+        {"agent_id": agent_id, "started_at": started_at.isoformat(), **metadata},
+        settings.session_capture_max_bytes,
+        usage
+    )
+
+
+def stop_capture_writer():
+    """Flush pending captures and stop the writer thread"""
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+def sweep_captures() -> dict:
+    """
+    Delete capture files older than session_capture_retention_hours (0 keeps
+    them) and re-measure what is left. Does file I/O; run it off the loop.
+    """
+    directory = settings.session_capture_dir
+    retention = settings.session_capture_retention_hours
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=retention)).timestamp() if retention > 0 else None
+    files = size = deleted = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        entries = []
+    for entry in entries:
+        if not entry.name.endswith(SUFFIX) or not entry.is_file():
+            continue
+        try:
+            stat = entry.stat()
+            if cutoff is not None and stat.st_mtime < cutoff:
+                os.remove(entry.path)
+                deleted += 1
+                continue
+        except FileNotFoundError:
+            # Swept by another worker
+            continue
+        except OSError as e:
+            print(f"[Session capture] Sweeping {entry.path} failed: {e}")
+            continue
+        files += 1
+        size += stat.st_size
+    usage.files, usage.bytes, usage.measured = files, size, True
+    if deleted:
+        print(f"[Session capture] Deleted {deleted} captures older than {retention:g} hours")
+    return {"files": files, "bytes": size, "deleted": deleted}
+
+
+async def _sweep_forever():
+    while True:
+        try:
+            await asyncio.to_thread(sweep_captures)
+        except Exception as e:
+            print(f"[Session capture] Sweep failed: {e}")
+        await asyncio.sleep(settings.session_capture_sweep_interval_s)
+
+
+_sweeper: Optional[asyncio.Task] = None
+
+
+def start_capture_sweeper():
+    """Start the periodic retention sweep (session_capture_sweep_interval_s > 0)"""
+    global _sweeper
+    if _sweeper is None and settings.session_capture_sweep_interval_s > 0:
+        _sweeper = asyncio.create_task(_sweep_forever())
+
+
+async def stop_capture_sweeper():
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.cancel()
+        try:
+            await _sweeper
+        except asyncio.CancelledError:
+            pass
+        _sweeper = None
+
+
+class CaptureRecord(NamedTuple):
+    offset: float  # Seconds since the capture started
+    direction: int  # CLIENT or UPSTREAM
+    data: str
+
+
+class CaptureReader:
+    """Reads a capture file: `metadata`, then records by iteration, then `summary`"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a session capture")
+        (length,) = LENGTH.unpack(self._file.read(LENGTH.size))
+        self.metadata = json.loads(self._file.read(length))
+        # None until the END record is read; stays None for a capture cut short
+        self.summary: Optional[dict] = None
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        read = self._file.read
+        while True:
+            head = read(RECORD.size)
+            if len(head) < RECORD.size:
+                break
+            offset, direction, length = RECORD.unpack(head)
+            payload = read(length)
+            if len(payload) < length:
+                break
+            if direction == END:
+                self.summary = json.loads(payload)
+                break
+            yield CaptureRecord(offset / 1e9, direction, payload.decode())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,257 @@
+"""
+Per-session latency timelines for widget sessions
+
+Every widget session gets a trace: a root span for the whole session, one
+span per setup phase of widget_websocket (accept, domain check, agent
+fetch, key fetch and decrypt, upstream connect, session.update), spans
+from "session ready" to the first client and upstream audio, and one span
+per conversational turn. A turn runs from the end of the user's speech (or
+a manual commit) to response.done. It carries the time to the response, to
+the first audio (time to first word) and to the first transcript.
+
+Finished traces are kept in a ring buffer (GET /api/debug/session-traces)
+and, when `session_trace_file` is set, appended to that file as OTLP/JSON
+ExportTraceServiceRequest lines (the OpenTelemetry Collector file exporter
+format), written off the event loop.
+"""
+import asyncio
+import json
+import os
+import secrets
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from app.config import settings
+
+SERVICE_NAME = "voice-assistant-backend"
+
+# Setup phases in the order widget_websocket runs them
+PHASES = [
+    "accept", "agent_fetch", "domain_check", "key_fetch", "key_decrypt",
+    "upstream_connect", "session_update", "first_client_audio", "first_upstream_audio",
+]
+
+recent_traces: deque = deque(maxlen=settings.session_trace_keep)
+_file_lock = threading.Lock()
+
+
+def _span_id() -> str:
+    return secrets.token_hex(8)
+
+
+class SessionTrace:
+    """Timeline of one widget session; all methods are called on the event loop"""
+    __slots__ = (
+        "trace_id", "root_id", "start_unix_ns", "start_ns", "attributes", "spans", "error",
+        "ready_ns", "end_ns", "client_audio_seen", "upstream_audio_seen", "turn", "turns",
+    )
+
+    def __init__(self, **attributes):
+        self.trace_id = secrets.token_hex(16)
+        self.root_id = _span_id()
+        # Wall clock once, monotonic offsets from then on
+        self.start_unix_ns = time.time_ns()
+        self.start_ns = time.monotonic_ns()
+        self.attributes = dict(attributes)
+        self.spans: List[dict] = []
+        self.error: Optional[str] = None
+        self.ready_ns: Optional[int] = None
+        self.client_audio_seen = False
+        self.upstream_audio_seen = False
+        self.turn: Optional[dict] = None
+        self.turns = 0
+
+    def _now(self) -> int:
+        return time.monotonic_ns() - self.start_ns
+
+    def _add(self, name: str, start: int, end: int, **attributes) -> dict:
+        span = {"name": name, "span_id": _span_id(), "start": start, "end": end, "attributes": attributes}
+        self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Time the enclosed block as a child span"""
+        start = self._now()
+        try:
+            yield
+        finally:
+            self._add(name, start, self._now(), **attributes)
+
+    def fail(self, reason: str):
+        self.error = reason
+
+    def ready(self):
+        """The session is configured and relaying"""
+        self.ready_ns = self._now()
+
+    def client_audio(self):
+        if not self.client_audio_seen and self.ready_ns is not None:
+            self.client_audio_seen = True
+            self._add("first_client_audio", self.ready_ns, self._now())
+
+    def upstream_audio(self):
+        now = None
+        if not self.upstream_audio_seen and self.ready_ns is not None:
+            self.upstream_audio_seen = True
+            now = self._now()
+            self._add("first_upstream_audio", self.ready_ns, now)
+        turn = self.turn
+        if turn is not None and "first_audio_ms" not in turn["attributes"]:
+            now = now if now is not None else self._now()
+            turn["attributes"]["first_audio_ms"] = round((now - turn["start"]) / 1e6, 3)
+
+    def turn_started(self, trigger: str):
+        """The user finished speaking (server VAD) or committed audio"""
+        if self.turn is not None:
+            if "response_created_ms" not in self.turn["attributes"]:
+                # Still waiting for the answer (e.g. a commit right after speech_stopped)
+                return
+            # A new turn before response.done: the previous answer was cut off
+            self.turn_done("interrupted")
+        self.turns += 1
+        self.turn = self._add("turn", self._now(), None, index=self.turns, trigger=trigger)
+
+    def turn_event(self, name: str):
+        """Record the first `name` event of the current turn, in ms from its start"""
+        turn = self.turn
+        if turn is not None and f"{name}_ms" not in turn["attributes"]:
+            turn["attributes"][f"{name}_ms"] = round((self._now() - turn["start"]) / 1e6, 3)
+
+    def turn_done(self, status: str):
+        turn, self.turn = self.turn, None
+        if turn is not None:
+            turn["end"] = self._now()
+            turn["attributes"]["status"] = status
+
+    def finish(self):
+        """End the session span; keep and export the trace"""
+        self.turn_done("unfinished")
+        end = self._now()
+        for span in self.spans:
+            if span["end"] is None:
+                span["end"] = end
+        self.end_ns = end
+        if not settings.session_trace_enabled:
+            return
+        recent_traces.append(self)
+        if settings.session_trace_file:
+            line = json.dumps(self.to_otlp(), separators=(",", ":"))
+            asyncio.get_running_loop().run_in_executor(None, _append_line, settings.session_trace_file, line)
+
+    def phases(self) -> Dict[str, float]:
+        """Setup phase durations in ms"""
+        return {
+            span["name"]: round((span["end"] - span["start"]) / 1e6, 3)
+            for span in self.spans if span["name"] != "turn"
+        }
+
+    def summary(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "started_at_unix_ms": self.start_unix_ns // 1_000_000,
+            "duration_ms": round(self.end_ns / 1e6, 3),
+            "error": self.error,
+            **self.attributes,
+            "phases": self.phases(),
+            "turns": [dict(span["attributes"], duration_ms=round((span["end"] - span["start"]) / 1e6, 3))
+                      for span in self.spans if span["name"] == "turn"],
+        }
+
+    def to_otlp(self) -> dict:
+        """This trace as an OTLP/JSON ExportTraceServiceRequest"""
+        base = self.start_unix_ns
+        root = {
+            "traceId": self.trace_id,
+            "spanId": self.root_id,
+            "name": "widget.session",
+            "kind": 2,  # SERVER
+            "startTimeUnixNano": str(base),
+            "endTimeUnixNano": str(base + self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        spans = [root] + [
+            {
+                "traceId": self.trace_id,
+                "spanId": span["span_id"],
+                "parentSpanId": self.root_id,
+                "name": f"widget.{span['name']}",
+                "kind": 1,  # INTERNAL
+                "startTimeUnixNano": str(base + span["start"]),
+                "endTimeUnixNano": str(base + span["end"]),
+                "attributes": _otlp_attributes(span["attributes"]),
+            }
+            for span in self.spans
+        ]
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME, "process.pid": os.getpid()})},
+            "scopeSpans": [{"scope": {"name": "app.routes.widget_realtime"}, "spans": spans}],
+        }]}
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def _append_line(path: str, line: str):
+    with _file_lock:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a") as f:
+            f.write(line + "\n")
+
+
+def _percentiles(values: List[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def summarize_by_tenant(traces) -> list:
+    """Per user: phase and time-to-first-word percentiles, slowest phase first"""
+    by_user: Dict[object, List[SessionTrace]] = {}
+    for trace in traces:
+        by_user.setdefault(trace.attributes.get("user_id"), []).append(trace)
+
+    tenants = []
+    for user_id, user_traces in by_user.items():
+        durations = [trace.phases() for trace in user_traces]
+        phases = {
+            phase: _percentiles([trace_phases[phase] for trace_phases in durations if phase in trace_phases])
+            for phase in PHASES
+        }
+        phases = {phase: stats for phase, stats in phases.items() if stats["count"]}
+        first_audio = [
+            turn["attributes"]["first_audio_ms"]
+            for trace in user_traces for turn in trace.spans
+            if turn["name"] == "turn" and "first_audio_ms" in turn["attributes"]
+        ]
+        tenants.append({
+            "user_id": user_id,
+            "sessions": len(user_traces),
+            "errors": sum(1 for trace in user_traces if trace.error),
+            "phases": dict(sorted(phases.items(), key=lambda item: item[1]["p50_ms"], reverse=True)),
+            "turn_first_audio": _percentiles(first_audio),
+        })
+    return sorted(tenants, key=lambda tenant: tenant["sessions"], reverse=True)
@@ -0,0 +1,163 @@
+"""
+Slow-query log with automatic query plans
+
+SQLAlchemy cursor events time every statement on the application engine.
+Statements slower than `slow_query_threshold_ms` are recorded under their
+normalized SQL (whitespace collapsed, literals and IN lists folded), with the
+route being served, the innermost application frame that sent them, and
+running count, total and max durations. The first time a statement is slow
+its plan is captured with EXPLAIN (EXPLAIN QUERY PLAN on SQLite) on the
+same connection and parameters; the parameters themselves are not kept.
+
+The table holds at most `slow_query_keep` statements (least recently slow
+evicted first) and is served per worker at GET /api/debug/slow-queries.
+"""
+import os
+import re
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import event
+from app.config import settings
+from app.database import engine
+from app.utils.request_timing import current_route
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*(\?|%s|%\(\w+\)s|:\w+)(\s*,\s*(\?|%s|%\(\w+\)s|:\w+))+\s*\)")
+_EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+
+# Normalized SQL -> entry, least recently slow first
+slow_queries: "OrderedDict[str, dict]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def normalize_sql(statement: str) -> str:
+    """One line per statement shape: literals become ? and IN lists (?, ...)"""
+    normalized = " ".join(statement.split())
+    normalized = _STRING_LITERAL.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    return _IN_LIST.sub("(?, ...)", normalized)
+
+
+def _call_site() -> Optional[str]:
+    """Innermost application frame outside this module"""
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if filename.startswith(BACKEND_DIR) and "site-packages" not in filename and filename != __file__:
+            return f"{frame.name} ({os.path.relpath(filename, BACKEND_DIR)}:{frame.lineno})"
+    return None
+
+
+def _explain(conn, statement: str, parameters) -> List[str]:
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if conn.dialect.name == "sqlite":
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [" ".join(str(value) for value in row) for row in rows]
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("slow_query_start")
+    if not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+    if settings.slow_query_threshold_ms <= 0 or duration_ms < settings.slow_query_threshold_ms:
+        return
+    record_slow_query(conn, statement, parameters, executemany, duration_ms)
+
+
+@event.listens_for(engine, "handle_error")
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get("slow_query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def record_slow_query(conn, statement: str, parameters, executemany: bool, duration_ms: float):
+    normalized = normalize_sql(statement)
+    route = current_route()
+    site = _call_site()
+    now = datetime.now(timezone.utc).isoformat()
+
+    with _lock:
+        entry = slow_queries.get(normalized)
+        needs_plan = entry is None
+        if entry is None:
+            entry = slow_queries[normalized] = {
+                "sql": normalized,
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "first_seen": now,
+                "routes": {},
+                "sites": {},
+                "plan": None,
+                "plan_error": None,
+            }
+            while len(slow_queries) > settings.slow_query_keep:
+                slow_queries.popitem(last=False)
+        else:
+            slow_queries.move_to_end(normalized)
+        entry["count"] += 1
+        entry["total_ms"] += duration_ms
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+        entry["last_seen"] = now
+        entry["last_ms"] = duration_ms
+        if route:
+            entry["routes"][route] = entry["routes"].get(route, 0) + 1
+        if site:
+            entry["sites"][site] = entry["sites"].get(site, 0) + 1
+
+    print(f"[Slow query] {duration_ms:.0f} ms in {route or site}: {normalized[:200]}")
+
+    if needs_plan and settings.slow_query_explain and not executemany \
+            and normalized.lstrip("( ").upper().startswith(_EXPLAINABLE):
+        try:
+            plan, error = _explain(conn, statement, parameters), None
+        except Exception as e:
+            plan, error = None, str(e)
+        with _lock:
+            entry["plan"], entry["plan_error"] = plan, error
+
+
+def report(sort: str = "total", limit: int = 50) -> List[dict]:
+    """Recorded statements, worst first by total, max or count"""
+    key = {"total": "total_ms", "max": "max_ms", "count": "count"}[sort]
+    with _lock:
+        entries = [
+            {
+                **entry,
+                "total_ms": round(entry["total_ms"], 3),
+                "max_ms": round(entry["max_ms"], 3),
+                "last_ms": round(entry["last_ms"], 3),
+                "mean_ms": round(entry["total_ms"] / entry["count"], 3),
+                "routes": dict(entry["routes"]),
+                "sites": dict(entry["sites"]),
+            }
+            for entry in slow_queries.values()
+        ]
+    entries.sort(key=lambda entry: entry[key], reverse=True)
+    return entries[:limit]
+
+
+def clear():
+    with _lock:
+        slow_queries.clear()
@@ -0,0 +1,327 @@
+"""
+Streaming export and import of tenant configuration
+
+An export is NDJSON (optionally gzip-compressed): a header line followed by
+one line per row, in foreign-key order (users, OpenAI keys, agents,
+assistants). Rows are read with server-side cursors (`yield_per`) and
+written out as they arrive, so memory stays flat however large the tenant.
+
+Secrets (password hashes and encrypted API keys) are left out unless
+`include_secrets` is set. Such a metadata-only export can update existing
+rows and re-create deleted agents and assistants; re-creating deleted users
+and keys (and the rows that belong to them) needs an export that includes
+secrets.
+
+An import only updates rows that belong to the same tenant: users are
+matched on (id, email) and everything else on (id, user_id). Rows whose id
+is taken by another tenant here (and the rows that belong to them) are left
+out and counted as conflicts rather than written over someone else's data.
+"""
+import enum
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import DateTime, Enum, bindparam, insert, or_, select, text, update
+from sqlalchemy.orm import Session
+from app.models.user import User
+from app.models.openai_key import OpenAIKey
+from app.models.agent import Agent
+from app.models.assistant_config import AssistantConfig
+from app.schema import get_head_revision
+from app.utils.etags import TRACKED_SCOPES, bump_change_counter
+
+EXPORT_FORMAT = 1
+YIELD_PER = 1000
+IMPORT_BATCH = 500
+
+# Record type -> model, in the order rows must be restored
+RECORD_TYPES = {
+    "user": User,
+    "openai_key": OpenAIKey,
+    "agent": Agent,
+    "assistant_config": AssistantConfig,
+}
+SECRET_COLUMNS = {"user": {"hashed_password"}, "openai_key": {"encrypted_key"}}
+# Bookkeeping columns that the target database maintains itself
+SKIPPED_COLUMNS = {"version"}
+# Column an existing row must match, besides its id, for an import to update it
+IDENTITY_COLUMNS = {"user": "email"}
+
+
+def _columns(record_type: str, include_secrets: bool) -> list:
+    model = RECORD_TYPES[record_type]
+    skipped = SKIPPED_COLUMNS if include_secrets else SKIPPED_COLUMNS | SECRET_COLUMNS.get(record_type, set())
+    return [column for column in model.__table__.columns if column.name not in skipped]
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Cannot export {type(value).__name__}")
+
+
+def _line(record: dict) -> bytes:
+    return (json.dumps(record, default=_encode, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def iter_export(
+    db: Session,
+    user_ids: Optional[List[int]] = None,
+    include_secrets: bool = False
+) -> Iterator[bytes]:
+    """
+    Yield the export of `user_ids` (all users if None) as NDJSON lines.
+    Rows are streamed from the database in chunks of YIELD_PER.
+    """
+    yield _line({
+        "type": "header",
+        "format": EXPORT_FORMAT,
+        "schema_revision": get_head_revision(),
+        "exported_at": datetime.now(timezone.utc),
+        "include_secrets": include_secrets,
+    })
+
+    for record_type, model in RECORD_TYPES.items():
+        columns = _columns(record_type, include_secrets)
+        owner = model.id if model is User else model.user_id
+        statement = select(*columns).order_by(model.id).execution_options(yield_per=YIELD_PER)
+        if user_ids is not None:
+            statement = statement.where(owner.in_(user_ids))
+        for row in db.execute(statement):
+            yield _line({"type": record_type, "data": row._asdict()})
+
+
+def buffered(chunks: Iterable[bytes], size: int = 64 * 1024) -> Iterator[bytes]:
+    """Coalesce small chunks (one per row) into writes of about `size` bytes"""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def gzip_stream(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Gzip-compress a byte stream incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _decode_row(model, data: dict) -> dict:
+    """Turn exported JSON values back into column values"""
+    row = {}
+    for name, value in data.items():
+        column = model.__table__.columns.get(name)
+        if column is None:
+            continue
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        elif value is not None and isinstance(column.type, Enum) and column.type.enum_class:
+            value = column.type.enum_class(value)
+        row[name] = value
+    return row
+
+
+class ImportResult:
+    """Per record type counts of an import"""
+
+    def __init__(self):
+        self.inserted: Dict[str, int] = {record_type: 0 for record_type in RECORD_TYPES}
+        self.updated: Dict[str, int] = {record_type: 0 for record_type in RECORD_TYPES}
+        self.skipped: Dict[str, int] = {record_type: 0 for record_type in RECORD_TYPES}
+        self.conflicts: Dict[str, int] = {record_type: 0 for record_type in RECORD_TYPES}
+
+    def as_dict(self) -> dict:
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "conflicts": self.conflicts,
+        }
+
+
+def import_lines(db: Session, lines: Iterable[bytes], batch_size: int = IMPORT_BATCH) -> ImportResult:
+    """
+    Restore an export read line by line. Rows are upserted in batches (one
+    existence query, one executemany INSERT and one UPDATE per batch); an
+    existing row is only updated when it belongs to the same tenant, and
+    `user_id` is never rewritten. The caller commits.
+    """
+    result = ImportResult()
+    header = None
+    batch: List[dict] = []
+    batch_type: Optional[str] = None
+    touched: Set[Tuple[str, int]] = set()
+    # Table name -> ids of new rows that were not created
+    skipped_ids: Dict[str, Set[int]] = {}
+    # Table name -> ids that belong to another tenant here
+    conflict_ids: Dict[str, Set[int]] = {}
+
+    def flush():
+        if batch:
+            _import_batch(
+                db, batch_type, batch, header["include_secrets"], result, touched, skipped_ids, conflict_ids
+            )
+            batch.clear()
+
+    for number, raw in enumerate(lines, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as e:
+            raise ValueError(f"Line {number}: invalid JSON ({e})")
+        record_type = record.get("type")
+
+        if header is None:
+            if record_type != "header" or record.get("format") != EXPORT_FORMAT:
+                raise ValueError("Not a tenant export (missing or unsupported header)")
+            header = record
+            continue
+        if record_type not in RECORD_TYPES:
+            raise ValueError(f"Line {number}: unknown record type {record_type!r}")
+
+        if record_type != batch_type or len(batch) >= batch_size:
+            flush()
+            batch_type = record_type
+        batch.append(_decode_row(RECORD_TYPES[record_type], record["data"]))
+    flush()
+
+    if header is None:
+        raise ValueError("Empty export")
+
+    # Bulk statements bypass the flush hooks that keep ETags current
+    connection = db.connection()
+    for scope, owner_id in touched:
+        bump_change_counter(connection, scope, owner_id)
+    if connection.dialect.name == "postgresql":
+        _reset_sequences(connection, [
+            RECORD_TYPES[record_type].__table__.name for record_type, count in result.inserted.items() if count
+        ])
+    return result
+
+
+def _import_batch(
+    db: Session,
+    record_type: str,
+    rows: List[dict],
+    has_secrets: bool,
+    result: ImportResult,
+    touched: Set[Tuple[str, int]],
+    skipped_ids: Dict[str, Set[int]],
+    conflict_ids: Dict[str, Set[int]]
+):
+    model = RECORD_TYPES[record_type]
+    table = model.__table__
+    identity = table.c[IDENTITY_COLUMNS.get(record_type, "user_id")]
+    ids = [row["id"] for row in rows]
+    existing = dict(db.execute(select(table.c.id, identity).where(table.c.id.in_(ids))).all())
+
+    # Rows whose id belongs to another tenant here, and the rows that belong to those
+    conflicts = {
+        row["id"] for row in rows
+        if (row["id"] in existing and existing[row["id"]] != row.get(identity.name))
+        or _has_parent_in(table, row, conflict_ids)
+    }
+    if record_type == "user":
+        conflicts.update(_taken_user_ids(db, [row for row in rows if row["id"] not in existing]))
+    if conflicts:
+        result.conflicts[record_type] += len(conflicts)
+        conflict_ids.setdefault(table.name, set()).update(conflicts)
+        rows = [row for row in rows if row["id"] not in conflicts]
+
+    new_rows = [row for row in rows if row["id"] not in existing]
+    old_rows = [row for row in rows if row["id"] in existing]
+    if new_rows and not has_secrets and record_type in SECRET_COLUMNS:
+        # Users and keys can't be created without their secrets
+        skipped = new_rows
+        new_rows = []
+    else:
+        # Nor can rows that belong to one that wasn't
+        skipped = [row for row in new_rows if _has_parent_in(table, row, skipped_ids)]
+        if skipped:
+            new_rows = [row for row in new_rows if not _has_parent_in(table, row, skipped_ids)]
+    if skipped:
+        result.skipped[record_type] += len(skipped)
+        skipped_ids.setdefault(table.name, set()).update(row["id"] for row in skipped)
+
+    if new_rows:
+        db.execute(insert(table), new_rows)
+        result.inserted[record_type] += len(new_rows)
+    if old_rows:
+        # The owner was matched above and is never rewritten. Bound names
+        # must differ from the column names in an executemany UPDATE
+        names = [name for name in old_rows[0] if name not in ("id", "user_id", identity.name)]
+        values = {name: bindparam(f"new_{name}") for name in names}
+        if "version" in table.c:
+            values["version"] = table.c.version + 1
+        statement = update(table).where(
+            table.c.id == bindparam("row_id"), identity == bindparam("row_identity")
+        ).values(values)
+        db.execute(statement, [
+            {"row_id": row["id"], "row_identity": row[identity.name], **{f"new_{name}": row[name] for name in names}}
+            for row in old_rows
+        ])
+        result.updated[record_type] += len(old_rows)
+
+    scope = TRACKED_SCOPES.get(model)
+    if scope:
+        touched.update((scope, row["user_id"]) for row in new_rows + old_rows)
+
+
+def _has_parent_in(table, row: dict, ids_by_table: Dict[str, Set[int]]) -> bool:
+    for column in table.columns:
+        for foreign_key in column.foreign_keys:
+            ids = ids_by_table.get(foreign_key.column.table.name)
+            if ids and row.get(column.name) in ids:
+                return True
+    return False
+
+
+def _taken_user_ids(db: Session, rows: List[dict]) -> Set[int]:
+    """Ids of new user rows whose email or username another user has here"""
+    if not rows:
+        return set()
+    emails = {row["email"] for row in rows}
+    usernames = {row["username"] for row in rows}
+    taken = db.execute(
+        select(User.email, User.username).where(or_(User.email.in_(emails), User.username.in_(usernames)))
+    ).all()
+    taken_emails = {email for email, _ in taken}
+    taken_usernames = {username for _, username in taken}
+    return {row["id"] for row in rows if row["email"] in taken_emails or row["username"] in taken_usernames}
+
+
+def _reset_sequences(connection, tables: List[str]):
+    """Move Postgres id sequences past the ids an import inserted explicitly"""
+    for table in tables:
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {table}"
+        ))
+
+
+def gunzip_lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Split a (possibly gzip-compressed) byte stream into lines"""
+    decompressor = None
+    pending = b""
+    for chunk in chunks:
+        if decompressor is None:
+            # zlib auto-detects gzip or plain deflate; plain NDJSON passes through
+            decompressor = zlib.decompressobj(47) if chunk[:2] == b"\x1f\x8b" else False
+        data = decompressor.decompress(chunk) if decompressor else chunk
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        yield from lines
+    if decompressor:
+        pending += decompressor.flush()
+    if pending:
+        yield pending
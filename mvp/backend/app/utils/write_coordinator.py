@@ -0,0 +1,207 @@
+"""
+Single-writer group-commit queue
+
+When enabled, route writes are funnelled through one writer thread that owns
+its own connection. Small transactions queued within a short window are
+applied in one database transaction (each inside its own SAVEPOINT, so one
+failing write does not affect the others) and committed together. Callers
+await the result of their own unit of work.
+
+When disabled, the helpers below commit on the request session exactly as
+the routes always have.
+"""
+import asyncio
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+from sqlalchemy.orm import Session, sessionmaker
+from app.config import settings
+from app.database import create_writer_engine
+
+_STOP = object()
+
+
+class WriteCoordinator:
+    """Serializes writes onto a single thread and group-commits them"""
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        max_batch: int = 64,
+        max_delay: float = 0.0
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.writes = 0
+
+    def start(self):
+        """Start the writer thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-coordinator", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Drain queued writes and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    async def submit(self, work: Callable[[Session], Any]) -> Any:
+        """
+        Queue a unit of work and wait until it is committed.
+        `work` receives the writer session and must not commit itself.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((work, loop, future))
+        return await future
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            job = self._queue.get()
+            if job is _STOP:
+                break
+            # Everything that queued up while the previous batch was
+            # committing goes into this one; optionally linger for stragglers
+            batch = [job]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        job = self._queue.get(timeout=remaining)
+                    else:
+                        job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    stopping = True
+                    break
+                batch.append(job)
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        session = self.session_factory()
+        outcomes = []
+        try:
+            for work, _, _ in batch:
+                try:
+                    with session.begin_nested():
+                        outcomes.append((True, work(session)))
+                except Exception as e:
+                    outcomes.append((False, e))
+            session.commit()
+            # Results are handed to other threads, detach them from this session
+            session.expunge_all()
+        except Exception as e:
+            session.rollback()
+            outcomes = [(False, e)] * len(batch)
+        finally:
+            session.close()
+
+        self.batches += 1
+        self.writes += len(batch)
+        for (_, loop, future), (ok, value) in zip(batch, outcomes):
+            loop.call_soon_threadsafe(_resolve, future, ok, value)
+
+
+def _resolve(future: asyncio.Future, ok: bool, value: Any):
+    if future.cancelled():
+        return
+    if ok:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
+
+
+_coordinator: Optional[WriteCoordinator] = None
+
+
+def get_write_coordinator() -> Optional[WriteCoordinator]:
+    """Return the running coordinator, or None when writes commit directly"""
+    return _coordinator
+
+
+def start_write_coordinator() -> Optional[WriteCoordinator]:
+    """Start the coordinator if enabled in settings"""
+    global _coordinator
+    if settings.write_coordinator_enabled and _coordinator is None:
+        session_factory = sessionmaker(
+            bind=create_writer_engine(),
+            autoflush=False,
+            expire_on_commit=False
+        )
+        _coordinator = WriteCoordinator(
+            session_factory,
+            max_batch=settings.write_coordinator_max_batch,
+            max_delay=settings.write_coordinator_max_delay_ms / 1000
+        )
+        _coordinator.start()
+    return _coordinator
+
+
+def stop_write_coordinator():
+    """Flush pending writes and stop the coordinator"""
+    global _coordinator
+    if _coordinator is not None:
+        _coordinator.stop()
+        _coordinator = None
+
+
+async def run_write(db: Session, work: Callable[[Session], Any]) -> Any:
+    """
+    Run `work(session)` and commit, on the request session or through the
+    write coordinator. `work` must not commit itself.
+    """
+    coordinator = get_write_coordinator()
+    if coordinator is None:
+        try:
+            result = work(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return result
+    return await coordinator.submit(work)
+
+
+async def commit_save(db: Session, instance):
+    """
+    Insert or update `instance` and commit. Returns the committed, refreshed
+    instance (a detached copy when the write coordinator is enabled).
+    """
+    coordinator = get_write_coordinator()
+    if coordinator is None:
+        db.add(instance)
+        db.commit()
+        db.refresh(instance)
+        return instance
+
+    def work(session: Session):
+        merged = session.merge(instance)
+        session.flush()
+        session.refresh(merged)
+        return merged
+
+    return await coordinator.submit(work)
+
+
+async def commit_delete(db: Session, instance):
+    """Delete `instance` and commit"""
+    coordinator = get_write_coordinator()
+    if coordinator is None:
+        db.delete(instance)
+        db.commit()
+        return
+
+    def work(session: Session):
+        session.delete(session.merge(instance))
+
+    await coordinator.submit(work)
@@ -0,0 +1,316 @@
+"""
+REST API benchmark suite with regression gating
+
+Drives the app in-process (TestClient) against a synthetic dataset and
+reports, per scenario, throughput, latency percentiles and SQL queries per
+request. Results can be saved as a JSON baseline; --compare fails (exit 1)
+when a scenario's median latency rises beyond the noise floor or it sends
+more queries than the baseline. The floor is the largest of --tolerance of
+the baseline median, --min-delta-ms and --spread-multiple times the
+baseline's interquartile range; scenarios with fewer than --min-samples
+requests (in the run or the baseline) are reported but not gated on latency.
+
+    python -m benchmarks.api --output baseline.json
+    python -m benchmarks.api --compare baseline.json
+    python -m benchmarks.api --database bench.db --compare baseline.json
+
+Without --database a throwaway database is migrated and filled with
+--users/--agents synthetic rows (see benchmarks/dataset.py). Pass
+--database to reuse a larger dataset made with `seed_db.py --synthetic`.
+Baselines are only comparable on the same dataset and machine.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+ADMIN_EMAIL = "bench-admin@bench.example.com"
+ADMIN_PASSWORD = "bench-admin-password"
+
+
+class QueryCounter:
+    """Counts statements sent on the application engine"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(client, counter: QueryCounter, request, requests: int, warmup: int) -> dict:
+    """Send `requests` requests built by `request(i)` and summarize them"""
+    for i in range(warmup):
+        request(i)
+
+    latencies = []
+    queries = []
+    started = time.perf_counter()
+    for i in range(requests):
+        counter.count = 0
+        begin = time.perf_counter()
+        response = request(warmup + i)
+        latencies.append((time.perf_counter() - begin) * 1000)
+        queries.append(counter.count)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.request.method} {response.request.url} -> {response.status_code}: {response.text[:200]}")
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p25_ms": round(percentile(latencies, 0.25), 3),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p75_ms": round(percentile(latencies, 0.75), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "queries_per_request": round(statistics.fmean(queries), 2),
+        "max_queries": max(queries),
+    }
+
+
+def prepare_database(args):
+    """Migrate DATABASE_URL and, for a throwaway database, fill it"""
+    from app.schema import upgrade_schema
+    from benchmarks.dataset import generate_dataset
+
+    upgrade_schema()
+    if args.database is None:
+        print(f"🧪 Generating {args.users:,} users and {args.agents:,} agents...")
+        generate_dataset(users=args.users, agents=args.agents, progress=False)
+
+
+def pick_tenants(db):
+    """A typical (median) and the heaviest synthetic tenant, by agent count"""
+    from sqlalchemy import func
+    from app.models.agent import Agent
+    from app.models.user import User
+    from benchmarks.dataset import EMAIL_DOMAIN
+
+    counts = db.query(Agent.user_id, func.count(Agent.id)).join(User, User.id == Agent.user_id).filter(
+        User.email.like(f"%@{EMAIL_DOMAIN}")
+    ).group_by(Agent.user_id).order_by(func.count(Agent.id)).all()
+    if not counts:
+        sys.exit("No synthetic tenants in this database; generate one with seed_db.py --synthetic")
+    return counts[len(counts) // 2], counts[-1]
+
+
+def ensure_admin(db):
+    from app.models.user import User, UserRole
+    from app.utils.auth import get_password_hash
+
+    if not db.query(User).filter(User.email == ADMIN_EMAIL).first():
+        db.add(User(
+            email=ADMIN_EMAIL,
+            username="bench_admin",
+            hashed_password=get_password_hash(ADMIN_PASSWORD),
+            role=UserRole.SUPERADMIN
+        ))
+        db.commit()
+
+
+def run_suite(args) -> dict:
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, func
+    from app.database import engine, SessionLocal
+    from app.models.agent import Agent
+    from app.models.openai_key import OpenAIKey
+    from app.models.user import User
+    from benchmarks.dataset import PASSWORD, VOICES
+
+    prepare_database(args)
+    db = SessionLocal()
+    try:
+        ensure_admin(db)
+        (typical_id, typical_agents), (heavy_id, heavy_agents) = pick_tenants(db)
+        typical_agent_ids = [row[0] for row in db.query(Agent.id).filter(Agent.user_id == typical_id).all()]
+        # The widget code route rejects agents whose key is inactive
+        widget_agent_ids = [row[0] for row in db.query(Agent.id).join(
+            OpenAIKey, OpenAIKey.id == Agent.openai_key_id
+        ).filter(Agent.user_id == typical_id, OpenAIKey.is_active == True).all()]
+        heavy_agent_ids = [row[0] for row in db.query(Agent.id).filter(Agent.user_id == heavy_id).limit(500).all()]
+        user_ids = [row[0] for row in db.query(User.id).order_by(User.id).limit(500).all()]
+        dataset = {
+            "users": db.query(func.count(User.id)).scalar(),
+            "agents": db.query(func.count(Agent.id)).scalar(),
+            "typical_tenant_agents": typical_agents,
+            "heavy_tenant_agents": heavy_agents,
+        }
+        typical_email = db.get(User, typical_id).email
+        heavy_email = db.get(User, heavy_id).email
+    finally:
+        db.close()
+
+    import main as app_main
+
+    counter = QueryCounter()
+    n = args.requests
+    # Slow scenarios run fewer requests, but never fewer than the gate needs
+    slow = max(args.min_samples, n // 10)
+    print(HEADER)
+    results = {}
+    with TestClient(app_main.app) as client:
+        def token(email, password):
+            response = client.post("/api/auth/login", json={"email": email, "password": password})
+            return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        typical = token(typical_email, PASSWORD)
+        heavy = token(heavy_email, PASSWORD)
+        admin = token(ADMIN_EMAIL, ADMIN_PASSWORD)
+
+        scenarios = {
+            # Password hashing dominates; fewer iterations
+            "auth_login": (max(args.min_samples, n // 20), lambda i: client.post(
+                "/api/auth/login", json={"email": typical_email, "password": PASSWORD}
+            )),
+            "auth_me": (n, lambda i: client.get("/api/auth/me", headers=typical)),
+            "agents_list": (n, lambda i: client.get("/api/agents", headers=typical)),
+            "agents_list_heavy_page": (n, lambda i: client.get("/api/agents?limit=50", headers=heavy)),
+            "agents_list_heavy_all": (slow, lambda i: client.get("/api/agents", headers=heavy)),
+            "agent_get": (n, lambda i: client.get(
+                f"/api/agents/{typical_agent_ids[i % len(typical_agent_ids)]}", headers=typical
+            )),
+            "agent_update": (n, lambda i: client.put(
+                f"/api/agents/{heavy_agent_ids[i % len(heavy_agent_ids)]}",
+                json={"voice": VOICES[i % len(VOICES)]}, headers=heavy
+            )),
+            "widget_code": (n, lambda i: client.get(
+                f"/api/widget/code/agent/{widget_agent_ids[i % len(widget_agent_ids)]}", headers=typical
+            )),
+            "users_list_page": (n, lambda i: client.get("/api/users?limit=50", headers=admin)),
+            "user_get": (n, lambda i: client.get(f"/api/users/{user_ids[i % len(user_ids)]}", headers=admin)),
+            "user_profile": (n, lambda i: client.get(f"/api/users/{user_ids[i % len(user_ids)]}/profile", headers=admin)),
+            "user_widgets": (n, lambda i: client.get(f"/api/users/{user_ids[i % len(user_ids)]}/widgets", headers=admin)),
+            "user_profiles_batch": (slow, lambda i: client.post(
+                "/api/users/profiles", json={"user_ids": user_ids[:100]}, headers=admin
+            )),
+        }
+
+        event.listen(engine, "before_cursor_execute", counter)
+        try:
+            for name, (requests, request) in scenarios.items():
+                if args.only and name not in args.only:
+                    continue
+                results[name] = run_scenario(client, counter, request, requests, args.warmup)
+                print(format_row(name, results[name]))
+        finally:
+            event.remove(engine, "before_cursor_execute", counter)
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "dataset": dataset,
+        "scenarios": results,
+    }
+
+
+HEADER = f"{'scenario':<24} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8}"
+
+
+def format_row(name: str, result: dict) -> str:
+    return (
+        f"{name:<24} {result['throughput_rps']:>9.1f} {result['p50_ms']:>9.2f} "
+        f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['max_queries']:>8}"
+    )
+
+
+def compare(report: dict, baseline: dict, tolerance: float, min_delta_ms: float,
+            spread_multiple: float, min_samples: int) -> list:
+    """Regressions of `report` against `baseline` as human-readable lines
+
+    Latency is gated on the median, which a handful of slow requests (GC,
+    a busy machine) cannot move the way they move p95. A rise only counts
+    when it clears the noise floor: `tolerance` of the baseline median,
+    `min_delta_ms` and `spread_multiple` interquartile ranges of the
+    baseline, whichever is largest. Query counts are deterministic and
+    gated for every scenario.
+    """
+    regressions = []
+    for name, result in report["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        samples = min(result["requests"], base["requests"])
+        if samples < min_samples:
+            print(f"ℹ️  {name}: {samples} samples, fewer than {min_samples}; latency not gated")
+        elif "p75_ms" not in base:
+            print(f"ℹ️  {name}: the baseline has no spread, save a new one; latency not gated")
+        else:
+            spread = base["p75_ms"] - base["p25_ms"]
+            floor = max(base["p50_ms"] * tolerance, min_delta_ms, spread * spread_multiple)
+            p50_limit = base["p50_ms"] + floor
+            if result["p50_ms"] > p50_limit:
+                regressions.append(
+                    f"{name}: median {result['p50_ms']:.2f} ms vs baseline {base['p50_ms']:.2f} ms "
+                    f"(limit {p50_limit:.2f} ms)"
+                )
+        if result["max_queries"] > base["max_queries"]:
+            regressions.append(
+                f"{name}: {result['max_queries']} queries per request vs baseline {base['max_queries']}"
+            )
+    if report["dataset"] != baseline.get("dataset"):
+        print(f"⚠️  Dataset differs from the baseline ({baseline.get('dataset')}), latencies may not be comparable")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", help="Existing SQLite dataset to benchmark (default: generate a throwaway one)")
+    parser.add_argument("--users", type=int, default=200, help="Synthetic users for a throwaway dataset")
+    parser.add_argument("--agents", type=int, default=20000, help="Synthetic agents for a throwaway dataset")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario (fewer for slow ones)")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="Run only these scenarios")
+    parser.add_argument("--output", help="Write the results to this JSON file (e.g. a new baseline)")
+    parser.add_argument("--compare", help="Baseline JSON to compare against; exits 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed median increase (fraction)")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Median increases below this are noise")
+    parser.add_argument("--spread-multiple", type=float, default=3.0,
+                        help="Median increases below this many baseline interquartile ranges are noise")
+    parser.add_argument("--min-samples", type=int, default=30,
+                        help="Scenarios with fewer requests are not gated on latency")
+    args = parser.parse_args()
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix="api-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(database)}"
+
+    report = run_suite(args)
+    print(f"Dataset: {report['dataset']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(
+            report, baseline, args.tolerance, args.min_delta_ms, args.spread_multiple, args.min_samples
+        )
+        if regressions:
+            print("❌ Regressions against the baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Synthetic dataset generator for scale benchmarks
+
+Fills the configured database (DATABASE_URL) with users, OpenAI keys,
+agents and assistants of realistic shape: agent counts per user are skewed
+(a few tenants own most agents), instructions are a few KB of prose and
+agent_config carries tool definitions. Rows are written with Core
+executemany INSERTs in chunks, each chunk in its own short transaction.
+
+    python seed_db.py --synthetic --users 10000 --agents 1000000
+    python -m benchmarks.dataset --users 1000 --agents 100000
+
+Every synthetic user can log in as user<N>@bench.example.com with the
+password below. Ids continue after the existing rows, so the generator can
+run on top of a seeded database.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select  # noqa: E402
+from app.database import engine, is_sqlite  # noqa: E402
+from app.models.user import User, UserRole  # noqa: E402
+from app.models.openai_key import OpenAIKey  # noqa: E402
+from app.models.agent import Agent, NoiseReductionMode  # noqa: E402
+from app.models.assistant_config import AssistantConfig  # noqa: E402
+from app.utils.auth import get_password_hash  # noqa: E402
+from app.utils.encryption import encrypt_api_key  # noqa: E402
+
+PASSWORD = "bench-password"
+EMAIL_DOMAIN = "bench.example.com"
+VOICES = ["alloy", "ash", "ballad", "cedar", "coral", "echo", "marin", "sage", "shimmer", "verse"]
+DOMAINS = ["example.com", "shop.example", "clinic.example", "bank.example", "travel.example", "school.example"]
+
+SENTENCES = [
+    "You are a friendly voice assistant for {company}.",
+    "Greet callers warmly and ask how you can help them today.",
+    "Keep answers short, two or three sentences, because they are spoken aloud.",
+    "If the caller asks about opening hours, we are open from nine to six on weekdays.",
+    "Never read out internal identifiers, prices you are unsure about or personal data.",
+    "When a question is outside your knowledge, offer to connect the caller to a human agent.",
+    "Confirm names, dates and numbers by repeating them back before acting on them.",
+    "Speak in the caller's language if they switch languages mid-conversation.",
+    "Use the lookup_order tool when the caller mentions an order number.",
+    "Avoid filler words and do not repeat the question back unless it was unclear.",
+    "If the caller is upset, acknowledge their frustration before offering a solution.",
+    "Summarize what was agreed at the end of the call and ask if anything else is needed.",
+]
+
+
+def instructions_text(rng: random.Random, size: int, company: str) -> str:
+    """Prose of roughly `size` characters built from assistant-style sentences"""
+    parts = []
+    length = 0
+    while length < size:
+        sentence = rng.choice(SENTENCES).format(company=company)
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)
+
+
+def agent_config(rng: random.Random, tools: int) -> dict:
+    """A RealtimeAgent-style config with `tools` function definitions"""
+    return {
+        "tools": [
+            {
+                "type": "function",
+                "name": f"tool_{n}",
+                "description": "Look up a record for the caller and return a short summary of its status.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "record_id": {"type": "string", "description": "Identifier read out by the caller"},
+                        "detail": {"type": "string", "enum": ["summary", "full"]},
+                    },
+                    "required": ["record_id"],
+                },
+            }
+            for n in range(tools)
+        ],
+        "temperature": round(rng.uniform(0.6, 1.0), 2),
+        "max_response_output_tokens": rng.choice([512, 1024, 4096]),
+    }
+
+
+def agents_per_user(rng: random.Random, users: int, agents: int) -> List[int]:
+    """Split `agents` over `users` with a long tail (log-normal weights)"""
+    weights = [rng.lognormvariate(0, 1.2) for _ in range(users)]
+    total = sum(weights)
+    counts = [int(agents * weight / total) for weight in weights]
+    for index in rng.sample(range(users), agents - sum(counts)):
+        counts[index] += 1
+    return counts
+
+
+def _next_id(conn, model) -> int:
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+# Parents before children, so every chunk's foreign keys already exist
+TABLE_ORDER = (User, OpenAIKey, Agent, AssistantConfig)
+
+
+class _Writer:
+    """Buffers rows per table and writes them in chunked executemany INSERTs"""
+
+    def __init__(self, conn, chunk_size: int, progress: bool):
+        self.conn = conn
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.buffers: Dict[str, list] = {}
+        self.counts: Dict[str, int] = {}
+        self.started = time.perf_counter()
+        self.reported = self.started
+
+    def add(self, model, row: dict):
+        buffer = self.buffers.setdefault(model.__tablename__, [])
+        buffer.append(row)
+        if len(buffer) >= self.chunk_size:
+            self.flush(model)
+
+    def flush(self, model):
+        for parent in TABLE_ORDER[:TABLE_ORDER.index(model)]:
+            self.flush(parent)
+        buffer = self.buffers.get(model.__tablename__)
+        if not buffer:
+            return
+        with self.conn.begin():
+            self.conn.execute(model.__table__.insert(), buffer)
+        self.counts[model.__tablename__] = self.counts.get(model.__tablename__, 0) + len(buffer)
+        buffer.clear()
+        now = time.perf_counter()
+        if self.progress and now - self.reported >= 1:
+            self.reported = now
+            elapsed = now - self.started
+            rows = sum(self.counts.values())
+            print(f"\r   {rows:,} rows in {elapsed:.0f}s ({rows / elapsed:,.0f} rows/s)", end="", flush=True)
+
+
+def generate_dataset(
+    users: int = 10000,
+    agents: int = 1000000,
+    keys_per_user: int = 2,
+    assistants_per_user: int = 1,
+    instructions_chars: int = 2000,
+    tools: int = 3,
+    chunk_size: int = 5000,
+    seed: int = 42,
+    progress: bool = True
+) -> Dict[str, int]:
+    """Insert a synthetic dataset and return the number of rows per table"""
+    if users < 1:
+        raise ValueError("Agents and assistants belong to users, users must be at least 1")
+    if keys_per_user < 1:
+        raise ValueError("Agents need an API key, keys_per_user must be at least 1")
+    rng = random.Random(seed)
+    hashed_password = get_password_hash(PASSWORD)
+
+    with engine.connect() as conn:
+        synchronous = None
+        if is_sqlite:
+            # A rebuildable dataset does not need per-chunk fsyncs
+            synchronous = conn.exec_driver_sql("PRAGMA synchronous").scalar()
+            conn.exec_driver_sql("PRAGMA synchronous = OFF")
+        try:
+            return _generate(
+                conn, rng, hashed_password, users, agents, keys_per_user,
+                assistants_per_user, instructions_chars, tools, chunk_size, progress
+            )
+        finally:
+            if synchronous is not None:
+                conn.exec_driver_sql(f"PRAGMA synchronous = {int(synchronous)}")
+
+
+def _generate(
+    conn, rng, hashed_password, users, agents, keys_per_user,
+    assistants_per_user, instructions_chars, tools, chunk_size, progress
+) -> Dict[str, int]:
+    writer = _Writer(conn, chunk_size, progress)
+    first_user = _next_id(conn, User)
+    first_key = _next_id(conn, OpenAIKey)
+    first_agent = _next_id(conn, Agent)
+    first_assistant = _next_id(conn, AssistantConfig)
+    # Close the read transaction opened by the id lookups
+    conn.commit()
+
+    counts = agents_per_user(rng, users, agents) if users else []
+    key_id = first_key
+    agent_id = first_agent
+    assistant_id = first_assistant
+    for index, agent_count in enumerate(counts):
+        user_id = first_user + index
+        company = f"Company {user_id}"
+        writer.add(User, {
+            "id": user_id,
+            "email": f"user{user_id}@{EMAIL_DOMAIN}",
+            "username": f"bench_user_{user_id}",
+            "hashed_password": hashed_password,
+            "role": UserRole.DEFAULT,
+            "is_active": True,
+        })
+
+        user_keys = list(range(key_id, key_id + keys_per_user))
+        for n, user_key in enumerate(user_keys):
+            writer.add(OpenAIKey, {
+                "id": user_key,
+                "user_id": user_id,
+                "key_name": f"Key {n + 1}",
+                "encrypted_key": encrypt_api_key(f"sk-bench-{user_id}-{n}-{rng.getrandbits(64):016x}"),
+                "is_active": n == 0,
+            })
+        key_id += keys_per_user
+
+        first_user_agent = agent_id
+        for n in range(agent_count):
+            writer.add(Agent, {
+                "id": agent_id,
+                "user_id": user_id,
+                "openai_key_id": rng.choice(user_keys),
+                "name": f"Agent {n + 1} of {company}",
+                "domain": rng.choice(DOMAINS),
+                "instructions": instructions_text(rng, int(rng.uniform(0.5, 1.5) * instructions_chars), company),
+                "voice": rng.choice(VOICES),
+                "noise_reduction_mode": rng.choice(list(NoiseReductionMode)),
+                "noise_reduction_threshold": str(round(rng.uniform(0.3, 0.8), 2)),
+                "noise_reduction_prefix_padding_ms": rng.choice([200, 300, 500]),
+                "noise_reduction_silence_duration_ms": rng.choice([300, 500, 800]),
+                "agent_config": agent_config(rng, rng.randint(0, tools * 2)),
+            })
+            agent_id += 1
+
+        for n in range(assistants_per_user):
+            writer.add(AssistantConfig, {
+                "id": assistant_id,
+                "user_id": user_id,
+                "name": f"Assistant {n + 1}",
+                "agent_id": rng.randrange(first_user_agent, agent_id) if agent_id > first_user_agent else None,
+                "voice": rng.choice(VOICES),
+                "additional_settings": {},
+            })
+            assistant_id += 1
+
+    writer.flush(TABLE_ORDER[-1])
+    if progress:
+        elapsed = time.perf_counter() - writer.started
+        print(f"\r   {sum(writer.counts.values()):,} rows in {elapsed:.0f}s")
+    return writer.counts
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Generator options, shared with seed_db.py"""
+    parser.add_argument("--users", type=int, default=10000, help="Users to create")
+    parser.add_argument("--agents", type=int, default=1000000, help="Agents to create, spread over the users")
+    parser.add_argument("--keys-per-user", type=int, default=2)
+    parser.add_argument("--assistants-per-user", type=int, default=1)
+    parser.add_argument("--instructions-chars", type=int, default=2000, help="Mean size of agent instructions")
+    parser.add_argument("--tools", type=int, default=3, help="Mean tool definitions per agent_config")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per INSERT transaction")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def check_arguments(parser: argparse.ArgumentParser, args):
+    """Reject what generate_dataset would, before anything is written"""
+    if args.users < 1:
+        parser.error("--users must be at least 1, agents and assistants belong to users")
+    if args.keys_per_user < 1:
+        parser.error("--keys-per-user must be at least 1, agents need an API key")
+
+
+def run(args):
+    print(f"🧪 Generating {args.users:,} users and {args.agents:,} agents...")
+    counts = generate_dataset(
+        users=args.users,
+        agents=args.agents,
+        keys_per_user=args.keys_per_user,
+        assistants_per_user=args.assistants_per_user,
+        instructions_chars=args.instructions_chars,
+        tools=args.tools,
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+    )
+    for table, count in counts.items():
+        print(f"   {table}: {count:,} rows")
+    print(f"✅ Synthetic users log in as user<id>@{EMAIL_DOMAIN} / {PASSWORD}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    args = parser.parse_args()
+    check_arguments(parser, args)
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
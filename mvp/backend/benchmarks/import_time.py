@@ -0,0 +1,127 @@
+"""
+Cold-start import budget
+
+Imports the API (`main`) and the realtime gateway (`gateway`, including
+building its app) in fresh interpreters with `python -X importtime` and
+fails (exit 1) when
+- the application's own import cost exceeds its budget (the median of
+  --runs runs), or
+- a module that should load lazily on first use is imported at startup:
+  JWT (jose), cryptography, passlib, httpx and websockets for both, and
+  additionally the REST schemas and routers for the gateway.
+
+The own import cost is the self time of every module that importing the
+framework alone (FastAPI, SQLAlchemy ORM, pydantic-settings) does not load:
+our code and whatever it pulls in beyond the framework. The framework's
+own import time is printed but not budgeted; it swings by hundreds of
+milliseconds between runs and no change here can shrink it.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 9 --budget-scale 1.5   # slower machine
+
+The budgets hold on a developer laptop with warm bytecode caches; scale them
+for slower CI machines rather than raising them. The heaviest of our imports
+are listed to show where a regression comes from.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FRAMEWORK = "import fastapi, sqlalchemy.orm, pydantic_settings"
+
+LAZY_EVERYWHERE = ["jose", "cryptography", "passlib", "httpx", "websockets"]
+
+TARGETS = {
+    "main": {
+        "code": "import main",
+        "budget_ms": 400,
+        "lazy": LAZY_EVERYWHERE,
+    },
+    "gateway": {
+        "code": "import gateway; gateway.create_app()",
+        "budget_ms": 150,
+        "lazy": LAZY_EVERYWHERE + ["app.schemas", "app.dependencies", "app.routes.auth", "app.routes.agents"],
+    },
+}
+
+
+def import_profile(code: str, env: dict) -> dict:
+    """Total import time and module -> (self µs, cumulative µs) from one cold interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"`{code}` failed:\n{result.stderr[-2000:]}")
+    modules = {}
+    top_level_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header line
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+        if not name[1:].startswith(" "):
+            # One space after the bar marks a top-level import
+            top_level_us += int(cumulative_us)
+    return {"total_ms": top_level_us / 1000, "modules": modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiply every budget (slower machines)")
+    parser.add_argument("--top", type=int, default=10, help="heaviest imports to list")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    framework = [import_profile(FRAMEWORK, env) for _ in range(args.runs)]
+    framework_modules = set().union(*(profile["modules"] for profile in framework))
+    framework_ms = statistics.median(profile["total_ms"] for profile in framework)
+    print(f"framework: {framework_ms:.0f} ms cold import (not budgeted)")
+
+    failures = []
+    for target, spec in TARGETS.items():
+        profiles = [import_profile(spec["code"], env) for _ in range(args.runs)]
+        own = [
+            {name: times for name, times in profile["modules"].items() if name not in framework_modules}
+            for profile in profiles
+        ]
+        own_ms = statistics.median(sum(self_us for self_us, _ in modules.values()) / 1000 for modules in own)
+        total_ms = statistics.median(profile["total_ms"] for profile in profiles)
+        budget_ms = spec["budget_ms"] * args.budget_scale
+
+        print(f"\n{target}: {own_ms:.0f} ms own imports (budget {budget_ms:.0f} ms), "
+              f"{total_ms:.0f} ms cold import in total, median of {args.runs}")
+        heaviest = sorted(own[-1].items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+        for name, (self_us, cumulative_us) in heaviest:
+            print(f"  {self_us / 1000:8.1f} ms self {cumulative_us / 1000:8.1f} ms total  {name}")
+
+        if own_ms > budget_ms:
+            failures.append(f"{target} spends {own_ms:.0f} ms on its own imports, over its {budget_ms:.0f} ms budget")
+        modules = profiles[-1]["modules"]
+        eager = [
+            name for name in spec["lazy"]
+            if any(module == name or module.startswith(name + ".") for module in modules)
+        ]
+        if eager:
+            failures.append(f"{target} imports {', '.join(eager)} at startup; they should load on first use")
+
+    print()
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(f"{len(failures)} cold-start budget failures")
+    print("Cold start is within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Prompts-to-agents migration on a legacy database
+
+Builds a throwaway SQLite database in the pre-agents shape (prompts,
+prompt_versions, assistant_configs with prompt_id/prompt_version_id), then
+follows the README order: `python migrate.py` (Alembic to head) and
+`python migrate_prompts_to_agents.py`, timing the data migration. While it
+runs, a writer keeps renaming and deleting assistants the way the app would.
+Exits non-zero unless afterwards
+- the schema is still at the head revision and the prompt tables are gone,
+- agents and assistant_configs have exactly the columns of their models
+  (e.g. `version` from revision 0004),
+- every prompt became an agent and every assistant points at its agent,
+- every rename and delete the writer committed is still there, whichever
+  batch it raced with,
+- the models can be queried and updated through the ORM.
+
+    python -m benchmarks.prompts_migration
+    python -m benchmarks.prompts_migration --prompts 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+DB_FILE = os.path.join(tempfile.mkdtemp(prefix="prompts-migration-"), "legacy.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+LEGACY_SCHEMA = """
+CREATE TABLE prompts (
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    openai_key_id INTEGER,
+    name VARCHAR NOT NULL,
+    description TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE prompt_versions (
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    prompt_id INTEGER NOT NULL REFERENCES prompts (id),
+    version_number INTEGER NOT NULL,
+    system_instructions TEXT,
+    voice VARCHAR,
+    noise_reduction_mode VARCHAR
+);
+CREATE TABLE assistant_configs (
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    name VARCHAR NOT NULL,
+    prompt_id INTEGER REFERENCES prompts (id),
+    prompt_version_id INTEGER REFERENCES prompt_versions (id),
+    voice VARCHAR DEFAULT 'alloy',
+    noise_reduction_mode VARCHAR DEFAULT 'near_field',
+    noise_reduction_threshold VARCHAR DEFAULT '0.5',
+    noise_reduction_prefix_padding_ms INTEGER DEFAULT 300,
+    noise_reduction_silence_duration_ms INTEGER DEFAULT 500,
+    additional_settings TEXT DEFAULT '{}',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME
+);
+"""
+
+
+def build_legacy_database(prompts: int):
+    """A user and key, `prompts` prompts with two versions each and an assistant per prompt"""
+    db = sqlite3.connect(DB_FILE)
+    db.executescript(LEGACY_SCHEMA)
+    db.executemany(
+        "INSERT INTO prompts (user_id, openai_key_id, name, description) VALUES (1, 1, ?, ?)",
+        [(f"prompt {i}", f"description {i}") for i in range(1, prompts + 1)]
+    )
+    db.executemany(
+        "INSERT INTO prompt_versions (prompt_id, version_number, system_instructions, voice) VALUES (?, ?, ?, 'ash')",
+        [(i, version, f"instructions {i} v{version}") for i in range(1, prompts + 1) for version in (1, 2)]
+    )
+    db.executemany(
+        "INSERT INTO assistant_configs (user_id, name, prompt_id) VALUES (1, ?, ?)",
+        [(f"assistant {i}", i) for i in range(1, prompts + 1)]
+    )
+    db.commit()
+    db.close()
+
+
+def run(*command: str):
+    result = subprocess.run([sys.executable, *command], cwd=BACKEND_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"`{' '.join(command)}` failed:\n{result.stdout[-2000:]}{result.stderr[-2000:]}")
+    return result.stdout
+
+
+class Writer(threading.Thread):
+    """Renames and deletes assistants until stopped, remembering what it committed"""
+
+    def __init__(self, prompts: int):
+        super().__init__(daemon=True)
+        # The last assistant is left alone for the agent check
+        self.ids = list(range(1, prompts))
+        self.names = {}
+        self.deleted = set()
+        self.stopped = threading.Event()
+
+    def run(self):
+        db = sqlite3.connect(DB_FILE, timeout=30)
+        sequence = 0
+        while not self.stopped.is_set() and self.ids:
+            sequence += 1
+            assistant_id = random.choice(self.ids)
+            try:
+                if sequence % 5 == 0:
+                    db.execute("DELETE FROM assistant_configs WHERE id = ?", (assistant_id,))
+                else:
+                    db.execute("UPDATE assistant_configs SET name = ? WHERE id = ?", (f"edited {sequence}", assistant_id))
+                db.commit()
+            except sqlite3.OperationalError:
+                # Busy past the timeout: nothing was committed
+                db.rollback()
+                continue
+            if sequence % 5 == 0:
+                self.ids.remove(assistant_id)
+                self.names.pop(assistant_id, None)
+                self.deleted.add(assistant_id)
+            else:
+                self.names[assistant_id] = f"edited {sequence}"
+            time.sleep(0.002)
+        db.close()
+
+
+def create_owner():
+    """The user and key the legacy rows belong to, in the tables migrate.py created"""
+    from app.database import SessionLocal
+    from app.models.openai_key import OpenAIKey
+    from app.models.user import User
+
+    db = SessionLocal()
+    try:
+        db.add(User(id=1, email="legacy@migration.example.com", username="legacy", hashed_password="-"))
+        db.add(OpenAIKey(id=1, user_id=1, key_name="legacy", encrypted_key="-"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def check(prompts: int, writer: Writer) -> list:
+    from sqlalchemy import inspect
+    from app.database import SessionLocal, engine
+    from app.models.agent import Agent
+    from app.models.assistant_config import AssistantConfig
+    from app.schema import get_database_revision, get_head_revision
+
+    failures = []
+    if get_database_revision() != get_head_revision():
+        failures.append(f"schema at revision {get_database_revision()}, expected {get_head_revision()}")
+    inspector = inspect(engine)
+    for table in ("prompts", "prompt_versions", "assistant_configs_new", "assistant_configs_changes"):
+        if inspector.has_table(table):
+            failures.append(f"{table} is still there")
+    for model in (Agent, AssistantConfig):
+        table = model.__table__
+        actual = {column["name"] for column in inspector.get_columns(table.name)}
+        expected = set(table.columns.keys())
+        if actual != expected:
+            failures.append(
+                f"{table.name}: missing {sorted(expected - actual)}, unexpected {sorted(actual - expected)}"
+            )
+    if failures:
+        return failures
+
+    db = SessionLocal()
+    try:
+        names = dict(db.query(AssistantConfig.id, AssistantConfig.name).all())
+        lost = [assistant_id for assistant_id, name in writer.names.items() if names.get(assistant_id) != name]
+        revived = [assistant_id for assistant_id in writer.deleted if assistant_id in names]
+        if lost:
+            failures.append(f"{len(lost)} of {len(writer.names)} renamed assistants lost the rename, e.g. {lost[:5]}")
+        if revived:
+            failures.append(f"{len(revived)} of {len(writer.deleted)} deleted assistants came back, e.g. {revived[:5]}")
+        agents = db.query(Agent).count()
+        if agents != prompts:
+            failures.append(f"{agents} agents for {prompts} prompts")
+        unmapped = db.query(AssistantConfig).filter(AssistantConfig.agent_id.is_(None)).count()
+        if unmapped:
+            failures.append(f"{unmapped} assistants without an agent")
+        assistant = db.query(AssistantConfig).order_by(AssistantConfig.id.desc()).first()
+        if assistant.agent.instructions != f"instructions {prompts} v2":
+            failures.append(f"assistant {assistant.id} points at the wrong agent")
+        assistant.name = "renamed"
+        db.commit()
+        if assistant.version != 2:
+            failures.append(f"assistant version is {assistant.version} after an update, expected 2")
+    finally:
+        db.close()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause-ms", type=float, default=5, help="Pause between batches, for the writer to get in")
+    args = parser.parse_args()
+
+    build_legacy_database(args.prompts)
+    run("migrate.py")
+    create_owner()
+    print(run("migrate_prompts_to_agents.py", "--dry-run").strip())
+    writer = Writer(args.prompts)
+    writer.start()
+    started = time.perf_counter()
+    try:
+        run("migrate_prompts_to_agents.py", "--batch-size", str(args.batch_size), "--pause-ms", str(args.pause_ms))
+    finally:
+        writer.stopped.set()
+        writer.join()
+    print(f"\nmigrated {args.prompts:,} prompts and assistants in {time.perf_counter() - started:.1f}s")
+    print(f"meanwhile {len(writer.names):,} assistants were renamed and {len(writer.deleted):,} deleted")
+
+    failures = check(args.prompts, writer)
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(f"{len(failures)} migration failures")
+    print("The migrated database matches the models at the head revision")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Query budget check for the hot routes
+
+Builds a throwaway SQLite database with `alembic upgrade head`, drives the
+routes that declare a `query_budget` (app/utils/query_budget.py) once on a
+small tenant and again after the tenant and the tables have grown, with
+QUERY_BUDGET_MODE=raise. Exits non-zero if a route exceeds its budget or
+sends more statements on the grown dataset, which is how an N+1 pattern
+(a query per row in a loop) shows up before it exceeds the budget.
+
+    python -m benchmarks.query_budgets
+"""
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import threading
+
+DB_FILE = os.path.join(tempfile.mkdtemp(prefix="query-budgets-"), "budgets.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+os.environ["QUERY_BUDGET_MODE"] = "raise"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import websockets  # noqa: E402
+
+
+def start_fake_upstream() -> int:
+    """A Realtime API stand-in that accepts the session and ignores it"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    ready = threading.Event()
+
+    async def handler(ws):
+        async for _ in ws:
+            pass
+
+    async def serve():
+        async with websockets.serve(handler, "127.0.0.1", port):
+            ready.set()
+            await asyncio.Future()
+
+    threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+    ready.wait()
+    return port
+
+
+os.environ["OPENAI_REALTIME_URL"] = f"ws://127.0.0.1:{start_fake_upstream()}"
+
+from fastapi.routing import APIRoute, APIWebSocketRoute  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from app.database import engine, SessionLocal  # noqa: E402
+from app.schema import upgrade_schema  # noqa: E402
+from app.utils.query_budget import QueryBudgetExceeded  # noqa: E402
+from benchmarks.api import ADMIN_EMAIL, ADMIN_PASSWORD, QueryCounter, ensure_admin  # noqa: E402
+from benchmarks.dataset import generate_dataset  # noqa: E402
+
+TENANT_EMAIL = "tenant@budgets.example.com"
+TENANT_PASSWORD = "budgets"
+ORIGIN = "https://example.com"
+
+
+def budgets(app) -> dict:
+    """Endpoint name -> declared budget"""
+    return {
+        route.endpoint.__name__: route.endpoint.query_budget
+        for route in app.routes
+        if isinstance(route, (APIRoute, APIWebSocketRoute)) and hasattr(route.endpoint, "query_budget")
+    }
+
+
+class Tenant:
+    """A regular user with a key, agents and assistants, created through the API"""
+
+    def __init__(self, client: TestClient, admin: dict):
+        self.client = client
+        self.admin = admin
+        self.user_id = client.post("/api/users", json={
+            "email": TENANT_EMAIL, "username": "budgets", "password": TENANT_PASSWORD
+        }, headers=admin).json()["id"]
+        token = client.post("/api/auth/login", json={"email": TENANT_EMAIL, "password": TENANT_PASSWORD}).json()
+        self.headers = {"Authorization": f"Bearer {token['access_token']}"}
+        self.key_id = self.add_key()
+        self.agent_id = self.add_agents(1)[0]
+        self.add_assistants(1)
+
+    def add_key(self) -> int:
+        return self.client.post("/api/openai-keys", json={
+            "key_name": "budgets", "api_key": "sk-" + "x" * 40
+        }, headers=self.headers).json()["id"]
+
+    def add_agents(self, count: int) -> list:
+        agents = [
+            {"name": f"agent {i}", "domain": "example.com", "openai_key_id": self.key_id, "instructions": "Be brief."}
+            for i in range(count)
+        ]
+        results = self.client.post("/api/agents/bulk", json=agents, headers=self.headers).json()["results"]
+        return [result["id"] for result in results]
+
+    def add_assistants(self, count: int):
+        for i in range(count):
+            self.client.post("/api/assistants", json={
+                "name": f"assistant {i}", "agent_id": self.agent_id
+            }, headers=self.headers)
+
+
+def drive(client: TestClient, tenant: Tenant, counter: QueryCounter) -> dict:
+    """Statements per call of each budgeted route, or the budget breach"""
+    admin = tenant.admin
+
+    def widget_session():
+        with client.websocket_connect(f"/api/widget/ws?agent_id={tenant.agent_id}", headers={"origin": ORIGIN}) as ws:
+            message = ws.receive_json()
+            if message["type"] != "connected":
+                raise RuntimeError(f"Widget session failed: {message}")
+
+    calls = {
+        "list_agents": lambda: client.get("/api/agents", headers=tenant.headers),
+        "get_agent": lambda: client.get(f"/api/agents/{tenant.agent_id}", headers=tenant.headers),
+        "generate_agent_widget_code": lambda: client.get(
+            f"/api/widget/code/agent/{tenant.agent_id}", headers=tenant.headers
+        ),
+        "get_user_profile": lambda: client.get(f"/api/users/{tenant.user_id}/profile", headers=admin),
+        "get_user_widgets": lambda: client.get(f"/api/users/{tenant.user_id}/widgets", headers=admin),
+        "widget_websocket": widget_session,
+    }
+    results = {}
+    for name, call in calls.items():
+        counter.count = 0
+        try:
+            response = call()
+            if response is not None and response.status_code >= 400:
+                raise RuntimeError(f"{name} -> {response.status_code}: {response.text[:200]}")
+            results[name] = counter.count
+        except QueryBudgetExceeded as e:
+            results[name] = e
+    return results
+
+
+def main():
+    upgrade_schema()
+    db = SessionLocal()
+    try:
+        ensure_admin(db)
+    finally:
+        db.close()
+
+    import main as app_main
+    declared = budgets(app_main.app)
+    counter = QueryCounter()
+    with TestClient(app_main.app) as client:
+        token = client.post("/api/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}).json()
+        admin = {"Authorization": f"Bearer {token['access_token']}"}
+        tenant = Tenant(client, admin)
+
+        event.listen(engine, "before_cursor_execute", counter)
+        small = drive(client, tenant, counter)
+        event.remove(engine, "before_cursor_execute", counter)
+
+        tenant.add_key()
+        tenant.add_agents(300)
+        tenant.add_assistants(20)
+        generate_dataset(users=200, agents=2000, instructions_chars=200, progress=False)
+
+        event.listen(engine, "before_cursor_execute", counter)
+        grown = drive(client, tenant, counter)
+        event.remove(engine, "before_cursor_execute", counter)
+
+    failures = []
+    print(f"{'route':<28} {'budget':>6} {'small':>6} {'grown':>6}")
+    for name, budget in declared.items():
+        before, after = small.get(name), grown.get(name)
+        print(f"{name:<28} {budget:>6} {str(before if isinstance(before, int) else 'OVER'):>6} "
+              f"{str(after if isinstance(after, int) else 'OVER'):>6}")
+        for result in (before, after):
+            if isinstance(result, QueryBudgetExceeded):
+                failures.append(str(result))
+        if name not in small:
+            failures.append(f"{name} declares a budget but is not driven by this check")
+        elif isinstance(before, int) and isinstance(after, int) and after > before:
+            failures.append(f"{name} sent {before} statements on the small dataset and {after} on the grown one")
+
+    for failure in failures:
+        print(f"\n{failure}")
+    if failures:
+        sys.exit(f"{len(failures)} query budget failures")
+    print("\nEvery budgeted route stays within its budget as the data grows")
+
+
+if __name__ == "__main__":
+    main()
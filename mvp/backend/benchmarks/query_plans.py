@@ -0,0 +1,145 @@
+"""
+Query plan check for the REST routes
+
+Builds a throwaway SQLite database with `alembic upgrade head`, drives every
+route that filters rows, captures the SQL each one sends, and runs
+EXPLAIN QUERY PLAN on it. Exits non-zero if a filtered query falls back to a
+full table scan (statements without a WHERE clause, such as the superadmin
+user listing, are intentional scans and are skipped).
+
+    python -m benchmarks.query_plans
+"""
+import os
+import re
+import sys
+import tempfile
+
+DB_FILE = os.path.join(tempfile.mkdtemp(prefix="query-plans-"), "plans.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from app.database import engine, SessionLocal  # noqa: E402
+from app.models.user import User, UserRole  # noqa: E402
+from app.utils.auth import get_password_hash  # noqa: E402
+
+FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(\w+)(?! USING (COVERING )?INDEX)")
+
+captured = []
+current_route = None
+
+
+def capture(conn, cursor, statement, parameters, context, executemany):
+    if not executemany and current_route:
+        captured.append((current_route, statement, parameters))
+
+
+def migrate():
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    command.upgrade(config, "head")
+
+
+def seed_superadmin():
+    db = SessionLocal()
+    db.add(User(
+        email="plans@example.com",
+        username="plans",
+        hashed_password=get_password_hash("plans"),
+        role=UserRole.SUPERADMIN
+    ))
+    db.commit()
+    db.close()
+
+
+def drive_routes(client: TestClient):
+    """Call each route once, tagging the statements it sends"""
+    def call(method, url, **kwargs):
+        global current_route
+        current_route = f"{method} {url}"
+        try:
+            return client.request(method, url, **kwargs)
+        finally:
+            current_route = None
+
+    token = call("POST", "/api/auth/login", json={"email": "plans@example.com", "password": "plans"}).json()["access_token"]
+    client.headers["Authorization"] = f"Bearer {token}"
+
+    key = call("POST", "/api/openai-keys", json={"key_name": "plans", "api_key": "sk-" + "x" * 40}).json()
+    agent = call("POST", "/api/agents", json={
+        "name": "plans", "domain": "example.com", "openai_key_id": key["id"], "instructions": "Be brief."
+    }).json()
+    assistant = call("POST", "/api/assistants", json={"name": "plans", "agent_id": agent["id"]}).json()
+    other = call("POST", "/api/users", json={"email": "other@example.com", "username": "other", "password": "x"}).json()
+
+    call("GET", "/api/auth/me")
+    call("GET", "/api/agents")
+    call("GET", f"/api/agents?openai_key_id={key['id']}")
+    page = call("GET", "/api/agents?limit=1&fields=id,name")
+    call("GET", "/api/agents", params={"limit": 1, "cursor": page.headers.get("X-Next-Cursor") or "eyJpZCI6IDB9"})
+    call("GET", f"/api/agents/{agent['id']}")
+    call("PUT", f"/api/agents/{agent['id']}", json={"voice": "ash"})
+    call("GET", "/api/openai-keys")
+    call("GET", f"/api/openai-keys/{key['id']}")
+    call("GET", f"/api/openai-keys/{key['id']}/masked")
+    call("GET", "/api/assistants")
+    call("GET", f"/api/assistants/{assistant['id']}")
+    call("PUT", f"/api/assistants/{assistant['id']}", json={"name": "renamed"})
+    call("GET", f"/api/widget/code/agent/{agent['id']}")
+    call("GET", f"/api/widget/code/{assistant['id']}")
+    call("GET", "/api/users")
+    call("GET", f"/api/users/{other['id']}")
+    call("GET", f"/api/users/{other['id']}/profile")
+    call("GET", f"/api/users/{other['id']}/widgets")
+    call("POST", "/api/users/profiles", json={"user_ids": [other["id"]]})
+    call("PATCH", f"/api/users/{other['id']}/toggle-active")
+    call("PATCH", f"/api/openai-keys/{key['id']}/toggle")
+    call("DELETE", f"/api/assistants/{assistant['id']}")
+    call("DELETE", f"/api/agents/{agent['id']}")
+    call("DELETE", f"/api/openai-keys/{key['id']}")
+
+
+def main():
+    migrate()
+    seed_superadmin()
+
+    import main as app_main
+    event.listen(engine, "before_cursor_execute", capture)
+    with TestClient(app_main.app, raise_server_exceptions=False) as client:
+        drive_routes(client)
+    event.remove(engine, "before_cursor_execute", capture)
+
+    failures = []
+    checked = set()
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for label, statement, parameters in captured:
+            normalized = " ".join(statement.split())
+            if " WHERE " not in normalized or normalized.startswith("INSERT"):
+                continue
+            if normalized in checked:
+                continue
+            checked.add(normalized)
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            for row in cursor.fetchall():
+                detail = row[-1]
+                if FULL_SCAN.match(detail):
+                    failures.append((label, detail, normalized))
+    finally:
+        raw.close()
+
+    print(f"Checked {len(checked)} distinct filtered statements")
+    for label, detail, statement in failures:
+        print(f"FULL SCAN  {label}: {detail}\n    {statement}")
+    if failures:
+        sys.exit(f"{len(failures)} route queries fall back to a full table scan")
+    print("No route query falls back to a full table scan")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""
+Relay throughput microbenchmarks
+
+Replays realtime session traces through the widget relay with in-memory
+socket doubles: upstream events through `handle_openai_messages` and
+client messages through `handle_client_messages` (the client-to-upstream
+loop of `widget_websocket`). The client side is a real Starlette WebSocket
+on an in-memory ASGI channel, so JSON encoding and ASGI sends are measured.
+
+Traces are generated to match the Realtime API event shapes and the
+widget's audio chunking (2048 samples of pcm16 at 24 kHz per client chunk,
+100 ms output audio deltas):
+- talkative:   long assistant answers, a few user turns
+- barge_in:    the user interrupts most answers after a second or two
+- long_silence: the microphone streams with nobody speaking
+
+Sessions recorded with session capture can be replayed with --capture.
+
+For each trace and direction it reports events/sec on one core, CPU
+milliseconds per second of audio relayed, and memory per event (peak
+transient bytes allocated while handling an event, and blocks retained per
+event, which should be ~0) from a separate tracemalloc pass.
+
+    python -m benchmarks.relay
+    python -m benchmarks.relay --trace talkative --repeat 5
+    python -m benchmarks.relay --capture captures/agent12-20261019T101500-1a2b3c4d.rtcap
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.websockets import WebSocket  # noqa: E402
+from app.routes.widget_realtime import WidgetSession, handle_client_messages, handle_openai_messages  # noqa: E402
+
+SAMPLE_RATE = 24000
+CLIENT_CHUNK_SAMPLES = 2048  # widget.js: 4096-sample buffers at 48 kHz, resampled to 24 kHz
+OUTPUT_DELTA_SECONDS = 0.1
+
+
+class TraceEvent(NamedTuple):
+    offset: float  # Seconds since the session started
+    direction: str  # "client" (widget -> server) or "upstream" (OpenAI -> server)
+    data: str
+
+
+class Trace(NamedTuple):
+    name: str
+    events: List[TraceEvent]
+    duration: float  # Session length in seconds
+    client_audio: float  # Seconds of audio sent by the widget
+    upstream_audio: float  # Seconds of audio sent by OpenAI
+
+
+# Trace generation
+
+class _TraceBuilder:
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.events: List[TraceEvent] = []
+        self.counter = 0
+        # A few distinct payloads are enough; sizes are what matter
+        self.client_audio = [self._audio(CLIENT_CHUNK_SAMPLES) for _ in range(8)]
+        self.output_audio = [self._audio(int(SAMPLE_RATE * OUTPUT_DELTA_SECONDS)) for _ in range(8)]
+        self.client_seconds = 0.0
+        self.upstream_seconds = 0.0
+
+    def _audio(self, samples: int) -> str:
+        return base64.b64encode(self.rng.randbytes(samples * 2)).decode()
+
+    def _event_id(self) -> str:
+        self.counter += 1
+        return f"event_{self.counter:08d}"
+
+    def upstream(self, offset: float, event_type: str, **fields):
+        payload = {"type": event_type, "event_id": self._event_id(), **fields}
+        self.events.append(TraceEvent(offset, "upstream", json.dumps(payload)))
+
+    def microphone(self, start: float, end: float):
+        """The widget streams microphone audio for as long as it records"""
+        chunk = CLIENT_CHUNK_SAMPLES / SAMPLE_RATE
+        offset = start
+        while offset < end:
+            audio = self.rng.choice(self.client_audio)
+            self.events.append(TraceEvent(offset, "client", json.dumps({"action": "audio_chunk", "audio": audio})))
+            self.client_seconds += chunk
+            offset += chunk
+
+    def user_turn(self, start: float, speech: float, item_id: str) -> float:
+        self.upstream(start, "input_audio_buffer.speech_started", audio_start_ms=int(start * 1000), item_id=item_id)
+        end = start + speech
+        self.upstream(end, "input_audio_buffer.speech_stopped", audio_end_ms=int(end * 1000), item_id=item_id)
+        self.upstream(end + 0.01, "input_audio_buffer.committed", previous_item_id=None, item_id=item_id)
+        self.upstream(end + 0.02, "conversation.item.created", item={"id": item_id, "type": "message", "role": "user"})
+        self.upstream(
+            end + 0.4, "conversation.item.input_audio_transcription.completed",
+            item_id=item_id, content_index=0, transcript="Could you tell me more about that, please?"
+        )
+        return end
+
+    def response(self, start: float, audio_seconds: float, cancelled: bool = False) -> float:
+        """An assistant answer; audio arrives faster than real time, in bursts"""
+        response_id = f"resp_{self.counter:08d}"
+        item_id = f"item_{self.counter:08d}"
+        ids = {"response_id": response_id, "item_id": item_id, "output_index": 0, "content_index": 0}
+        self.upstream(start, "response.created", response={"id": response_id, "status": "in_progress"})
+        self.upstream(start + 0.01, "response.output_item.added", response_id=response_id, output_index=0,
+                      item={"id": item_id, "type": "message", "role": "assistant"})
+        self.upstream(start + 0.02, "response.content_part.added", part={"type": "audio"}, **ids)
+
+        offset = start + 0.3
+        words = []
+        for n in range(int(audio_seconds / OUTPUT_DELTA_SECONDS)):
+            self.upstream(offset, "response.audio.delta", delta=self.rng.choice(self.output_audio), **ids)
+            self.upstream_seconds += OUTPUT_DELTA_SECONDS
+            if n % 4 == 0:
+                word = self.rng.choice(["sure", "the", "order", "ships", "tomorrow", "and", "you", "will", "get"])
+                words.append(word)
+                self.upstream(offset + 0.001, "response.audio_transcript.delta", delta=word + " ", **ids)
+            offset += OUTPUT_DELTA_SECONDS / 3
+
+        status = "cancelled" if cancelled else "completed"
+        if cancelled:
+            self.upstream(offset, "conversation.item.truncated", item_id=item_id, content_index=0,
+                          audio_end_ms=int(audio_seconds * 1000))
+        self.upstream(offset + 0.01, "response.audio.done", **ids)
+        self.upstream(offset + 0.02, "response.audio_transcript.done", transcript=" ".join(words), **ids)
+        self.upstream(offset + 0.03, "response.content_part.done", part={"type": "audio"}, **ids)
+        self.upstream(offset + 0.04, "response.output_item.done", response_id=response_id, output_index=0,
+                      item={"id": item_id, "status": status})
+        self.upstream(offset + 0.05, "response.done", response={
+            "id": response_id, "status": status,
+            "usage": {"total_tokens": 900, "input_tokens": 600, "output_tokens": 300}
+        })
+        self.upstream(offset + 0.06, "rate_limits.updated", rate_limits=[
+            {"name": "tokens", "limit": 20000, "remaining": 19000, "reset_seconds": 3.0}
+        ])
+        # The answer plays for its full length on the client
+        return start + 0.3 + audio_seconds
+
+    def build(self, name: str, duration: float) -> Trace:
+        self.events.sort(key=lambda event: event.offset)
+        return Trace(name, self.events, duration, self.client_seconds, self.upstream_seconds)
+
+
+def talkative_trace(seed: int = 1, turns: int = 10) -> Trace:
+    builder = _TraceBuilder(seed)
+    builder.upstream(0.0, "session.created", session={"id": "sess_bench", "model": "gpt-4o-realtime-preview"})
+    offset = 0.5
+    for turn in range(turns):
+        speech_end = builder.user_turn(offset, 2.0, f"item_user_{turn}")
+        offset = builder.response(speech_end + 0.5, 12.0) + 0.5
+    builder.microphone(0.0, offset)
+    return builder.build("talkative", offset)
+
+
+def barge_in_trace(seed: int = 2, turns: int = 30) -> Trace:
+    builder = _TraceBuilder(seed)
+    builder.upstream(0.0, "session.created", session={"id": "sess_bench", "model": "gpt-4o-realtime-preview"})
+    offset = 0.5
+    for turn in range(turns):
+        speech_end = builder.user_turn(offset, 1.0, f"item_user_{turn}")
+        heard = builder.rng.uniform(1.0, 2.5)
+        # The whole answer is generated, the user cuts in after `heard` seconds
+        builder.response(speech_end + 0.4, 6.0, cancelled=True)
+        offset = speech_end + 0.4 + 0.3 + heard
+    builder.microphone(0.0, offset)
+    return builder.build("barge_in", offset)
+
+
+def long_silence_trace(seed: int = 3, seconds: float = 120.0) -> Trace:
+    builder = _TraceBuilder(seed)
+    builder.upstream(0.0, "session.created", session={"id": "sess_bench", "model": "gpt-4o-realtime-preview"})
+    builder.microphone(0.0, seconds)
+    return builder.build("long_silence", seconds)
+
+
+def _audio_seconds(audio_base64: str) -> float:
+    return len(audio_base64) * 3 / 4 / 2 / SAMPLE_RATE
+
+
+def trace_from_capture(path: str) -> Trace:
+    """A trace from a session capture (app/utils/session_capture.py)"""
+    from app.utils.session_capture import CLIENT, CaptureReader
+
+    events = []
+    client_audio = upstream_audio = 0.0
+    with CaptureReader(path) as reader:
+        for record in reader:
+            try:
+                data = json.loads(record.data)
+            except ValueError:
+                data = {}
+            if record.direction == CLIENT:
+                events.append(TraceEvent(record.offset, "client", record.data))
+                if data.get("action") == "audio_chunk":
+                    client_audio += _audio_seconds(data.get("audio") or "")
+            else:
+                events.append(TraceEvent(record.offset, "upstream", record.data))
+                if data.get("type") == "response.audio.delta":
+                    upstream_audio += _audio_seconds(data.get("delta") or "")
+    duration = events[-1].offset if events else 0.0
+    return Trace(os.path.basename(path), events, duration, client_audio, upstream_audio)
+
+
+TRACES: Dict[str, Callable[[], Trace]] = {
+    "talkative": talkative_trace,
+    "barge_in": barge_in_trace,
+    "long_silence": long_silence_trace,
+}
+
+
+# Socket doubles
+
+class AllocationProbe:
+    """Peak transient memory per event, sampled between events"""
+
+    def __init__(self):
+        # Running totals rather than a list, so the probe itself retains nothing
+        self.total = 0
+        self.events = 0
+        self.base = 0
+
+    def tick(self):
+        peak = tracemalloc.get_traced_memory()[1]
+        if self.base:
+            self.total += peak - self.base
+            self.events += 1
+        tracemalloc.reset_peak()
+        self.base = tracemalloc.get_traced_memory()[0]
+
+
+class FakeUpstream:
+    """Stands in for the OpenAI websockets client connection; `messages` may be an async iterable"""
+
+    def __init__(self, messages, probe: Optional[AllocationProbe] = None):
+        self.messages = messages
+        self.probe = probe
+        self.open = True
+        self.sent = 0
+        self.sent_bytes = 0
+
+    async def send(self, message: str):
+        self.sent += 1
+        self.sent_bytes += len(message)
+
+    async def close(self):
+        self.open = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        probe = self.probe
+        if hasattr(self.messages, "__aiter__"):
+            async for message in self.messages:
+                yield message
+            return
+        for message in self.messages:
+            if probe:
+                probe.tick()
+            yield message
+        if probe:
+            probe.tick()
+
+
+async def client_websocket(
+    messages,
+    probe: Optional[AllocationProbe] = None,
+    on_send: Optional[Callable[[str], None]] = None
+):
+    """
+    An accepted Starlette WebSocket whose peer sends `messages` (a list or an
+    async iterable), then disconnects. `on_send` sees every text frame the
+    server sends to the peer.
+    """
+    paced = hasattr(messages, "__aiter__")
+    incoming = aiter(messages) if paced else iter(messages)
+    counters = {"sent": 0, "sent_bytes": 0}
+    connected = False
+
+    async def receive():
+        nonlocal connected
+        if not connected:
+            connected = True
+            return {"type": "websocket.connect"}
+        if probe:
+            probe.tick()
+        text = await anext(incoming, None) if paced else next(incoming, None)
+        if text is None:
+            return {"type": "websocket.disconnect", "code": 1000}
+        return {"type": "websocket.receive", "text": text}
+
+    async def send(message):
+        if message["type"] == "websocket.send":
+            text = message.get("text") or ""
+            counters["sent"] += 1
+            counters["sent_bytes"] += len(text)
+            if on_send:
+                on_send(text)
+
+    scope = {"type": "websocket", "path": "/api/widget/ws", "headers": [], "query_string": b"", "subprotocols": []}
+    websocket = WebSocket(scope, receive, send)
+    await websocket.accept()
+    return websocket, counters
+
+
+# Measurement
+
+async def _relay_upstream(messages, probe=None):
+    client, counters = await client_websocket([])
+    await handle_openai_messages(WidgetSession(client, FakeUpstream(messages, probe)))
+    return counters["sent"]
+
+
+async def _relay_client(messages, probe=None):
+    upstream = FakeUpstream([])
+    client, _ = await client_websocket(messages, probe)
+    await handle_client_messages(WidgetSession(client, upstream))
+    return upstream.sent
+
+
+def measure(trace: Trace, direction: str, repeat: int) -> dict:
+    messages = [event.data for event in trace.events if event.direction == direction]
+    relay = _relay_upstream if direction == "upstream" else _relay_client
+    audio = trace.upstream_audio if direction == "upstream" else trace.client_audio
+
+    best_wall = best_cpu = float("inf")
+    forwarded = 0
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            wall, cpu = time.perf_counter(), time.process_time()
+            forwarded = asyncio.run(relay(messages))
+            best_wall = min(best_wall, time.perf_counter() - wall)
+            best_cpu = min(best_cpu, time.process_time() - cpu)
+
+        probe = AllocationProbe()
+        tracemalloc.start()
+        blocks = sys.getallocatedblocks()
+        asyncio.run(relay(messages, probe))
+        retained = sys.getallocatedblocks() - blocks
+        tracemalloc.stop()
+
+    events = len(messages)
+    return {
+        "events": events,
+        "forwarded": forwarded,
+        "events_per_sec": events / best_wall if best_wall else 0.0,
+        "cpu_ms_per_audio_second": best_cpu * 1000 / audio if audio else None,
+        "cpu_ms_per_session_second": best_cpu * 1000 / trace.duration if trace.duration else 0.0,
+        "alloc_bytes_per_event": probe.total / probe.events if probe.events else 0.0,
+        "retained_blocks_per_event": retained / events if events else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trace", choices=list(TRACES), action="append", help="Trace to replay (default: all)")
+    parser.add_argument("--capture", action="append", default=[], help="Session capture file to replay as a trace")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per trace, best is reported")
+    args = parser.parse_args()
+
+    print(
+        f"{'trace':<13} {'direction':<9} {'events':>7} {'events/s':>10} "
+        f"{'cpu ms/audio s':>15} {'cpu ms/session s':>17} {'alloc B/event':>14} {'retained':>9}"
+    )
+    names = args.trace or ([] if args.capture else list(TRACES))
+    traces = [TRACES[name] for name in names] + [lambda path=path: trace_from_capture(path) for path in args.capture]
+    for make_trace in traces:
+        trace = make_trace()
+        name = trace.name
+        for direction in ("upstream", "client"):
+            result = measure(trace, direction, args.repeat)
+            cpu_audio = result["cpu_ms_per_audio_second"]
+            print(
+                f"{name:<13} {direction:<9} {result['events']:>7} {result['events_per_sec']:>10,.0f} "
+                f"{f'{cpu_audio:.3f}' if cpu_audio is not None else '-':>15} "
+                f"{result['cpu_ms_per_session_second']:>17.3f} "
+                f"{result['alloc_bytes_per_event']:>14,.0f} {result['retained_blocks_per_event']:>9.3f}"
+            )
+        print(
+            f"{'':<13} session {trace.duration:.0f}s, audio in {trace.client_audio:.0f}s, "
+            f"audio out {trace.upstream_audio:.0f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
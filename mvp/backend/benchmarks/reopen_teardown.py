@@ -0,0 +1,163 @@
+"""
+Upstream teardown while a reopen is in flight
+
+A widget that disconnects (or fails the heartbeat) while its session is
+bringing the OpenAI socket back must not leave that socket open: nothing
+would read it, the session counters no longer list it, and OpenAI bills it
+until it drops. This check runs one gateway worker (`gateway.run_worker`)
+against a local Realtime API stand-in that answers handshakes slowly, opens
+--sessions widget sessions per case and closes each widget at a different
+point of the reopen:
+- wake:      the session has gone idle and the caller speaks again
+- reconnect: the stand-in drops the upstream mid-session
+
+Afterwards the stand-in must have no connection left open and the gateway
+must report no upstream connections or relay tasks; it exits non-zero
+otherwise.
+
+    python -m benchmarks.reopen_teardown
+    python -m benchmarks.reopen_teardown --sessions 50
+
+The idle case waits for the session reaper, so it takes a few seconds.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.session_memory import ORIGIN, create_agent, free_port, health, start_gateway
+
+# Handshake delay of the stand-in once the sessions are set up; the widgets
+# close at offsets spread over twice this, so some land after the reopen
+HANDSHAKE_DELAY_S = 0.3
+LOUD_CHUNK = base64.b64encode(b"\xff\x3f" * 2048).decode()
+QUIET_CHUNK = base64.b64encode(bytes(2048 * 2)).decode()
+
+
+def serve_upstream(port: int, open_connections, slow):
+    """Realtime API stand-in: counts open connections, drops one on commit"""
+    import websockets
+
+    async def process_request(path, headers):
+        if slow.value:
+            await asyncio.sleep(HANDSHAKE_DELAY_S)
+        return None
+
+    async def handler(ws):
+        with open_connections.get_lock():
+            open_connections.value += 1
+        try:
+            async for message in ws:
+                if '"input_audio_buffer.commit"' in message:
+                    await ws.close(1011)
+                    break
+        finally:
+            with open_connections.get_lock():
+                open_connections.value -= 1
+
+    async def serve():
+        async with websockets.serve(handler, "127.0.0.1", port, process_request=process_request):
+            await asyncio.Future()
+
+    asyncio.run(serve())
+
+
+async def open_widget(url: str):
+    import websockets
+
+    ws = await websockets.connect(url, origin=ORIGIN)
+    message = json.loads(await ws.recv())
+    if message["type"] != "connected":
+        raise RuntimeError(f"Widget session failed: {message}")
+    return ws
+
+
+async def close_during_reopen(ws, case: str, close_after: float, idle_deadline: float):
+    """Start a reopen (idle wake-up or upstream drop) and close the widget `close_after` seconds in"""
+    try:
+        if case == "wake":
+            chunk = json.dumps({"action": "audio_chunk", "audio": QUIET_CHUNK})
+            while time.monotonic() < idle_deadline:
+                await ws.send(chunk)
+                try:
+                    message = json.loads(await asyncio.wait_for(ws.recv(), 0.1))
+                except asyncio.TimeoutError:
+                    continue
+                if message["type"] == "idle":
+                    break
+            else:
+                raise RuntimeError("The session did not go idle")
+            await ws.send(json.dumps({"action": "audio_chunk", "audio": LOUD_CHUNK}))
+        else:
+            await ws.send(json.dumps({"action": "commit"}))
+        await asyncio.sleep(close_after)
+    finally:
+        await ws.close()
+
+
+async def run_case(case: str, url: str, sessions: int, slow):
+    slow.value = 0
+    widgets = await asyncio.gather(*(open_widget(url) for _ in range(sessions)))
+    # Only the reopens answer slowly
+    slow.value = 1
+    idle_deadline = time.monotonic() + 30
+    step = 2 * HANDSHAKE_DELAY_S / sessions
+    await asyncio.gather(*(
+        close_during_reopen(ws, case, index * step, idle_deadline) for index, ws in enumerate(widgets)
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="widget sessions per case")
+    args = parser.parse_args()
+
+    os.environ.update(
+        WIDGET_IDLE_TIMEOUT_S="1",
+        WIDGET_HEARTBEAT_INTERVAL_S="0",
+        WIDGET_RECONNECT_ATTEMPTS="3"
+    )
+    agent_id = create_agent()
+    upstream_port, port = free_port(), free_port()
+    context = multiprocessing.get_context("spawn")
+    open_connections, slow = context.Value("i", 0), context.Value("i", 0)
+    upstream = context.Process(
+        target=serve_upstream, args=(upstream_port, open_connections, slow), daemon=True
+    )
+    upstream.start()
+    gateway = start_gateway(port, upstream_port)
+    url = f"ws://127.0.0.1:{port}/api/widget/ws?agent_id={agent_id}"
+
+    failures = []
+    try:
+        for case in ("wake", "reconnect"):
+            asyncio.run(run_case(case, url, args.sessions, slow))
+            # Past any handshake still in flight and the close handshakes
+            time.sleep(HANDSHAKE_DELAY_S + 2)
+            stats = health(port)
+            print(f"{case:<10} stand-in connections open: {open_connections.value}, "
+                  f"gateway upstreams: {stats['upstream_connections']}, relay tasks: {stats['relay_tasks']}")
+            if open_connections.value or stats["upstream_connections"] or stats["relay_tasks"]:
+                failures.append(f"{case}: upstreams left open after the widgets closed")
+    finally:
+        gateway.terminate()
+        try:
+            gateway.wait(10)
+        except subprocess.TimeoutExpired:
+            gateway.kill()
+        upstream.terminate()
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(f"{len(failures)} teardown failures")
+    print("No upstream outlives its widget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Replay a realtime session capture
+
+Feeds a captured session (see app/utils/session_capture.py) back through
+the relay with its original timing, time-compressed (--speed 10) or as fast
+as possible (--speed 0):
+
+- fake (default): the widget relay loops run in-process on in-memory
+  sockets. The widget side plays the captured client frames, the upstream
+  side plays the captured OpenAI frames.
+- proxy: acts as the widget against a running server. With --upstream-port
+  the tool also serves the captured OpenAI frames as a fake upstream; start
+  the server with OPENAI_REALTIME_URL=ws://127.0.0.1:<port> so it connects
+  there. Without it the server talks to OpenAI and only the client side is
+  replayed.
+
+Reported: how late frames were handed over relative to the schedule (event
+loop stalls show up here), upstream-to-widget latency of audio chunks, and
+playback stalls: gaps a widget playing audio in real time would hear.
+
+    python -m benchmarks.replay captures/agent12-20261019T101500-1a2b3c4d.rtcap
+    python -m benchmarks.replay capture.rtcap --speed 10
+
+    OPENAI_REALTIME_URL=ws://127.0.0.1:9100 uvicorn main:app --port 8000
+    python -m benchmarks.replay capture.rtcap --target proxy --url ws://127.0.0.1:8000 \\
+        --agent-id 12 --origin https://example.com --upstream-port 9100
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.session_capture import CLIENT, CaptureReader, CaptureRecord  # noqa: E402
+from benchmarks.relay import FakeUpstream, client_websocket, _audio_seconds  # noqa: E402
+
+
+class Schedule:
+    """Paces frames against a start time shared by both directions"""
+
+    def __init__(self, speed: float):
+        self.speed = speed
+        self.start: Optional[float] = None
+
+    def begin(self):
+        if self.start is None:
+            self.start = time.perf_counter()
+
+    async def play(self, records: List[CaptureRecord], lateness: List[float]) -> AsyncIterator[str]:
+        """Yield each frame when it is due; `lateness` collects how late it was taken"""
+        for record in records:
+            if self.speed:
+                self.begin()
+                due = self.start + record.offset / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                lateness.append(max(0.0, time.perf_counter() - due))
+            yield record.data
+
+
+class AudioTimeline:
+    """Matches audio sent upstream-side with audio arriving at the widget"""
+
+    def __init__(self, speed: float):
+        self.speed = speed or 1.0
+        self.sent_at: Dict[str, float] = {}
+        self.latencies: List[float] = []
+        self.chunks = 0
+        self.playhead: Optional[float] = None  # When the audio received so far finishes playing
+        self.stalls: List[float] = []
+
+    async def track_upstream(self, frames: AsyncIterator[str]) -> AsyncIterator[str]:
+        async for frame in frames:
+            if '"response.audio.delta"' in frame:
+                delta = json.loads(frame).get("delta")
+                if delta:
+                    self.sent_at[delta] = time.perf_counter()
+            yield frame
+
+    def client_received(self, text: str):
+        if '"audio_chunk"' in text:
+            now = time.perf_counter()
+            audio = json.loads(text).get("audio") or ""
+            self.chunks += 1
+            sent = self.sent_at.pop(audio, None)
+            if sent is not None:
+                self.latencies.append(now - sent)
+            if self.playhead is not None and now > self.playhead:
+                self.stalls.append(now - self.playhead)
+            self.playhead = max(self.playhead or now, now) + _audio_seconds(audio) / self.speed
+        elif '"response_done"' in text or '"speech_started"' in text:
+            # Silence between answers (or after a barge-in) is not a stall
+            self.playhead = None
+
+
+def _ms(values: List[float], fraction: float) -> str:
+    if not values:
+        return "n/a"
+    ordered = sorted(values)
+    return f"{ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000:.1f}"
+
+
+def _late_summary(values: List[float]) -> str:
+    return f"late p50 {_ms(values, 0.5)} ms, p99 {_ms(values, 0.99)} ms, max {_ms(values, 1.0)} ms"
+
+
+async def replay_fake(client_records, upstream_records, schedule, timeline, client_late, upstream_late):
+    """Run both relay loops in-process against the captured frames"""
+    from app.routes.widget_realtime import WidgetSession, handle_client_messages, handle_openai_messages
+
+    client, counters = await client_websocket(
+        schedule.play(client_records, client_late), on_send=timeline.client_received
+    )
+    upstream = FakeUpstream(timeline.track_upstream(schedule.play(upstream_records, upstream_late)))
+    schedule.begin()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        session = WidgetSession(client, upstream)
+        upstream_task = asyncio.create_task(handle_openai_messages(session))
+        await handle_client_messages(session)
+        # The captured upstream side plays to its end
+        await upstream_task
+    return counters["sent"]
+
+
+async def replay_proxy(args, client_records, upstream_records, schedule, timeline, client_late, upstream_late):
+    """Act as the widget against a running server, optionally serving the upstream side too"""
+    import websockets
+
+    upstream_done = asyncio.Event()
+    server = None
+    if args.upstream_port:
+        async def serve_upstream(ws):
+            drain = asyncio.create_task(_drain(ws))
+            try:
+                async for frame in timeline.track_upstream(schedule.play(upstream_records, upstream_late)):
+                    await ws.send(frame)
+            except websockets.ConnectionClosed:
+                pass
+            finally:
+                upstream_done.set()
+            await drain
+
+        server = await websockets.serve(serve_upstream, "127.0.0.1", args.upstream_port, max_size=None)
+        print(f"   Fake upstream on ws://127.0.0.1:{args.upstream_port}")
+
+    received = 0
+    url = f"{args.url.rstrip('/')}/api/widget/ws?agent_id={args.agent_id}"
+    headers = {"Origin": args.origin} if args.origin else {}
+    try:
+        async with websockets.connect(url, extra_headers=headers, max_size=None) as ws:
+            schedule.begin()
+
+            async def receive():
+                nonlocal received
+                async for message in ws:
+                    received += 1
+                    timeline.client_received(message)
+
+            receiver = asyncio.create_task(receive())
+            async for frame in schedule.play(client_records, client_late):
+                await ws.send(frame)
+            if server:
+                await upstream_done.wait()
+            # Let the last responses arrive
+            await asyncio.sleep(args.grace)
+            receiver.cancel()
+    finally:
+        if server:
+            server.close()
+            await server.wait_closed()
+    return received
+
+
+async def _drain(ws):
+    """Read (and ignore) what the proxy sends upstream"""
+    try:
+        async for _ in ws:
+            pass
+    except Exception:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", help="Capture file (.rtcap)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time compression; 0 replays as fast as possible")
+    parser.add_argument("--target", choices=["fake", "proxy"], default="fake")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000", help="Server to replay against (proxy target)")
+    parser.add_argument("--agent-id", type=int, help="Agent to connect as (proxy target; default: the captured agent)")
+    parser.add_argument("--origin", help="Origin header sent to the server (proxy target)")
+    parser.add_argument("--upstream-port", type=int, help="Serve the captured OpenAI frames on this port (proxy target)")
+    parser.add_argument("--grace", type=float, default=2.0, help="Seconds to wait for replies after the last frame")
+    args = parser.parse_args()
+
+    with CaptureReader(args.capture) as reader:
+        records = list(reader)
+        metadata, summary = reader.metadata, reader.summary
+    client_records = [record for record in records if record.direction == CLIENT]
+    upstream_records = [record for record in records if record.direction != CLIENT]
+    duration = records[-1].offset if records else 0.0
+    args.agent_id = args.agent_id or metadata.get("agent_id")
+    args.origin = args.origin or metadata.get("origin")
+
+    speed = f"{args.speed:g}x" if args.speed else "full speed"
+    print(
+        f"🎬 Replaying {os.path.basename(args.capture)} (agent {metadata.get('agent_id')}, {duration:.1f}s, "
+        f"{len(client_records)} client / {len(upstream_records)} upstream frames) at {speed} through {args.target}"
+    )
+    if summary is None:
+        print("⚠️  Capture has no END record, the session was cut short")
+    elif summary.get("dropped"):
+        print(f"⚠️  {summary['dropped']} frames were dropped while capturing")
+
+    schedule = Schedule(args.speed)
+    timeline = AudioTimeline(args.speed)
+    client_late: List[float] = []
+    upstream_late: List[float] = []
+    started = time.perf_counter()
+    if args.target == "fake":
+        received = asyncio.run(replay_fake(
+            client_records, upstream_records, schedule, timeline, client_late, upstream_late
+        ))
+    else:
+        received = asyncio.run(replay_proxy(
+            args, client_records, upstream_records, schedule, timeline, client_late, upstream_late
+        ))
+    elapsed = time.perf_counter() - started
+
+    print(f"   Client frames:   {len(client_records)} sent, {_late_summary(client_late)}")
+    if args.target == "fake" or args.upstream_port:
+        print(f"   Upstream frames: {len(upstream_records)} sent, {_late_summary(upstream_late)}")
+    print(
+        f"   Widget received {received} messages, {timeline.chunks} audio chunks; relay latency "
+        f"p50 {_ms(timeline.latencies, 0.5)} ms, p99 {_ms(timeline.latencies, 0.99)} ms, "
+        f"max {_ms(timeline.latencies, 1.0)} ms"
+    )
+    if args.speed:
+        print(f"   Playback stalls: {len(timeline.stalls)}, {sum(timeline.stalls) * 1000:.0f} ms in total")
+    print(f"✅ Replayed in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
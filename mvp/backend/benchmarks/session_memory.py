@@ -0,0 +1,239 @@
+"""
+Memory per widget session
+
+Runs one realtime gateway worker (`gateway.run_worker`, so with the
+GATEWAY_* settings) against a throwaway SQLite database and a local stand-in for the Realtime
+API, opens --sessions widget sessions and reads the gateway's RSS from /proc:
+- base:   after startup and one warm-up session
+- idle:   every session connected and configured, nobody talking
+- active: --active of them streaming microphone audio (one 2048-sample chunk
+          every 85 ms, like widget.js) while the stand-in answers every
+          chunk with an audio delta of the same size
+
+It reports the RSS growth per idle session, the extra growth per active
+session, and what 10,000 idle sessions would take. The target is
+IDLE_TARGET_BYTES (80 KiB) per idle session, so that one worker holds 10k
+mostly idle sessions in under a gigabyte; the check exits non-zero above it.
+With permessage-deflate on either socket (GATEWAY_WS_PER_MESSAGE_DEFLATE,
+OPENAI_WS_COMPRESSION) the zlib state alone is over the target.
+
+    python -m benchmarks.session_memory
+    python -m benchmarks.session_memory --sessions 2000 --active 200
+
+The client side and the stand-in run in other processes, so only the
+gateway's own memory is measured. Opening many sessions needs two file
+descriptors per session in the gateway (`ulimit -n`).
+"""
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+WORK_DIR = tempfile.mkdtemp(prefix="session-memory-")
+DB_FILE = os.path.join(WORK_DIR, "sessions.db")
+GATEWAY_LOG = os.path.join(WORK_DIR, "gateway.log")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+IDLE_TARGET_BYTES = 80 * 1024
+PROJECTED_SESSIONS = 10_000
+ORIGIN = "https://example.com"
+CHUNK_SECONDS = 2048 / 24000
+AUDIO_CHUNK = base64.b64encode(bytes(2048 * 2)).decode()
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def serve_upstream(port: int):
+    """Realtime API stand-in: accepts any session and answers audio with audio"""
+    import websockets
+
+    reply = json.dumps({"type": "response.audio.delta", "delta": AUDIO_CHUNK})
+
+    async def handler(ws):
+        async for message in ws:
+            if '"input_audio_buffer.append"' in message:
+                await ws.send(reply)
+
+    async def serve():
+        async with websockets.serve(handler, "127.0.0.1", port, max_size=None):
+            await asyncio.Future()
+
+    asyncio.run(serve())
+
+
+def create_agent() -> int:
+    """An agent with an active key, written straight to the throwaway database"""
+    from app.database import SessionLocal
+    from app.models.agent import Agent
+    from app.models.openai_key import OpenAIKey
+    from app.models.user import User
+    from app.schema import upgrade_schema
+    from app.utils.encryption import encrypt_api_key
+
+    upgrade_schema()
+    db = SessionLocal()
+    try:
+        user = User(email="sessions@memory.example.com", username="sessions", hashed_password="-")
+        db.add(user)
+        db.flush()
+        key = OpenAIKey(user_id=user.id, key_name="sessions", encrypted_key=encrypt_api_key("sk-" + "x" * 40))
+        db.add(key)
+        db.flush()
+        agent = Agent(user_id=user.id, openai_key_id=key.id, name="sessions", domain="example.com",
+                      instructions="Be brief.")
+        db.add(agent)
+        db.commit()
+        return agent.id
+    finally:
+        db.close()
+
+
+def rss_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError(f"No VmRSS for pid {pid}")
+
+
+def health(port: int) -> dict:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=5) as response:
+        return json.loads(response.read())
+
+
+def start_gateway(port: int, upstream_port: int) -> subprocess.Popen:
+    env = dict(os.environ, OPENAI_REALTIME_URL=f"ws://127.0.0.1:{upstream_port}")
+    gateway = subprocess.Popen(
+        [sys.executable, "-c", f"import gateway; gateway.run_worker('127.0.0.1', {port})"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=open(GATEWAY_LOG, "w")
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            health(port)
+            return gateway
+        except OSError:
+            time.sleep(0.2)
+    gateway.kill()
+    sys.exit(f"The gateway did not start, see {GATEWAY_LOG}")
+
+
+async def open_session(url: str, limit: asyncio.Semaphore):
+    import websockets
+
+    async with limit:
+        ws = await websockets.connect(url, origin=ORIGIN, max_size=None)
+        message = json.loads(await ws.recv())
+        if message["type"] != "connected":
+            raise RuntimeError(f"Widget session failed: {message}")
+        return ws
+
+
+async def talk(ws, seconds: float):
+    """Stream microphone audio like widget.js and take in the answers"""
+    async def drain():
+        async for _ in ws:
+            pass
+
+    reader = asyncio.create_task(drain())
+    chunk = json.dumps({"action": "audio_chunk", "audio": AUDIO_CHUNK})
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        await ws.send(chunk)
+        await asyncio.sleep(CHUNK_SECONDS)
+    reader.cancel()
+
+
+async def run(args, gateway_pid: int, port: int, agent_id: int) -> dict:
+    url = f"ws://127.0.0.1:{port}/api/widget/ws?agent_id={agent_id}"
+    limit = asyncio.Semaphore(20)
+
+    # Warm-up: lazy imports, first connections, allocator pools
+    for ws in await asyncio.gather(*(open_session(url, limit) for _ in range(10))):
+        await ws.close()
+    await asyncio.sleep(1)
+    base = rss_bytes(gateway_pid)
+
+    started = time.perf_counter()
+    sessions = await asyncio.gather(*(open_session(url, limit) for _ in range(args.sessions)))
+    opened_s = time.perf_counter() - started
+    await asyncio.sleep(args.settle)
+    idle = rss_bytes(gateway_pid)
+    stats = health(port)
+
+    talking = [asyncio.create_task(talk(ws, args.active_seconds)) for ws in sessions[:args.active]]
+    peak = idle
+    while not all(task.done() for task in talking):
+        await asyncio.sleep(0.25)
+        peak = max(peak, rss_bytes(gateway_pid))
+    await asyncio.gather(*talking)
+
+    await asyncio.gather(*(ws.close() for ws in sessions))
+    return {"base": base, "idle": idle, "active": peak, "opened_s": opened_s, "stats": stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1000, help="widget sessions to open")
+    parser.add_argument("--active", type=int, default=100, help="sessions that stream audio")
+    parser.add_argument("--active-seconds", type=float, default=5.0)
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds to wait before reading idle RSS")
+    args = parser.parse_args()
+    args.active = min(args.active, args.sessions)
+
+    agent_id = create_agent()
+    upstream_port, port = free_port(), free_port()
+    upstream = multiprocessing.get_context("spawn").Process(target=serve_upstream, args=(upstream_port,), daemon=True)
+    upstream.start()
+    gateway = start_gateway(port, upstream_port)
+    try:
+        result = asyncio.run(run(args, gateway.pid, port, agent_id))
+    except Exception:
+        print(f"Gateway log: {GATEWAY_LOG}")
+        raise
+    finally:
+        gateway.terminate()
+        try:
+            gateway.wait(10)
+        except subprocess.TimeoutExpired:
+            gateway.kill()
+        upstream.terminate()
+
+    stats = result["stats"]
+    if stats["active_sessions"] != args.sessions or stats["upstream_connections"] != args.sessions:
+        sys.exit(f"Expected {args.sessions} sessions with upstreams, the gateway reported {stats}")
+
+    per_idle = (result["idle"] - result["base"]) / args.sessions
+    per_active = (result["active"] - result["idle"]) / args.active if args.active else 0
+    print(f"gateway RSS: {result['base'] / 2**20:.1f} MB base, {result['idle'] / 2**20:.1f} MB with "
+          f"{args.sessions} idle sessions, {result['active'] / 2**20:.1f} MB peak with {args.active} active")
+    print(f"opened {args.sessions} sessions in {result['opened_s']:.1f}s")
+    print(f"per idle session:   {per_idle / 1024:8.1f} KiB (target {IDLE_TARGET_BYTES / 1024:.0f} KiB)")
+    print(f"per active session: {per_active / 1024:8.1f} KiB on top of idle")
+    projected = result["base"] + PROJECTED_SESSIONS * per_idle
+    print(f"{PROJECTED_SESSIONS} idle sessions: ~{projected / 2**20:.0f} MB per worker")
+
+    if per_idle > IDLE_TARGET_BYTES:
+        sys.exit(f"An idle session takes {per_idle / 1024:.1f} KiB, over the {IDLE_TARGET_BYTES / 1024:.0f} KiB target")
+    print("Idle sessions are within the memory target")
+
+
+if __name__ == "__main__":
+    main()
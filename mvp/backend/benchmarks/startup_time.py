@@ -0,0 +1,71 @@
+"""
+Worker cold-start benchmark
+
+Measures, in fresh interpreters, the time to import `main` and run the
+startup handlers against a migrated SQLite database, and separately the
+schema step (startup handlers, which now only check the revision). `--create-all` adds the
+Base.metadata.create_all() call that workers used to run at import time, for
+a before/after comparison.
+
+    python -m benchmarks.startup_time --runs 10
+    python -m benchmarks.startup_time --runs 10 --create-all
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+if {create_all}:
+    from app.database import Base, engine
+    Base.metadata.create_all(bind=engine)
+asyncio.run(main.app.router.startup())
+ready = time.perf_counter()
+asyncio.run(main.app.router.shutdown())
+print(json.dumps({{"elapsed": ready - started, "schema": ready - imported}}))
+"""
+
+
+def run_worker(env: dict, create_all: bool) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", WORKER.format(create_all=create_all)],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--create-all", action="store_true", help="also run create_all() like workers used to")
+    args = parser.parse_args()
+
+    db_file = os.path.join(tempfile.mkdtemp(prefix="startup-bench-"), "startup.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_file}")
+    subprocess.run([sys.executable, "migrate.py"], cwd=BACKEND_DIR, env=env, capture_output=True, check=True)
+
+    runs = [run_worker(env, args.create_all) for _ in range(args.runs)]
+    label = "create_all + startup" if args.create_all else "startup"
+    for key, name in (("elapsed", "total cold start"), ("schema", label)):
+        timings = [run[key] * 1000 for run in runs]
+        print(
+            f"{name:<22} median {statistics.median(timings):8.1f}ms  "
+            f"min {min(timings):8.1f}ms  max {max(timings):8.1f}ms  ({args.runs} runs)"
+        )
+
+
+if __name__ == "__main__":
+    main()
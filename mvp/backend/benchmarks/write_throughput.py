@@ -0,0 +1,127 @@
+"""
+Write throughput benchmark: direct commits vs. the write coordinator
+
+Runs against a throwaway SQLite file. "direct" mode is the default
+configuration: several workers, each committing its own small transactions
+on a rollback-journal database. "coordinator" mode sends the same writes
+through the single-writer group-commit queue (WAL, group commits).
+
+    python -m benchmarks.write_throughput --writers 32 --writes 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+DB_FILE = os.path.join(tempfile.mkdtemp(prefix="write-bench-"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import Base, engine, SessionLocal  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.models.openai_key import OpenAIKey  # noqa: E402
+from app.utils import write_coordinator  # noqa: E402
+
+
+def setup_database(coordinated: bool) -> int:
+    settings.write_coordinator_enabled = coordinated
+    engine.dispose()
+    with engine.connect() as conn:
+        if not coordinated:
+            conn.exec_driver_sql("PRAGMA journal_mode = DELETE")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(email="bench@example.com", username="bench", hashed_password="x")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+    return user_id
+
+
+def new_key(user_id: int, n: int) -> OpenAIKey:
+    return OpenAIKey(user_id=user_id, key_name=f"key-{n}", encrypted_key="x" * 120)
+
+
+def run_direct(user_id: int, writers: int, writes: int) -> dict:
+    """Every writer commits each insert on its own connection"""
+    errors = []
+
+    def worker(index: int):
+        db = SessionLocal()
+        try:
+            for n in range(writes):
+                db.add(new_key(user_id, index * writes + n))
+                try:
+                    db.commit()
+                except OperationalError as e:
+                    db.rollback()
+                    errors.append(str(e.orig))
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(writers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "errors": len(errors), "batches": writers * writes}
+
+
+async def run_coordinator(user_id: int, writers: int, writes: int) -> dict:
+    """Every writer awaits its insert through the group-commit queue"""
+    coordinator = write_coordinator.start_write_coordinator()
+    errors = []
+
+    async def worker(index: int):
+        for n in range(writes):
+            try:
+                await write_coordinator.commit_save(None, new_key(user_id, index * writes + n))
+            except OperationalError as e:
+                errors.append(str(e.orig))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(writers)))
+    elapsed = time.perf_counter() - started
+    batches = coordinator.batches
+    write_coordinator.stop_write_coordinator()
+    return {"elapsed": elapsed, "errors": len(errors), "batches": batches}
+
+
+def report(mode: str, total: int, result: dict):
+    rate = total / result["elapsed"] if result["elapsed"] else 0
+    print(
+        f"{mode:<12} {total:>7} writes  {result['elapsed']:8.3f}s  "
+        f"{rate:10.1f} writes/s  {result['batches']:>7} commits  {result['errors']:>4} lock errors"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=32, help="concurrent writers")
+    parser.add_argument("--writes", type=int, default=50, help="writes per writer")
+    args = parser.parse_args()
+    total = args.writers * args.writes
+
+    print(f"Database: {DB_FILE} (busy_timeout={settings.sqlite_busy_timeout_ms}ms)")
+    direct = run_direct(setup_database(False), args.writers, args.writes)
+    report("direct", total, direct)
+    coordinated = asyncio.run(run_coordinator(setup_database(True), args.writers, args.writes))
+    report("coordinator", total, coordinated)
+
+    if coordinated["errors"]:
+        sys.exit("Write coordinator surfaced lock errors")
+    if coordinated["elapsed"] >= direct["elapsed"]:
+        sys.exit("Write coordinator did not improve sustained write throughput")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,13 @@ Run this once to initialize the superadmin account
 """
 import sys
 import bcrypt
-from app.database import SessionLocal, engine, Base
+from app.database import SessionLocal
 from app.models.user import User, UserRole
-
-# Create tables if they don't exist
-Base.metadata.create_all(bind=engine)
+from app.schema import upgrade_schema
 
 def create_superadmin():
+    # Apply migrations if they have not been run yet
+    upgrade_schema()
     db = SessionLocal()
     try:
         # Check if superadmin already exists
@@ -0,0 +1,175 @@
+"""
+Standalone realtime gateway
+
+Serves only the widget assets and the widget WebSocket relay
+(app/routes/widget_realtime.py), with the API's agent models and settings,
+so audio sessions can be scaled and restarted apart from the admin API.
+The REST routers, their auth dependencies and the OpenAPI docs are not
+loaded.
+
+    python gateway.py                       # GATEWAY_WORKERS processes on GATEWAY_PORT
+    python gateway.py --workers 4 --port 8001
+
+Each worker process binds its own listening socket to the same port with
+SO_REUSEPORT and the kernel spreads new connections across them. The parent
+only supervises: it restarts a worker that dies and stops all of them on
+SIGTERM/SIGINT. A single process can also be run with uvicorn directly:
+
+    uvicorn gateway:create_app --factory --port 8001
+"""
+import argparse
+import multiprocessing
+import signal
+import socket
+import sys
+import time
+from app.config import settings
+
+
+def create_app():
+    """The gateway ASGI app: widget assets, widget WebSocket and /health"""
+    from fastapi import FastAPI
+    from app.schema import check_schema_revision
+    from app.routes import widget_realtime
+    from app.utils.query_budget import QueryBudgetMiddleware
+    from app.utils.session_capture import start_capture_sweeper, stop_capture_sweeper, stop_capture_writer
+    from app.utils.memory import start_memory_watchdog, stop_memory_watchdog
+    from app.utils.loop_monitor import start_loop_monitor, stop_loop_monitor
+
+    app = FastAPI(
+        title="Voice Assistant Realtime Gateway",
+        docs_url=None,
+        redoc_url=None,
+        openapi_url=None
+    )
+    app.add_middleware(SessionLimitMiddleware, stats=widget_realtime.session_stats)
+    app.add_middleware(QueryBudgetMiddleware)
+    app.include_router(widget_realtime.router)
+
+    @app.on_event("startup")
+    async def startup():
+        check_schema_revision()
+        start_memory_watchdog(widget_realtime.session_stats)
+        start_loop_monitor()
+        widget_realtime.start_session_reaper()
+        start_capture_sweeper()
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        stop_capture_writer()
+        await stop_capture_sweeper()
+        await widget_realtime.stop_session_reaper()
+        await stop_memory_watchdog()
+        stop_loop_monitor()
+
+    @app.get("/health")
+    async def health_check():
+        """Health check with this process's session counters"""
+        return {"status": "healthy", **widget_realtime.session_stats()}
+
+    return app
+
+
+class SessionLimitMiddleware:
+    """Turns away widget sessions beyond gateway_max_sessions for this process"""
+
+    def __init__(self, app, stats):
+        self.app = app
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] == "websocket"
+            and settings.gateway_max_sessions > 0
+            and self.stats()["active_sessions"] >= settings.gateway_max_sessions
+        ):
+            print(f"[Gateway] Session limit of {settings.gateway_max_sessions} reached, rejecting connection")
+            await receive()
+            # Closing before accept answers the handshake with 403
+            await send({"type": "websocket.close", "code": 1013})
+            return
+        await self.app(scope, receive, send)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """A listening-ready socket that other workers can bind to as well"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    return sock
+
+
+def run_worker(host: str, port: int):
+    import uvicorn
+
+    config = uvicorn.Config(
+        "gateway:create_app",
+        factory=True,
+        loop=settings.gateway_loop,
+        backlog=settings.gateway_backlog,
+        ws_max_size=settings.gateway_ws_max_size,
+        ws_ping_interval=settings.gateway_ws_ping_interval_s,
+        ws_ping_timeout=settings.gateway_ws_ping_timeout_s,
+        ws_per_message_deflate=settings.gateway_ws_per_message_deflate,
+        timeout_graceful_shutdown=settings.gateway_graceful_shutdown_s,
+        access_log=False
+    )
+    uvicorn.Server(config).run(sockets=[bind_socket(host, port)])
+
+
+def supervise(workers: int, host: str, port: int):
+    """Run `workers` worker processes until SIGTERM/SIGINT, restarting any that die"""
+    context = multiprocessing.get_context("spawn")
+    stopping = False
+
+    def start(index: int):
+        process = context.Process(target=run_worker, args=(host, port), name=f"gateway-{index}")
+        process.start()
+        print(f"[Gateway] Worker {index} started (pid {process.pid})")
+        return process
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"[Gateway] Serving on {host}:{port} with {workers} worker processes")
+    processes = [start(index) for index in range(workers)]
+    while not stopping:
+        time.sleep(0.5)
+        for index, process in enumerate(processes):
+            if not process.is_alive() and not stopping:
+                print(f"[Gateway] Worker {index} (pid {process.pid}) exited with {process.exitcode}, restarting")
+                time.sleep(1)
+                processes[index] = start(index)
+
+    print("[Gateway] Stopping workers")
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(settings.gateway_graceful_shutdown_s + 5)
+        if process.is_alive():
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the realtime widget gateway")
+    parser.add_argument("--workers", type=int, default=settings.gateway_workers)
+    parser.add_argument("--host", default=settings.gateway_host)
+    parser.add_argument("--port", type=int, default=settings.gateway_port)
+    args = parser.parse_args()
+
+    if not hasattr(socket, "SO_REUSEPORT"):
+        sys.exit("SO_REUSEPORT is not available on this platform; run one worker with uvicorn instead")
+    if args.workers < 1:
+        sys.exit("--workers must be at least 1")
+    supervise(args.workers, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
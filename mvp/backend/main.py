@@ -4,17 +4,23 @@ Main FastAPI application
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.database import engine, Base
-from app.routes import auth, openai_keys, agents, assistant_config, widget, users
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
+from app.schema import check_schema_revision
+from app.routes import auth, openai_keys, agents, assistant_config, widget, widget_realtime, users, tenant_export, debug
+from app.utils.write_coordinator import start_write_coordinator, stop_write_coordinator
+from app.utils.session_capture import start_capture_sweeper, stop_capture_sweeper, stop_capture_writer
+from app.utils.profiling import RequestProfilingMiddleware
+from app.utils.memory import start_memory_watchdog, stop_memory_watchdog
+from app.utils.loop_monitor import start_loop_monitor, stop_loop_monitor
+from app.utils.request_timing import RequestTimingMiddleware, instrument_routes
+from app.utils.query_budget import QueryBudgetMiddleware
 
 # Create FastAPI app
 app = FastAPI(
     title="Voice Assistant Platform API",
     description="Platform for managing OpenAI Realtime API voice assistants",
-    version="1.0.0"
+    version="1.0.0",
+    # Not built or served in PROD unless API_DOCS=on
+    openapi_url="/openapi.json" if settings.docs_enabled else None
 )
 
 # Configure CORS
@@ -24,8 +30,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Profile-Id"],
 )
 
+# Warns about (or fails) routes that send more SQL statements than their budget
+app.add_middleware(QueryBudgetMiddleware)
+
+# Profiles requests sent with an X-Profile header (REQUEST_PROFILE_RATE)
+app.add_middleware(RequestProfilingMiddleware)
+
+# Server-Timing headers and per-route latency histograms (outermost)
+app.add_middleware(RequestTimingMiddleware)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -33,6 +49,31 @@ app.include_router(openai_keys.router)
 app.include_router(agents.router)
 app.include_router(assistant_config.router)  # Now handles multiple assistants
 app.include_router(widget.router)
+app.include_router(widget_realtime.router)
+app.include_router(tenant_export.router)
+app.include_router(debug.router)
+
+
+@app.on_event("startup")
+async def startup():
+    """Verify the schema revision (no DDL here, see migrate.py) and start the write queue and monitors"""
+    check_schema_revision()
+    start_write_coordinator()
+    start_memory_watchdog(widget_realtime.session_stats)
+    start_loop_monitor()
+    widget_realtime.start_session_reaper()
+    start_capture_sweeper()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Commit any queued writes and session captures before the worker exits"""
+    stop_write_coordinator()
+    stop_capture_writer()
+    await stop_capture_sweeper()
+    await widget_realtime.stop_session_reaper()
+    await stop_memory_watchdog()
+    stop_loop_monitor()
 
 
 @app.get("/")
@@ -41,7 +82,7 @@ async def root():
     return {
         "message": "Voice Assistant Platform API",
         "version": "1.0.0",
-        "docs": "/docs"
+        "docs": app.docs_url if settings.docs_enabled else None
     }
 
 
@@ -50,3 +91,7 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+
+# After every route is registered
+instrument_routes(app)
+
@@ -0,0 +1,22 @@
+"""
+Apply database migrations
+
+Run this once per deploy, before starting the workers:
+    python3 migrate.py
+"""
+import sys
+from app.schema import upgrade_schema, get_database_revision, get_head_revision
+
+
+def migrate():
+    print(f"📦 Migrating database from revision {get_database_revision() or 'none'} to {get_head_revision()}...")
+    try:
+        upgrade_schema()
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
+    print(f"✅ Database is at revision {get_database_revision()}")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -1,267 +1,404 @@
 """
 Migration script to convert Prompts to Agents
-This script:
-1. Creates the new 'agents' table
-2. Migrates data from 'prompts' and 'prompt_versions' to 'agents'
-3. Updates 'assistant_configs' to use 'agent_id' instead of 'prompt_id' and 'prompt_version_id'
-4. Drops old 'prompts' and 'prompt_versions' tables
+Run `python3 migrate.py` first: this script expects the schema at the
+latest Alembic revision and only adds to it. It:
+1. Migrates data from 'prompts' and 'prompt_versions' to 'agents'
+2. Updates 'assistant_configs' to use 'agent_id' instead of 'prompt_id' and 'prompt_version_id'
+3. Drops old 'prompts' and 'prompt_versions' tables
+
+Rows are copied in keyed batches, each in its own short transaction with a
+checkpoint (see app/utils/batch_migration.py), so the app can keep running
+and an interrupted run resumes where it stopped when started again. Triggers
+record the assistants written while they are being copied; the swap
+transaction re-copies those rows, so no write made meanwhile is lost. The
+swap itself holds the write lock on assistant_configs for as long as that
+takes. The old app version, which still writes prompts, must be stopped.
+    python3 migrate_prompts_to_agents.py
+    python3 migrate_prompts_to_agents.py --dry-run     # estimate duration, change nothing
+    python3 migrate_prompts_to_agents.py --batch-size 1000 --pause-ms 50
 """
-import sqlite3
+import argparse
 import os
-from datetime import datetime
+import sys
+from typing import Tuple
+from sqlalchemy import ForeignKeyConstraint, MetaData, Table, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from app.config import settings
+from app.database import create_writer_engine
+from app.schema import get_head_revision
+from app.utils.batch_migration import BatchMigration, run_batched
+
+
+class PromptsToAgents(BatchMigration):
+    """Copy every prompt, with its latest version, into agents"""
+    name = "prompts_to_agents"
+
+    def setup(self, conn):
+        # The agents table and its indexes come from the Alembic migrations.
+        # Latest version lookup per prompt (the table is dropped at the end)
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_prompt_versions_prompt_id ON prompt_versions(prompt_id, version_number)"
+        ))
+
+    def count_remaining(self, conn, after_key):
+        return conn.execute(
+            text("SELECT COUNT(*) FROM prompts WHERE id > :after"), {"after": after_key or 0}
+        ).scalar()
+
+    def fetch_batch(self, conn, after_key, limit):
+        # Note: prompt_versions may not have all noise reduction fields
+        return conn.execute(text("""
+            SELECT
+                p.id AS key,
+                p.user_id,
+                COALESCE(p.openai_key_id, 1) AS openai_key_id,
+                p.name,
+                p.description,
+                pv.system_instructions,
+                pv.voice,
+                pv.noise_reduction_mode,
+                p.created_at
+            FROM prompts p
+            LEFT JOIN prompt_versions pv ON pv.id = (
+                SELECT id FROM prompt_versions
+                WHERE prompt_id = p.id
+                ORDER BY version_number DESC
+                LIMIT 1
+            )
+            WHERE p.id > :after
+            ORDER BY p.id
+            LIMIT :limit
+        """), {"after": after_key or 0, "limit": limit}).all()
+
+    def apply_batch(self, conn, rows):
+        # Prompts have no widget domain: the agents refuse widget connections until one is set
+        conn.execute(text("""
+            INSERT INTO agents (
+                user_id, openai_key_id, name, domain, instructions,
+                voice, noise_reduction_mode, noise_reduction_threshold,
+                noise_reduction_prefix_padding_ms, noise_reduction_silence_duration_ms,
+                agent_config, created_at
+            ) VALUES (
+                :user_id, :openai_key_id, :name, '', :instructions,
+                :voice, :noise_reduction_mode, '0.5', 300, 500, '{}', :created_at
+            )
+        """), [
+            {
+                "user_id": row.user_id,
+                "openai_key_id": row.openai_key_id,
+                "name": row.name,
+                # Use default values if version data is missing
+                "instructions": row.system_instructions or row.description or f"Agent: {row.name}",
+                "voice": row.voice or "alloy",
+                # The Enum column stores member names (NEAR_FIELD), prompts have values
+                "noise_reduction_mode": (row.noise_reduction_mode or "near_field").upper(),
+                "created_at": row.created_at,
+            }
+            for row in rows
+        ])
 
-DB_PATH = './voice_assistant.db'
 
-def migrate():
-    if not os.path.exists(DB_PATH):
-        print("Database does not exist. Tables will be created automatically on first run.")
+AGENT_NAME_INDEX = "ix_agents_user_id_name_tmp"
+DROPPED_COLUMNS = {"prompt_id", "prompt_version_id"}
+# Ids of assistant_configs rows written during the rebuild, and the trigger(s) recording them
+CHANGES_TABLE = "assistant_configs_changes"
+CHANGES_TRIGGER = "assistant_configs_track_changes"
+CHANGES_OPERATIONS = {"INSERT": ("NEW",), "UPDATE": ("OLD", "NEW"), "DELETE": ("OLD",)}
+
+
+class AssistantPromptsToAgents(BatchMigration):
+    """Point assistant_configs.agent_id at the agent created from their prompt"""
+    name = "assistant_configs_agent_id"
+
+    def setup(self, conn):
+        columns = [column["name"] for column in inspect(conn).get_columns("assistant_configs")]
+        if "agent_id" not in columns:
+            conn.execute(text("ALTER TABLE assistant_configs ADD COLUMN agent_id INTEGER"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_assistant_configs_agent_id ON assistant_configs(agent_id)"))
+        # Prompt -> agent lookup by name, dropped once the migration is done
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {AGENT_NAME_INDEX} ON agents(user_id, name)"))
+
+    def count_remaining(self, conn, after_key):
+        return conn.execute(text("""
+            SELECT COUNT(*) FROM assistant_configs
+            WHERE id > :after AND prompt_id IS NOT NULL AND agent_id IS NULL
+        """), {"after": after_key or 0}).scalar()
+
+    def fetch_batch(self, conn, after_key, limit):
+        return conn.execute(text("""
+            SELECT
+                ac.id AS key,
+                (
+                    SELECT a.id
+                    FROM prompts p
+                    INNER JOIN agents a ON a.user_id = p.user_id
+                        AND a.name = p.name
+                        AND a.openai_key_id = p.openai_key_id
+                    WHERE p.id = ac.prompt_id
+                    ORDER BY a.id
+                    LIMIT 1
+                ) AS agent_id
+            FROM assistant_configs ac
+            WHERE ac.id > :after AND ac.prompt_id IS NOT NULL AND ac.agent_id IS NULL
+            ORDER BY ac.id
+            LIMIT :limit
+        """), {"after": after_key or 0, "limit": limit}).all()
+
+    def apply_batch(self, conn, rows):
+        updates = [{"id": row.key, "agent_id": row.agent_id} for row in rows if row.agent_id is not None]
+        if updates:
+            conn.execute(text("UPDATE assistant_configs SET agent_id = :agent_id WHERE id = :id"), updates)
+
+
+def rebuilt_assistant_configs(conn) -> Table:
+    """
+    assistant_configs_new: the current assistant_configs columns (including
+    any added by Alembic revisions, e.g. `version`) and foreign keys, without
+    prompt_id and prompt_version_id
+    """
+    metadata = MetaData()
+    current = Table("assistant_configs", metadata, autoload_with=conn)
+    foreign_keys = [
+        ForeignKeyConstraint(list(constraint.column_keys), [element.target_fullname for element in constraint.elements])
+        for constraint in current.foreign_key_constraints
+        if not DROPPED_COLUMNS & set(constraint.column_keys)
+    ]
+    return Table(
+        "assistant_configs_new",
+        metadata,
+        *[column._copy() for column in current.columns if column.name not in DROPPED_COLUMNS],
+        *foreign_keys,
+        sqlite_autoincrement=True
+    )
+
+
+def copy_columns(table: Table) -> Tuple[str, str]:
+    """The column list of `table` and the matching select list on assistant_configs"""
+    names = [column.name for column in table.columns]
+    # Legacy rows hold Enum values (near_field) where the model reads member names
+    values = ["UPPER(noise_reduction_mode)" if name == "noise_reduction_mode" else name for name in names]
+    return ", ".join(names), ", ".join(values)
+
+
+def track_assistant_changes(conn):
+    """Record the id of every assistant_configs row written from now on, until the swap"""
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (id INTEGER PRIMARY KEY)"))
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION {CHANGES_TRIGGER}() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP <> 'INSERT' THEN
+                    INSERT INTO {CHANGES_TABLE} (id) VALUES (OLD.id) ON CONFLICT DO NOTHING;
+                END IF;
+                IF TG_OP <> 'DELETE' THEN
+                    INSERT INTO {CHANGES_TABLE} (id) VALUES (NEW.id) ON CONFLICT DO NOTHING;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {CHANGES_TRIGGER} ON assistant_configs"))
+        conn.execute(text(
+            f"CREATE TRIGGER {CHANGES_TRIGGER} AFTER INSERT OR UPDATE OR DELETE ON assistant_configs "
+            f"FOR EACH ROW EXECUTE FUNCTION {CHANGES_TRIGGER}()"
+        ))
         return
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    try:
-        print("Starting migration from Prompts to Agents...")
-        
-        # Check if agents table already exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='agents'")
-        agents_exists = cursor.fetchone() is not None
-        
-        if agents_exists:
-            print("⚠️  'agents' table already exists.")
-            # Check if we still need to migrate data
-            cursor.execute("SELECT COUNT(*) FROM agents")
-            agents_count = cursor.fetchone()[0]
-            print(f"   Current agents count: {agents_count}")
-            
-            # Check if prompts table still exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='prompts'")
-            prompts_exists = cursor.fetchone() is not None
-            
-            if not prompts_exists:
-                print("✅ Migration already completed (prompts table removed).")
-                # Just need to update assistant_configs if needed
-                cursor.execute("PRAGMA table_info(assistant_configs)")
-                columns = [col[1] for col in cursor.fetchall()]
-                if 'agent_id' in columns and 'prompt_id' in columns:
-                    print("Updating assistant_configs to remove prompt_id...")
-                    # Will handle this below
-                else:
-                    print("✅ assistant_configs already updated.")
-                    conn.close()
-                    return
-            else:
-                print("⚠️  Both tables exist. Will migrate data and clean up.")
+    for operation, rows in CHANGES_OPERATIONS.items():
+        inserts = " ".join(f"INSERT OR IGNORE INTO {CHANGES_TABLE} (id) VALUES ({row}.id);" for row in rows)
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {CHANGES_TRIGGER}_{operation.lower()} "
+            f"AFTER {operation} ON assistant_configs BEGIN {inserts} END"
+        ))
+
+
+def untrack_assistant_changes(conn):
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {CHANGES_TRIGGER} ON assistant_configs"))
+        conn.execute(text(f"DROP FUNCTION IF EXISTS {CHANGES_TRIGGER}()"))
+    else:
+        for operation in CHANGES_OPERATIONS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {CHANGES_TRIGGER}_{operation.lower()}"))
+    conn.execute(text(f"DROP TABLE IF EXISTS {CHANGES_TABLE}"))
+
+
+class RebuildAssistantConfigs(BatchMigration):
+    """
+    Copy assistant_configs into a table without prompt_id/prompt_version_id
+    (SQLite doesn't support DROP COLUMN directly). Rows written after their
+    batch was copied are recorded by triggers (created here, before the first
+    batch) and copied again when the tables are swapped.
+    """
+    name = "assistant_configs_rebuild"
+    columns = ""
+    values = ""
+
+    def setup(self, conn):
+        table = rebuilt_assistant_configs(conn)
+        table.create(conn, checkfirst=True)
+        track_assistant_changes(conn)
+        self.columns, self.values = copy_columns(table)
+
+    def count_remaining(self, conn, after_key):
+        return conn.execute(
+            text("SELECT COUNT(*) FROM assistant_configs WHERE id > :after"), {"after": after_key or 0}
+        ).scalar()
+
+    def fetch_batch(self, conn, after_key, limit):
+        return conn.execute(
+            text("SELECT id AS key FROM assistant_configs WHERE id > :after ORDER BY id LIMIT :limit"),
+            {"after": after_key or 0, "limit": limit}
+        ).all()
+
+    def apply_batch(self, conn, rows):
+        conn.execute(text(f"""
+            INSERT INTO assistant_configs_new ({self.columns})
+            SELECT {self.values}
+            FROM assistant_configs
+            WHERE id BETWEEN :first AND :last
+        """), {"first": rows[0].key, "last": rows[-1].key})
+
+
+def swap_assistant_configs(conn):
+    """
+    Replace assistant_configs with the rebuilt table, keeping its indexes,
+    after re-copying the rows written since their batch was copied. Run in
+    one transaction that holds the write lock (BEGIN IMMEDIATE on SQLite).
+    """
+    if conn.dialect.name == "postgresql":
+        # Nothing may be written between re-copying the changes and the drop
+        conn.execute(text("LOCK TABLE assistant_configs IN EXCLUSIVE MODE"))
+    columns, values = copy_columns(rebuilt_assistant_configs(conn))
+    conn.execute(text(f"DELETE FROM assistant_configs_new WHERE id IN (SELECT id FROM {CHANGES_TABLE})"))
+    conn.execute(text(f"""
+        INSERT INTO assistant_configs_new ({columns})
+        SELECT {values}
+        FROM assistant_configs
+        WHERE id IN (SELECT id FROM {CHANGES_TABLE})
+    """))
+    untrack_assistant_changes(conn)
+
+    indexes = [
+        index for index in inspect(conn).get_indexes("assistant_configs")
+        if not DROPPED_COLUMNS & set(index["column_names"])
+    ]
+    conn.execute(text("DROP TABLE assistant_configs"))
+    conn.execute(text("ALTER TABLE assistant_configs_new RENAME TO assistant_configs"))
+    for index in indexes:
+        unique = "UNIQUE " if index["unique"] else ""
+        conn.execute(text(
+            f"CREATE {unique}INDEX IF NOT EXISTS {index['name']} "
+            f"ON assistant_configs({', '.join(index['column_names'])})"
+        ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_assistant_configs_user_id ON assistant_configs(user_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_assistant_configs_agent_id ON assistant_configs(agent_id)"))
+
+
+def drop_prompt_tables(conn):
+    conn.execute(text(f"DROP INDEX IF EXISTS {AGENT_NAME_INDEX}"))
+    conn.execute(text("DROP TABLE IF EXISTS prompt_versions"))
+    conn.execute(text("DROP TABLE IF EXISTS prompts"))
+
+
+def report(progress):
+    print(f"   {progress}")
+
+
+def run_step(engine, migration, args):
+    if args.dry_run:
+        try:
+            progress = run_batched(engine, migration, batch_size=args.batch_size, dry_run=True)
+        except Exception as e:
+            # e.g. a column added by an earlier step that the dry run rolled back
+            print(f"   {migration.name}: can't be sampled before the previous steps are applied ({e.__class__.__name__})")
+            return
+        if progress.total == 0:
+            print(f"   {migration.name}: nothing to do")
+        elif progress.estimated_duration is None:
+            print(f"   {migration.name}: {progress.total:,} rows, no sample to time")
         else:
-            prompts_exists = True
-            # Create agents table if it doesn't exist
-            print("Creating 'agents' table...")
-            cursor.execute("""
-                CREATE TABLE agents (
-                    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    openai_key_id INTEGER NOT NULL,
-                    name VARCHAR NOT NULL,
-                    description TEXT,
-                    instructions TEXT NOT NULL,
-                    voice VARCHAR DEFAULT 'alloy',
-                    noise_reduction_mode VARCHAR DEFAULT 'near_field',
-                    noise_reduction_threshold VARCHAR DEFAULT '0.5',
-                    noise_reduction_prefix_padding_ms INTEGER DEFAULT 300,
-                    noise_reduction_silence_duration_ms INTEGER DEFAULT 500,
-                    agent_config TEXT DEFAULT '{}',
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME,
-                    FOREIGN KEY(user_id) REFERENCES users (id),
-                    FOREIGN KEY(openai_key_id) REFERENCES openai_keys (id)
-                )
-            """)
-            
-            # Create index on user_id
-            cursor.execute("CREATE INDEX IF NOT EXISTS ix_agents_user_id ON agents(user_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS ix_agents_openai_key_id ON agents(openai_key_id)")
-        
+            print(
+                f"   {migration.name}: {progress.total:,} rows, sampled {progress.done:,} at "
+                f"{progress.rate:,.0f} rows/s, estimated {progress.estimated_duration:.1f}s"
+            )
+        return
+    run_batched(
+        engine, migration,
+        batch_size=args.batch_size,
+        pause=args.pause_ms / 1000,
+        report=report
+    )
+
+
+def migrate(args):
+    url = make_url(args.database_url)
+    if url.get_backend_name() == "sqlite" and url.database and not os.path.exists(url.database):
+        print("Database does not exist. Run `python3 migrate.py` to create the schema.")
+        return
+
+    engine = create_writer_engine(args.database_url)
+    with engine.connect() as conn:
+        try:
+            revision = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        except (OperationalError, ProgrammingError):
+            revision = None
+        if revision != get_head_revision():
+            print(
+                f"Database schema is at revision {revision or 'none'}, expected {get_head_revision()}. "
+                f"Run `python3 migrate.py` first."
+            )
+            engine.dispose()
+            sys.exit(1)
+        inspector = inspect(conn)
+        prompts_exists = inspector.has_table("prompts")
+        assistant_columns = [column["name"] for column in inspector.get_columns("assistant_configs")]
+    has_prompt_id = "prompt_id" in assistant_columns
+
+    if not prompts_exists and not has_prompt_id:
+        print("✅ Migration already completed (prompts table removed, assistant_configs updated).")
+        return
+
+    print(f"{'🔍 Estimating' if args.dry_run else 'Starting'} migration from Prompts to Agents...")
+    try:
         # Migrate data from prompts/prompt_versions to agents
         if prompts_exists:
             print("Migrating data from 'prompts' and 'prompt_versions' to 'agents'...")
-            
-            # Get all prompts with their latest versions
-            # Note: prompt_versions may not have all noise reduction fields
-            cursor.execute("""
-                SELECT 
-                    p.id,
-                    p.user_id,
-                    COALESCE(p.openai_key_id, 1) as openai_key_id,
-                    p.name,
-                    p.description,
-                    pv.system_instructions,
-                    pv.voice,
-                    pv.noise_reduction_mode,
-                    p.created_at
-                FROM prompts p
-                LEFT JOIN prompt_versions pv ON p.id = pv.prompt_id AND (pv.is_active = 1 OR pv.id = (
-                    SELECT id FROM prompt_versions 
-                    WHERE prompt_id = p.id 
-                    ORDER BY version_number DESC 
-                    LIMIT 1
-                ))
-                ORDER BY p.id, pv.version_number DESC
-            """)
-            
-            prompts_data = cursor.fetchall()
-            
-            # Group by prompt id to get the latest version
-            seen_prompts = {}
-            for row in prompts_data:
-                prompt_id = row[0]
-                if prompt_id not in seen_prompts:
-                    seen_prompts[prompt_id] = row
-            
-            migrated_count = 0
-            for row in seen_prompts.values():
-                (prompt_id, user_id, openai_key_id, name, description, 
-                 instructions, voice, noise_reduction_mode, created_at) = row
-                
-                # Use default values if version data is missing
-                if instructions is None:
-                    instructions = description or f"Agent: {name}"
-                if voice is None:
-                    voice = "alloy"
-                if noise_reduction_mode is None:
-                    noise_reduction_mode = "near_field"
-                # These fields don't exist in prompt_versions, use defaults
-                noise_reduction_threshold = "0.5"
-                noise_reduction_prefix_padding_ms = 300
-                noise_reduction_silence_duration_ms = 500
-                
-                cursor.execute("""
-                    INSERT INTO agents (
-                        user_id, openai_key_id, name, description, instructions,
-                        voice, noise_reduction_mode, noise_reduction_threshold,
-                        noise_reduction_prefix_padding_ms, noise_reduction_silence_duration_ms,
-                        agent_config, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    user_id, openai_key_id, name, description, instructions,
-                    voice, noise_reduction_mode, noise_reduction_threshold,
-                    noise_reduction_prefix_padding_ms, noise_reduction_silence_duration_ms,
-                    '{}', created_at
-                ))
-                migrated_count += 1
-            
-            print(f"✅ Migrated {migrated_count} prompts to agents")
-        
-        # Update assistant_configs table
-        print("Updating 'assistant_configs' table...")
-        
-        # Check if agent_id column exists
-        cursor.execute("PRAGMA table_info(assistant_configs)")
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        if 'agent_id' not in columns:
-            # Add agent_id column
-            cursor.execute("ALTER TABLE assistant_configs ADD COLUMN agent_id INTEGER")
-            cursor.execute("CREATE INDEX IF NOT EXISTS ix_assistant_configs_agent_id ON assistant_configs(agent_id)")
-            
-            # Migrate prompt_id to agent_id if prompts existed
+            run_step(engine, PromptsToAgents(), args)
+
+        if has_prompt_id:
             if prompts_exists:
                 print("Migrating prompt_id to agent_id in assistant_configs...")
-                # Create a mapping from old prompt_id to new agent_id
-                cursor.execute("""
-                    SELECT p.id, a.id 
-                    FROM prompts p
-                    INNER JOIN agents a ON a.user_id = p.user_id 
-                        AND a.name = p.name 
-                        AND a.openai_key_id = p.openai_key_id
-                    ORDER BY p.id, a.id
-                """)
-                prompt_to_agent = {}
-                for old_prompt_id, new_agent_id in cursor.fetchall():
-                    if old_prompt_id not in prompt_to_agent:
-                        prompt_to_agent[old_prompt_id] = new_agent_id
-                
-                # Update assistant_configs
-                for old_prompt_id, new_agent_id in prompt_to_agent.items():
-                    cursor.execute("""
-                        UPDATE assistant_configs 
-                        SET agent_id = ? 
-                        WHERE prompt_id = ?
-                    """, (new_agent_id, old_prompt_id))
-                
-                updated_count = cursor.rowcount
-                print(f"✅ Updated {updated_count} assistant_configs records")
-        
-        # Remove old foreign key constraints and columns if they exist
-        if 'prompt_id' in columns:
-            print("Removing old 'prompt_id' column from assistant_configs...")
-            # SQLite doesn't support DROP COLUMN directly, so we need to recreate the table
-            cursor.execute("""
-                CREATE TABLE assistant_configs_new (
-                    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    name VARCHAR NOT NULL,
-                    agent_id INTEGER,
-                    voice VARCHAR DEFAULT 'alloy',
-                    noise_reduction_mode VARCHAR DEFAULT 'near_field',
-                    noise_reduction_threshold VARCHAR DEFAULT '0.5',
-                    noise_reduction_prefix_padding_ms INTEGER DEFAULT 300,
-                    noise_reduction_silence_duration_ms INTEGER DEFAULT 500,
-                    additional_settings TEXT DEFAULT '{}',
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME,
-                    FOREIGN KEY(user_id) REFERENCES users (id),
-                    FOREIGN KEY(agent_id) REFERENCES agents (id)
-                )
-            """)
-            
-            # Copy data (excluding prompt_id and prompt_version_id)
-            cursor.execute("""
-                INSERT INTO assistant_configs_new (
-                    id, user_id, name, agent_id, voice, noise_reduction_mode,
-                    noise_reduction_threshold, noise_reduction_prefix_padding_ms,
-                    noise_reduction_silence_duration_ms, additional_settings,
-                    created_at, updated_at
-                )
-                SELECT 
-                    id, user_id, name, agent_id, voice, noise_reduction_mode,
-                    noise_reduction_threshold, noise_reduction_prefix_padding_ms,
-                    noise_reduction_silence_duration_ms, additional_settings,
-                    created_at, updated_at
-                FROM assistant_configs
-            """)
-            
-            # Drop old table and rename new one
-            cursor.execute("DROP TABLE assistant_configs")
-            cursor.execute("ALTER TABLE assistant_configs_new RENAME TO assistant_configs")
-            
-            # Recreate indexes
-            cursor.execute("CREATE INDEX IF NOT EXISTS ix_assistant_configs_user_id ON assistant_configs(user_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS ix_assistant_configs_agent_id ON assistant_configs(agent_id)")
-            
-            print("✅ Recreated assistant_configs table without prompt_id/prompt_version_id")
-        
-        # Drop old tables
-        if prompts_exists:
-            print("Dropping old 'prompt_versions' table...")
-            cursor.execute("DROP TABLE IF EXISTS prompt_versions")
-            
-            print("Dropping old 'prompts' table...")
-            cursor.execute("DROP TABLE IF EXISTS prompts")
-            
-            print("✅ Dropped old prompt tables")
-        
-        conn.commit()
+                run_step(engine, AssistantPromptsToAgents(), args)
+            print("Copying 'assistant_configs' without prompt_id/prompt_version_id...")
+            run_step(engine, RebuildAssistantConfigs(), args)
+
+        if args.dry_run:
+            print("\n🔍 Dry run only, nothing was changed.")
+            return
+
+        with engine.begin() as conn:
+            if has_prompt_id:
+                swap_assistant_configs(conn)
+                print("✅ Recreated assistant_configs table without prompt_id/prompt_version_id")
+            if prompts_exists:
+                drop_prompt_tables(conn)
+                print("✅ Dropped old prompt tables")
+
         print("\n✅ Migration completed successfully!")
-        
     except Exception as e:
-        conn.rollback()
         print(f"\n❌ Migration failed: {e}")
+        print("   Completed batches are kept; run the script again to resume.")
         import traceback
         traceback.print_exc()
-        raise
+        sys.exit(1)
     finally:
-        conn.close()
+        engine.dispose()
 
-if __name__ == "__main__":
-    migrate()
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert prompts to agents in resumable batches")
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per transaction")
+    parser.add_argument("--pause-ms", type=float, default=0, help="Pause between batches to let other writers in")
+    parser.add_argument("--dry-run", action="store_true", help="Time a sample in a rolled-back transaction and estimate the duration")
+    migrate(parser.parse_args())
@@ -1,26 +1,31 @@
 """
 Database Seeder
-Creates database tables and initializes superadmin user.
+Migrates the database schema and initializes superadmin user.
 
 Run this script manually after project setup:
     python3 seed_db.py
+
+Add a synthetic scale-benchmark dataset (see benchmarks/dataset.py):
+    python3 seed_db.py --synthetic --users 10000 --agents 1000000
 """
+import argparse
 import sys
-from app.database import SessionLocal, engine, Base
+from app.database import SessionLocal
+from app.schema import upgrade_schema
 from app.models.user import User, UserRole
 from app.utils.auth import get_password_hash
 
 def seed_database():
-    """Create database tables and seed initial data"""
+    """Migrate database schema and seed initial data"""
     print("🌱 Starting database seeding...")
     
-    # Step 1: Create all database tables
-    print("\n📦 Creating database tables...")
+    # Step 1: Apply database migrations
+    print("\n📦 Migrating database schema...")
     try:
-        Base.metadata.create_all(bind=engine)
-        print("✅ Database tables created successfully!")
+        upgrade_schema()
+        print("✅ Database schema is up to date!")
     except Exception as e:
-        print(f"❌ Error creating database tables: {e}")
+        print(f"❌ Error migrating database schema: {e}")
         sys.exit(1)
     
     # Step 2: Create/Update superadmin user
@@ -73,5 +78,22 @@ def seed_database():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Migrate and seed the database",
+        epilog="With --synthetic, the options of benchmarks/dataset.py (--users, --agents, ...) apply too"
+    )
+    parser.add_argument("--synthetic", action="store_true", help="Also generate a synthetic benchmark dataset")
+    dataset = None
+    if parser.parse_known_args()[0].synthetic:
+        # Only the benchmark dataset needs the benchmarks package
+        from benchmarks import dataset
+        dataset.add_arguments(parser)
+    args = parser.parse_args()
+    if dataset:
+        dataset.check_arguments(parser, args)
+    
     seed_database()
+    if dataset:
+        print()
+        dataset.run(args)
 
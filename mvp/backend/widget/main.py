@@ -76,8 +76,17 @@ if not OPENAI_API_KEY:
     raise RuntimeError("Missing OPENAI_API_KEY environment variable. Please set it in your .env file")
 
 # Client tracking
-clients: Dict[WebSocket, websockets.WebSocketClientProtocol] = {}
-client_agent: Dict[WebSocket, Optional[Dict]] = {}
+class ClientSession:
+    """One browser connection: its OpenAI socket, assigned agent and the assistant text being assembled"""
+    __slots__ = ("openai_ws", "agent", "assistant_text")
+
+    def __init__(self):
+        self.openai_ws: Optional[websockets.WebSocketClientProtocol] = None
+        self.agent: Optional[Dict] = None
+        self.assistant_text = ""
+
+
+sessions: Dict[WebSocket, ClientSession] = {}
 
 # Endpoints
 @app.get("/get-widget")
@@ -102,8 +111,7 @@ async def websocket_proxy(ws: WebSocket):
     """Main WebSocket endpoint for browser widget"""
     await ws.accept()
     print("[WS] Client connected")
-    openai_ws = None
-    assigned_agent = None
+    session = sessions[ws] = ClientSession()
 
     try:
         while True:
@@ -128,8 +136,7 @@ async def websocket_proxy(ws: WebSocket):
                     await ws.send_json({"type": "error", "error": f"Agent {agent_id} not found in database"})
                     continue
                 
-                client_agent[ws] = agent
-                assigned_agent = agent
+                session.agent = agent
                 
                 await ws.send_json({
                     "type": "agent_set", 
@@ -139,26 +146,23 @@ async def websocket_proxy(ws: WebSocket):
                 })
                 print(f"[WS] Agent #{agent_id} '{agent.get('name')}' assigned to client")
 
-                if ws in clients:
-                    openai_ws = clients[ws]
-                    if openai_ws.open:
-                        instructions = get_agent_instructions(agent)
-                        if instructions:
-                            await openai_ws.send(json.dumps({
-                                "type": "session.update",
-                                "session": {"instructions": instructions}
-                            }))
-                            print("[WS] Updated OpenAI session with agent instructions")
+                openai_ws = session.openai_ws
+                if openai_ws and openai_ws.open:
+                    instructions = get_agent_instructions(agent)
+                    if instructions:
+                        await openai_ws.send(json.dumps({
+                            "type": "session.update",
+                            "session": {"instructions": instructions}
+                        }))
+                        print("[WS] Updated OpenAI session with agent instructions")
 
             elif action == "connect":
-                assigned_agent = client_agent.get(ws)
-                if assigned_agent:
-                    print(f"[WS] Connecting with agent: {assigned_agent.get('name', 'Unknown')}")
+                if session.agent:
+                    print(f"[WS] Connecting with agent: {session.agent.get('name', 'Unknown')}")
                 else:
                     print("[WS] Connecting without specific agent")
                 
-                openai_ws = await connect_openai(ws, assigned_agent)
-                clients[ws] = openai_ws
+                session.openai_ws = await connect_openai(ws, session)
                 print("[WS] OpenAI session established")
 
             elif action == "prompt":
@@ -169,25 +173,24 @@ async def websocket_proxy(ws: WebSocket):
                 
                 print(f"[WS] Custom prompt received: {prompt[:100]}...")
                 
-                if ws in clients:
-                    openai_ws = clients[ws]
-                    if openai_ws.open:
-                        await openai_ws.send(json.dumps({
-                            "type": "session.update",
-                            "session": {"instructions": prompt}
-                        }))
-                        await ws.send_json({"type": "prompt_set", "text": prompt})
-                        print("[WS] Updated OpenAI session with custom prompt")
-                        continue
+                openai_ws = session.openai_ws
+                if openai_ws and openai_ws.open:
+                    await openai_ws.send(json.dumps({
+                        "type": "session.update",
+                        "session": {"instructions": prompt}
+                    }))
+                    await ws.send_json({"type": "prompt_set", "text": prompt})
+                    print("[WS] Updated OpenAI session with custom prompt")
+                    continue
                 
-                client_agent[ws] = {"instructions": prompt, "name": "Custom Prompt"}
+                session.agent = {"instructions": prompt, "name": "Custom Prompt"}
                 await ws.send_json({"type": "prompt_set", "text": prompt})
 
             elif action == "audio_chunk":
-                if ws not in clients:
+                openai_ws = session.openai_ws
+                if not openai_ws:
                     continue
                 
-                openai_ws = clients[ws]
                 if openai_ws.open:
                     audio_data = data.get("audio")
                     if audio_data:
@@ -197,11 +200,11 @@ async def websocket_proxy(ws: WebSocket):
                         }))
 
             elif action == "commit":
-                if ws not in clients:
+                openai_ws = session.openai_ws
+                if not openai_ws:
                     print("[WS] Commit received but no OpenAI session")
                     continue
                 
-                openai_ws = clients[ws]
                 if openai_ws.open:
                     await openai_ws.send(json.dumps({
                         "type": "input_audio_buffer.commit"
@@ -221,14 +224,13 @@ async def websocket_proxy(ws: WebSocket):
         import traceback
         traceback.print_exc()
     finally:
-        if ws in clients:
-            openai_ws = clients.pop(ws)
+        sessions.pop(ws, None)
+        if session.openai_ws:
             try:
-                await openai_ws.close()
+                await session.openai_ws.close()
                 print("[WS] Closed OpenAI connection")
             except:
                 pass
-        client_agent.pop(ws, None)
         try:
             await ws.close()
         except:
@@ -259,8 +261,9 @@ def get_agent_instructions(agent: Dict) -> Optional[str]:
 
 
 # OpenAI Connection
-async def connect_openai(client_ws: WebSocket, agent: Optional[Dict] = None):
+async def connect_openai(client_ws: WebSocket, session: ClientSession):
     """Connect to OpenAI Realtime API and configure session with agent instructions"""
+    agent = session.agent
     ws_url = "wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-12-17"
     headers = {
         "Authorization": f"Bearer {OPENAI_API_KEY}",
@@ -304,17 +307,15 @@ async def connect_openai(client_ws: WebSocket, agent: Optional[Dict] = None):
     await openai_ws.send(json.dumps(session_payload))
     print("[OpenAI] Session configured")
 
-    asyncio.create_task(handle_openai_messages(openai_ws, client_ws))
+    asyncio.create_task(handle_openai_messages(openai_ws, client_ws, session))
     
     await client_ws.send_json({"type": "connected"})
     return openai_ws
 
 
 # OpenAI Message Handler
-async def handle_openai_messages(openai_ws, client_ws):
+async def handle_openai_messages(openai_ws, client_ws, session: ClientSession):
     """Receive messages from OpenAI and forward to browser client"""
-    assistant_text = ""
-    
     try:
         async for msg in openai_ws:
             try:
@@ -331,13 +332,13 @@ async def handle_openai_messages(openai_ws, client_ws):
                     print(f"[OpenAI] User: {transcript}")
 
             elif event_type == "response.audio_transcript.delta":
-                assistant_text += data.get("delta", "")
+                session.assistant_text += data.get("delta", "")
 
             elif event_type == "response.audio_transcript.done":
-                if assistant_text:
-                    await client_ws.send_json({"type": "transcript_assistant", "text": assistant_text})
-                    print(f"[OpenAI] Assistant: {assistant_text}")
-                    assistant_text = ""
+                if session.assistant_text:
+                    await client_ws.send_json({"type": "transcript_assistant", "text": session.assistant_text})
+                    print(f"[OpenAI] Assistant: {session.assistant_text}")
+                    session.assistant_text = ""
 
             elif event_type == "response.audio.delta":
                 delta = data.get("delta")
@@ -169,6 +169,20 @@
             case 'response_done':
                 status.textContent = 'Ready';
                 break;
+            case 'idle':
+                status.textContent = 'Paused - speak to continue';
+                break;
+            case 'reconnecting':
+                status.textContent = 'Reconnecting...';
+                break;
+            case 'resumed':
+                status.textContent = 'Listening...';
+                break;
+            case 'ping':
+                if (ws && ws.readyState === WebSocket.OPEN) {
+                    ws.send(JSON.stringify({ action: 'pong' }));
+                }
+                break;
             case 'error':
                 status.textContent = 'Error: ' + data.error;
                 console.error('[Widget] Error:', data.error);
@@ -403,6 +403,9 @@ function Agents() {
                 <div><strong>VAD Threshold:</strong> {selectedAgent.noise_reduction_threshold}</div>
                 <div><strong>Prefix Padding:</strong> {selectedAgent.noise_reduction_prefix_padding_ms}ms</div>
                 <div><strong>Silence Duration:</strong> {selectedAgent.noise_reduction_silence_duration_ms}ms</div>
+                {selectedAgent.capture_until && new Date(selectedAgent.capture_until) > new Date() && (
+                  <div><strong>Session Capture:</strong> On until {new Date(selectedAgent.capture_until).toLocaleString()} (enabled by support)</div>
+                )}
               </div>
             </div>
           </div>
@@ -33,6 +33,11 @@ export const userService = {
     return response.data
   },
   
+  getProfiles: async (ids) => {
+    const response = await api.post('/api/users/profiles', { user_ids: ids })
+    return response.data
+  },
+  
   getUserWidgets: async (id) => {
     const response = await api.get(`/api/users/${id}/widgets`)
     return response.data
@@ -98,6 +103,16 @@ export const agentService = {
     return response.data
   },
   
+  bulkCreate: async (agents) => {
+    const response = await api.post('/api/agents/bulk', agents)
+    return response.data
+  },
+  
+  bulkUpdate: async (data) => {
+    const response = await api.patch('/api/agents/bulk', data)
+    return response.data
+  },
+  
   generateWidgetCode: async (id) => {
     const response = await api.get(`/api/widget/code/agent/${id}`)
     return response.data